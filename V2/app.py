@@ -1,8 +1,75 @@
+import os
+import sys
+import uuid
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import plotly.express as px
-from utils import load_excel, save_excel
+from exporter import WorkbookExporter
+from utils import load_excel
+
+# Shared modules live at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from filter_widgets import item_picker
+from search_index import SearchIndex
+from session_store import SessionStore
+
+@st.cache_resource
+def get_exporter():
+    """Background workbook builder shared by every session"""
+    return WorkbookExporter()
+
+@st.cache_resource
+def get_session_store():
+    """Frames of every session, spilled to disk when idle or over the memory caps"""
+    return SessionStore()
+
+def session_frames():
+    """This session's Inflow, Outflow and Budget frames, kept in the shared session store"""
+    return get_session_store().frames(st.session_state.export_session)
+
+def request_export():
+    """Bump the data version and queue its export without waiting for it"""
+    st.session_state.data_version += 1
+    frames = session_frames()
+    get_exporter().request(
+        st.session_state.export_session,
+        st.session_state.data_version,
+        frames.get('inflow_df'),
+        frames.get('outflow_df'),
+        frames.get('budget_df')
+    )
+
+@st.fragment
+def export_panel():
+    """Offer the updated workbook once its background build has finished"""
+    version = st.session_state.data_version
+    if version == 0:
+        return
+    exporter = get_exporter()
+    excel_data = exporter.ready(st.session_state.export_session, version)
+    if excel_data is not None:
+        st.download_button(
+            label="Download updated Excel file",
+            data=excel_data,
+            file_name="updated_inventory.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+    elif exporter.error(st.session_state.export_session, version) is not None:
+        st.error(f"Error saving Excel file: {exporter.error(st.session_state.export_session, version)}")
+    else:
+        st.caption("Preparing the updated Excel file...")
+        # Only this panel reruns while polling
+        st.button("Refresh download")
+
+def get_search_index():
+    """Typeahead index over the purchased items, rebuilt when the data version changes"""
+    cached = st.session_state.get("search_index")
+    if cached is None or cached[0] != st.session_state.data_version:
+        index = SearchIndex(session_frames()['inflow_df'], label_fields=('Item_ID', 'Item_Type', 'Item_name'))
+        cached = (st.session_state.data_version, index)
+        st.session_state.search_index = cached
+    return cached[1]
 
 def submit_purchase_form():
     """Handles submission of the purchase form"""
@@ -48,34 +115,34 @@ def submit_purchase_form():
             }
 
             # Ensure inflow_df is initialized
-            if "inflow_df" not in st.session_state or st.session_state.inflow_df is None:
-                st.session_state.inflow_df = pd.DataFrame(columns=new_row.keys())
+            frames = session_frames()
+            inflow_df = frames.get('inflow_df')
+            if inflow_df is None:
+                inflow_df = pd.DataFrame(columns=new_row.keys())
 
             # Append new row to inflow DataFrame
-            st.session_state.inflow_df = pd.concat([st.session_state.inflow_df, pd.DataFrame([new_row])], ignore_index=True)
+            frames['inflow_df'] = pd.concat([inflow_df, pd.DataFrame([new_row])], ignore_index=True)
 
-            # Save updated data
-            save_excel(st.session_state.uploaded_file, st.session_state.inflow_df, st.session_state.outflow_df, st.session_state.budget_df)
+            # Build the updated workbook in the background
+            request_export()
             
             st.success("Purchase record added successfully!")
 
-            # Force UI refresh to display the new row
+            # Close the form and refresh the whole page to display the new row
+            st.session_state.active_form = None
             st.rerun()
 
-def submit_distribution_form(df):
+def submit_distribution_form():
     st.subheader("Add Distribution Record")
-    if st.session_state.inflow_df is not None and not st.session_state.inflow_df.empty:
-        selected_item = st.selectbox(
-            "Select Item",
-            st.session_state.inflow_df[['Item_ID', 'Item_Type', 'Item_name']].apply(
-                lambda x: f"{x['Item_ID']} - {x['Item_Type']} - {x['Item_name']}", 
-                axis=1
-            )
-        )
+    item_id = None
+    frames = session_frames()
+    inflow_df = frames.get('inflow_df')
+    if inflow_df is not None and not inflow_df.empty:
+        # Only the best matches of the search are rendered as options
+        item_id = item_picker(get_search_index(), "Select Item", key="distribution_item")
 
-    if selected_item:
-        item_id = selected_item.split(' - ')[0]
-        item_data = st.session_state.inflow_df[st.session_state.inflow_df['Item_ID'] == item_id].iloc[0]
+    if item_id is not None:
+        item_data = inflow_df[inflow_df['Item_ID'] == item_id].iloc[0]
 
         with st.form("distribution_form"):
             st.text(f"Item ID: {item_data['Item_ID']}")
@@ -100,62 +167,89 @@ def submit_distribution_form(df):
                     'Event_Date': event_date
                 }
 
-                st.session_state.outflow_df = pd.concat([st.session_state.outflow_df, pd.DataFrame([new_row])], ignore_index=True)
-                st.session_state.inflow_df.loc[st.session_state.inflow_df['Item_ID'] == item_id, 'Quantity_Left'] -= quantity
+                frames['outflow_df'] = pd.concat([frames.get('outflow_df'), pd.DataFrame([new_row])], ignore_index=True)
+                # A new frame sharing the other columns: the one a queued export holds is never changed
+                inflow_df = inflow_df.copy(deep=False)
+                inflow_df['Quantity_Left'] = inflow_df['Quantity_Left'].where(
+                    inflow_df['Item_ID'] != item_id, inflow_df['Quantity_Left'] - quantity)
+                frames['inflow_df'] = inflow_df
 
-                save_excel(uploaded_file, st.session_state.inflow_df, st.session_state.outflow_df, st.session_state.budget_df)
+                request_export()
                 st.success("Distribution record added successfully!")
+                st.session_state.active_form = None
                 st.rerun()
 
 
+@st.fragment
+def data_entry():
+    """Purchase/Distribution buttons and their forms, rerun on their own"""
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Purchase"):
+            st.session_state.active_form = "Purchase"
+    with col2:
+        if st.button("Distribution"):
+            st.session_state.active_form = "Distribution"
+
+    # Keep the chosen form open across its own reruns until a record is added
+    if st.session_state.active_form == "Purchase":
+        submit_purchase_form()
+    elif st.session_state.active_form == "Distribution":
+        submit_distribution_form()
+
+def show_charts():
+    """Charts of the current inventory"""
+    frames = session_frames()
+    inflow_df = frames.get('inflow_df')
+    if inflow_df is not None and not inflow_df.empty:
+        # Deferred so the page paints before plotly is loaded
+        import plotly.express as px
+        fig1 = px.pie(inflow_df, names='Item_Type', title='Distribution of Items by Type')
+        st.plotly_chart(fig1)
+
+        if not pd.api.types.is_datetime64_any_dtype(inflow_df['Purchase_Date']):
+            # Replaced rather than changed in place, as a queued export may hold the frame
+            inflow_df = inflow_df.copy(deep=False)
+            inflow_df['Purchase_Date'] = pd.to_datetime(inflow_df['Purchase_Date'])
+            frames['inflow_df'] = inflow_df
+        monthly_purchases = inflow_df.groupby(inflow_df['Purchase_Date'].dt.strftime('%Y-%m'))[['Total_Cost']].sum()
+        fig2 = px.line(monthly_purchases, title='Monthly Purchase Trends')
+        st.plotly_chart(fig2)
+
+        inventory_status = inflow_df.groupby('Item_Type')[['Quantity_Left']].sum()
+        fig3 = px.bar(inventory_status, title='Current Inventory Status by Item Type')
+        st.plotly_chart(fig3)
+
 def main():
     st.title("Inventory Management System")
 
-    # Initialize session state variables
+    # Initialize session state variables; the frames are kept in the session store
     if 'uploaded_file' not in st.session_state:
         st.session_state.uploaded_file = None
-    if 'inflow_df' not in st.session_state:
-        st.session_state.inflow_df = None
-    if 'outflow_df' not in st.session_state:
-        st.session_state.outflow_df = None
-    if 'budget_df' not in st.session_state:
-        st.session_state.budget_df = None
+    if 'data_version' not in st.session_state:
+        st.session_state.data_version = 0
+    if 'export_session' not in st.session_state:
+        st.session_state.export_session = uuid.uuid4().hex
+    if 'active_form' not in st.session_state:
+        st.session_state.active_form = None
 
     uploaded_file = st.file_uploader("Upload Excel File", type=['xlsx'])
 
     if uploaded_file:
-        st.session_state.uploaded_file = uploaded_file
-        if st.session_state.inflow_df is None:
-            st.session_state.inflow_df, st.session_state.outflow_df, st.session_state.budget_df = load_excel(uploaded_file)
+        # Only the name: holding the upload would keep the workbook's bytes alive
+        st.session_state.uploaded_file = uploaded_file.name
+        frames = session_frames()
+        if frames.get('inflow_df') is None:
+            frames['inflow_df'], frames['outflow_df'], frames['budget_df'] = load_excel(uploaded_file)
 
         st.subheader("Inflow Data")
-        st.dataframe(st.session_state.inflow_df)
-
-        col1, col2 = st.columns(2)
-        with col1:
-            purchase_button = st.button("Purchase")
-        with col2:
-            distribution_button = st.button("Distribution")
-
-        if purchase_button:
-            submit_purchase_form()
+        st.dataframe(frames['inflow_df'])
+        export_panel()
 
-        if distribution_button:
-            submit_distribution_form(inflow_df, outflow_df)
+        data_entry()
 
         st.subheader("Data Visualization")
-        if st.session_state.inflow_df is not None and not st.session_state.inflow_df.empty:
-            fig1 = px.pie(st.session_state.inflow_df, names='Item_Type', title='Distribution of Items by Type')
-            st.plotly_chart(fig1)
-
-            st.session_state.inflow_df['Purchase_Date'] = pd.to_datetime(st.session_state.inflow_df['Purchase_Date'])
-            monthly_purchases = st.session_state.inflow_df.groupby(st.session_state.inflow_df['Purchase_Date'].dt.strftime('%Y-%m'))[['Total_Cost']].sum()
-            fig2 = px.line(monthly_purchases, title='Monthly Purchase Trends')
-            st.plotly_chart(fig2)
-
-            inventory_status = st.session_state.inflow_df.groupby('Item_Type')[['Quantity_Left']].sum()
-            fig3 = px.bar(inventory_status, title='Current Inventory Status by Item Type')
-            st.plotly_chart(fig3)
+        show_charts()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,54 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import build_excel
+
+
+class WorkbookExporter:
+    """Build workbook exports in a background thread, one per data version.
+
+    Form submits only call ``request`` and return straight away; the page
+    asks ``ready`` for the bytes and shows the download button once they
+    exist. A version that is already built or being built is not queued
+    again, and newer versions of the same session supersede older ones.
+
+    The frames are handed to the build as they are, without a copy: the
+    app replaces a session's frames instead of changing them in place, so
+    a queued build always sees the version it was requested for.
+    """
+
+    def __init__(self, max_workers=2, max_results=32):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="excel-export")
+        self.max_results = max_results
+        self.jobs = OrderedDict()  # (session, version) -> Future
+        self._lock = threading.Lock()
+
+    def request(self, session, version, inflow_df, outflow_df, budget_df):
+        key = (session, version)
+        with self._lock:
+            if key in self.jobs:
+                return self.jobs[key]
+            # The session only ever downloads its latest version
+            for stale in [k for k in self.jobs if k[0] == session and k[1] < version]:
+                self.jobs.pop(stale).cancel()
+            job = self.executor.submit(build_excel, inflow_df, outflow_df, budget_df)
+            self.jobs[key] = job
+            while len(self.jobs) > self.max_results:
+                self.jobs.popitem(last=False)
+            return job
+
+    def ready(self, session, version):
+        """Export bytes once built, otherwise None"""
+        with self._lock:
+            job = self.jobs.get((session, version))
+        if job is None or not job.done() or job.cancelled() or job.exception() is not None:
+            return None
+        return job.result()
+
+    def error(self, session, version):
+        with self._lock:
+            job = self.jobs.get((session, version))
+        if job is None or not job.done() or job.cancelled():
+            return None
+        return job.exception()
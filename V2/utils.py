@@ -13,28 +13,16 @@ def load_excel(file):
         st.error(f"Error loading Excel file: {str(e)}")
         return None, None, None
 
-def save_excel(original_file, inflow_df, outflow_df, budget_df):
-    """Save updated data back to Excel file"""
-    try:
-        # Create a BytesIO object to store the Excel file
-        buffer = BytesIO()
-        
-        # Create Excel writer object
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            inflow_df.to_excel(writer, sheet_name='Inflow', index=False)
-            outflow_df.to_excel(writer, sheet_name='Outflow', index=False)
-            budget_df.to_excel(writer, sheet_name='Budget', index=False)
-        
-        # Get the value of the BytesIO buffer
-        excel_data = buffer.getvalue()
-        
-        # Create download button
-        st.download_button(
-            label="Download updated Excel file",
-            data=excel_data,
-            file_name="updated_inventory.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        
-    except Exception as e:
-        st.error(f"Error saving Excel file: {str(e)}") 
\ No newline at end of file
+def build_excel(inflow_df, outflow_df, budget_df):
+    """Serialize the three sheets into xlsx bytes"""
+    # Create a BytesIO object to store the Excel file
+    buffer = BytesIO()
+    
+    # Create Excel writer object
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        inflow_df.to_excel(writer, sheet_name='Inflow', index=False)
+        outflow_df.to_excel(writer, sheet_name='Outflow', index=False)
+        budget_df.to_excel(writer, sheet_name='Budget', index=False)
+    
+    # Get the value of the BytesIO buffer
+    return buffer.getvalue()
@@ -1,13 +1,47 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime
 import os
+import sys
+import uuid
+
+# Shared modules live at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app_sections import (budget_year_picker, distribute_page, get_cube, get_filter_indexes,
+                          lot_costing_tab, purchase_trends_tab, report_panel, summary_section)
+from budget_ledger import BudgetLedger
+from consolidation import consolidate, ingest_pool, site_names
+from dashboard import (create_visualizations, department_summary, describe_cube,
+                       item_type_summary, type_distribution_summary, types_summary)
+from filter_index import filter_cube, filter_key, filter_tables
+from filter_widgets import filter_sidebar
+from id_allocator import IdAllocator
+from session_store import SessionStore
+from top_n import TopNService, largest_rows
+
+# Workbook loaded as if uploaded when nothing is, e.g. by load_test.py
+WORKBOOK_PATH = os.environ.get("INVENTORY_WORKBOOK")
+# Last Item_ID issued, shared by every session and server process;
+# INVENTORY_ID_FILE keeps it elsewhere, e.g. in load_test.py's scratch directory
+ITEM_ID_FILE = os.environ.get("INVENTORY_ID_FILE",
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), "item_ids.counter"))
 
 def load_data():
     """Load data from all sheets into pandas DataFrames"""
-    uploaded_file = st.file_uploader("Choose an Excel file", type=['xlsx'])
+    uploaded_files = st.file_uploader("Choose an Excel file, or one per site to consolidate them",
+                                      type=['xlsx'], accept_multiple_files=True, key="workbook")
+    if len(uploaded_files or []) > 1:
+        try:
+            inflow_df, outflow_df, budget_df, stats = get_consolidated(data_version(), uploaded_files)
+            with st.expander(f"Consolidated {len(stats)} site workbooks"):
+                st.dataframe(stats)
+            # Purchases are saved to one site's workbook, so there is no file to write to
+            return inflow_df, outflow_df, budget_df, None
+        except Exception as e:
+            st.error(f"Error loading data: {str(e)}")
+            return None, None, None, None
+    uploaded_file = uploaded_files[0] if uploaded_files else WORKBOOK_PATH
     # fetch the local path of the uploaded file 
 
     if uploaded_file:
@@ -26,52 +60,94 @@ def load_data():
             # budget_df['Actual_Amount_Spent'] = pd.to_numeric(budget_df['Actual_Amount_Spent'], errors='coerce')         
 
 
-            filepath = os.path.join(os.path.dirname(__file__), uploaded_file.name)
+            name = uploaded_file if isinstance(uploaded_file, str) else uploaded_file.name
+            filepath = os.path.join(os.path.dirname(__file__), os.path.basename(name))
             return inflow_df, outflow_df, budget_df, filepath
         except Exception as e:
             st.error(f"Error loading data: {str(e)}")
             return None, None, None, None
     return None, None, None, None
 
-def generate_summary_report(inflow_df, outflow_df, budget_df):
+def data_version():
+    """Version of the uploaded workbooks: a new upload gets a new file id"""
+    uploaded_files = st.session_state.get("workbook")
+    if not uploaded_files:
+        return WORKBOOK_PATH
+    if len(uploaded_files) == 1:
+        return uploaded_files[0].file_id
+    return tuple(uploaded_file.file_id for uploaded_file in uploaded_files)
+
+@st.cache_resource
+def get_ingest_pool():
+    """Process pool parsing site workbooks, shared by every session"""
+    return ingest_pool()
+
+@st.cache_data(max_entries=4, show_spinner="Consolidating site workbooks...")
+def get_consolidated(version, _uploaded_files):
+    """Site workbooks parsed in parallel and merged, once per set of uploads"""
+    sites = site_names([uploaded_file.name for uploaded_file in _uploaded_files])
+    workbooks = [uploaded_file.getvalue() for uploaded_file in _uploaded_files]
+    return consolidate(zip(sites, workbooks), executor=get_ingest_pool())
+
+@st.cache_resource
+def get_id_allocator():
+    """Item_IDs unique across sessions and processes, 12 digits like the earlier timestamp IDs"""
+    return IdAllocator(ITEM_ID_FILE, digits=12)
+
+def next_item_id(inflow_df):
+    """A new Item_ID, above every ID of the loaded workbook"""
+    allocator = get_id_allocator()
+    # The workbook's IDs are looked at once per upload, not on every purchase
+    version = data_version()
+    if st.session_state.get("item_ids_seen", ()) != (version,):
+        allocator.advance_past(inflow_df['Item_ID'])
+        st.session_state.item_ids_seen = (version,)
+    return allocator.next_id()
+
+@st.cache_resource
+def get_session_store():
+    """Frames of every session, spilled to disk when idle or over the memory caps"""
+    return SessionStore()
+
+def session_frames():
+    """This session's frames in the shared session store"""
+    if 'store_session' not in st.session_state:
+        st.session_state.store_session = uuid.uuid4().hex
+    return get_session_store().frames(st.session_state.store_session)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def get_top_n(version):
+    """Top-N trackers for one uploaded workbook"""
+    return TopNService()
+
+def sync_top_n(version, inflow_df, outflow_df):
+    """Feed rows added since the last run to the Top-N trackers"""
+    service = get_top_n(version)
+    service.sync('Inflow', inflow_df, version)
+    service.sync('Outflow', outflow_df, version)
+    return service
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_budget_ledger(version, _budget_df, _cube):
+    """Budget ledger rolled up from the cube, built once per workbook version and filter"""
+    return BudgetLedger.from_cube(_budget_df, _cube)
+
+def generate_summary_report(cube, ledger, budget_year=None):
     """Create summary of Event Types and Item Types"""
-    # Get unique types
-    event_types = pd.concat([
-        outflow_df['Event_Type'],
-        budget_df['Event_Type']
-    ]).unique()
-    
-    item_types = pd.concat([
-        inflow_df['Item_Type'],
-        outflow_df['Item_Type']
-    ]).unique()
-    
-    # Create summary DataFrames
-    event_type_summary = pd.DataFrame({
-        'Event_Type': event_types,
-        'Total_Budget': [budget_df[budget_df['Event_Type'] == et]['2025_Budget_Amount'].sum() for et in event_types],
-        'Total_Distributions': [outflow_df[outflow_df['Event_Type'] == et]['Cost_per_Item'].mul(outflow_df['Quantity']).sum() for et in event_types],
-        'Distribution_Count': [outflow_df[outflow_df['Event_Type'] == et].shape[0] for et in event_types]
-    })
-    
-    item_type_summary = pd.DataFrame({
-        'Item_Type': item_types,
-        'Total_Purchases': [inflow_df[inflow_df['Item_Type'] == it]['Total_Cost'].sum() for it in item_types],
-        'Total_Distributions': [outflow_df[outflow_df['Item_Type'] == it]['Cost_per_Item'].mul(outflow_df['Quantity']).sum() for it in item_types],
-        'Purchase_Count': [inflow_df[inflow_df['Item_Type'] == it].shape[0] for it in item_types],
-        'Distribution_Count': [outflow_df[outflow_df['Item_Type'] == it].shape[0] for it in item_types]
-    })
-    
-    return event_type_summary, item_type_summary
+    # One rollup per dimension instead of a scan per type
+    return types_summary(cube, ledger, budget_year)
 
 def purchase_page(inflow_df, filepath):
     """Purchase Form Page"""
     st.header("Add New Purchase")
-    
-    # Initialize session state for temporary records
-    if "temp_records" not in st.session_state:
-        st.session_state.temp_records = []
+    if inflow_df is not None and filepath is None:
+        st.info("Purchases are saved to a site's own workbook; upload that workbook alone to add purchases.")
+        return
+    purchase_form(inflow_df, filepath)
 
+@st.fragment
+def purchase_form(inflow_df, filepath):
+    """Purchase form and its submission; submitting reruns only this fragment"""
     purchase_form = st.form("purchaseform")
     with purchase_form:
         # Required fields
@@ -125,7 +201,7 @@ def purchase_page(inflow_df, filepath):
             st.error("Please fill in all required fields marked with *")
         else:
             # Generate unique item ID
-            item_id = datetime.now().strftime("%y%m%d%H%M%S")
+            item_id = next_item_id(inflow_df)
             total_cost = cost_per_item * quantity
             purchase_date_pd = pd.to_datetime(purchase_date)
 
@@ -147,19 +223,25 @@ def purchase_page(inflow_df, filepath):
                 'Submission_Timestamp': pd.to_datetime(datetime.now())
             }
 
-            # Append to session state
-            st.session_state.temp_records.append(purchase_data)
-
             try:
-                # Create DataFrame for new records
-                new_records_df = pd.DataFrame(st.session_state.temp_records)
+                # The session store keeps the Inflow this session last saved and only the records
+                # not written yet, so the records do not pile up and get concatenated on every submit
+                frames = session_frames()
+                if st.session_state.get("saved_inflow_version") != data_version():
+                    # Nothing saved for this workbook yet
+                    frames['saved_inflow'], frames['temp_records'] = inflow_df, None
+                    st.session_state.saved_inflow_version = data_version()
+                    st.session_state.saved_inflow_start = len(inflow_df)
+                new_records_df = pd.concat([frames.get('temp_records'), pd.DataFrame([purchase_data])],
+                                           ignore_index=True)
+                frames['temp_records'] = new_records_df
                 
                 # Ensure date columns are datetime formatted
                 new_records_df['Purchase_Date'] = pd.to_datetime(new_records_df['Purchase_Date'])
                 new_records_df['Submission_Timestamp'] = pd.to_datetime(new_records_df['Submission_Timestamp'])
                 
-                # Concatenate with original data
-                updated_df = pd.concat([inflow_df, new_records_df], ignore_index=True)
+                # Concatenate with the data saved so far
+                updated_df = pd.concat([frames['saved_inflow'], new_records_df], ignore_index=True)
 
                 st.success("Data successfully saved!")
 
@@ -167,15 +249,18 @@ def purchase_page(inflow_df, filepath):
                 st.header("Updated Inflow Data")
                 st.write(updated_df)
 
-                # Display session submissions
+                # Display session submissions: every row after the workbook's own
                 st.header("Current Session Submissions")
-                st.write(new_records_df)
+                st.write(updated_df.iloc[st.session_state.saved_inflow_start:])
 
                 # Save updated data to Excel
                 try:
                     with pd.ExcelWriter(filepath, mode='w', engine='openpyxl') as writer:
-                        updated_df['Purchase_Date'] = updated_df['Purchase_Date'].dt.date
-                        updated_df.to_excel(writer, sheet_name='Inflow', index=False)
+                        # Dates without a time in the sheet; the kept frame stays datetime
+                        sheet = updated_df.copy(deep=False)
+                        sheet['Purchase_Date'] = pd.to_datetime(sheet['Purchase_Date']).dt.date
+                        sheet.to_excel(writer, sheet_name='Inflow', index=False)
+                    frames['saved_inflow'], frames['temp_records'] = updated_df, None
                 except Exception as e: 
                     st.error(f"Error saving data: {e}")
 
@@ -187,184 +272,6 @@ def purchase_page(inflow_df, filepath):
 
 
 
-def distribute_page():
-    """Distribution Form Page"""
-    st.header("Distribute Items")
-    
-    # Load current data
-    inflow_df, outflow_df, budget_df = load_data()
-    
-    if inflow_df is None:
-        return
-    
-    # Show available items
-    st.subheader("Available Items")
-    available_items = inflow_df[['Item_ID', 'Item_Type', 'Item_name', 'Quantity', 'Cost_per_Item']]
-    available_items = available_items[available_items['Quantity'] > 0]  # Only show items with quantity > 0
-    st.dataframe(available_items)
-    
-    with st.form("distribution_form"):
-        # Item Selection
-        selected_item = st.selectbox(
-            "Select Item to Distribute*",
-            options=available_items['Item_ID'].tolist(),
-            format_func=lambda x: f"{x} - {available_items[available_items['Item_ID'] == x]['Item_name'].iloc[0]}"
-        )
-        
-        # Get selected item details
-        item_details = available_items[available_items['Item_ID'] == selected_item].iloc[0]
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            # Required fields
-            department = st.text_input(
-                "Department*",
-                help="Enter the receiving department"
-            )
-            
-            gift = st.selectbox(
-                "Gift*",
-                options=['Yes', 'No'],
-                help="Is this a gift?"
-            )
-            
-            quantity = st.number_input(
-                "Quantity*",
-                min_value=1,
-                max_value=int(item_details['Quantity']),
-                help=f"Available quantity: {item_details['Quantity']}"
-            )
-        
-        with col2:
-            event_type = st.selectbox(
-                "Event Type*",
-                options=budget_df['Event_Type'].unique().tolist(),
-                help="Select the type of event"
-            )
-            
-            event_name = st.text_input(
-                "Event Name*",
-                help="Enter the name of the event"
-            )
-            
-            distribution_date = st.date_input(
-                "Distribution Date*",
-                help="Select the date of distribution"
-            )
-        
-        # Optional Notes
-        notes = st.text_area(
-            "Notes (Optional)",
-            help="Add any additional information"
-        )
-        
-        submitted = st.form_submit_button("Submit Distribution")
-        
-        if submitted:
-            # Validate required fields
-            if not all([department, event_type, event_name]):
-                st.error("Please fill in all required fields marked with *")
-                return
-            
-            # Prepare distribution data
-            distribution_data = {
-                'Item_ID': selected_item,
-                'Event_Type': event_type,
-                'Event_Name': event_name,
-                'Department': department,
-                'Gift': gift,
-                'Quantity': quantity,
-                'Cost_per_Item': item_details['Cost_per_Item'],
-                'Item_Code': '',  # Leave blank or generate if needed
-                'Contact_Name_(Event)': '',  # Can be added to form if needed
-                'Item_Type': item_details['Item_Type'],
-                'Gift_Type': 'Regular' if gift == 'No' else 'Gift',
-                'Date_of_Distribution': distribution_date.strftime('%Y-%m-%d'),
-                'Completion_Status': 'Completed'
-            }
-            
-            # Display the data that will be added
-            st.success("Here's what will be added to the Outflow sheet:")
-            st.write(distribution_data)
-            
-
-def create_visualizations(inflow_df, outflow_df, budget_df):
-    """Create visualizations using plotly"""
-    # Total Inflow vs Outflow Bar Chart
-    fig1 = go.Figure(data=[
-        go.Bar(name='Total Purchases', x=['Total'], y=[inflow_df['Total_Cost'].sum()]),
-        go.Bar(name='Total Distributions', x=['Total'], 
-               y=[outflow_df['Cost_per_Item'].mul(outflow_df['Quantity']).sum()])
-    ])
-    fig1.update_layout(title='Total Purchases vs Distributions')
-
-    # Item Type Distribution for Inflow
-    inflow_by_type = inflow_df.groupby('Item_Type')['Total_Cost'].sum()
-    fig2 = px.pie(values=inflow_by_type.values,
-                  names=inflow_by_type.index,
-                  title='Purchase Distribution by Item Type')
-
-    # Department-wise Distribution for Outflow
-    outflow_by_dept = outflow_df.groupby('Department')['Cost_per_Item'].sum()
-    fig3 = px.pie(values=outflow_by_dept.values,
-                  names=outflow_by_dept.index,
-                  title='Distribution by Department')
-
-    # Budget vs Actual Spending
-    fig4 = go.Figure(data=[
-        go.Bar(name='Budget Amount', x=budget_df['Event_Type'], y=budget_df['2025_Budget_Amount']),
-        go.Bar(name='Actual Spent', x=budget_df['Event_Type'], y=budget_df['Actual_Amount_Spent'])
-    ])
-    fig4.update_layout(title='Budget vs Actual Spending by Event Type',
-                      barmode='group')
-
-    # New visualization: Item Count by Type Pie Chart
-    item_type_counts = inflow_df.groupby('Item_Type')['Quantity'].sum()
-    fig5 = px.pie(
-        values=item_type_counts.values,
-        names=item_type_counts.index,
-        title='Item Distribution by Type',
-        hole=0.4  # Makes it a donut chart
-    )
-    fig5.update_traces(textposition='inside', textinfo='percent+label')
-
-    # New visualization: Purchase Costs Over Time
-    # Date is already in datetime format from load_data()
-    daily_costs = inflow_df.groupby('Purchase_Date')['Total_Cost'].sum().reset_index()
-    
-    fig6 = go.Figure()
-    fig6.add_trace(go.Scatter(
-        x=daily_costs['Purchase_Date'],
-        y=daily_costs['Total_Cost'],
-        mode='lines+markers',
-        name='Daily Purchase Cost',
-        hovertemplate='Date: %{x|%d/%m/%Y}<br>Cost: $%{y:,.2f}<extra></extra>'
-    ))
-    
-    # Add trend line
-    fig6.add_trace(go.Scatter(
-        x=daily_costs['Purchase_Date'],
-        y=daily_costs['Total_Cost'].rolling(window=7).mean(),
-        mode='lines',
-        name='7-day Moving Average',
-        line=dict(dash='dash'),
-        hovertemplate='Date: %{x|%d/%m/%Y}<br>Average: $%{y:,.2f}<extra></extra>'
-    ))
-    
-    fig6.update_layout(
-        title='Purchase Costs Over Time',
-        xaxis_title='Date',
-        yaxis_title='Total Cost ($)',
-        hovermode='x unified',
-        xaxis=dict(
-            tickformat='%d/%m/%Y',
-            tickangle=45
-        )
-    )
-
-    return fig1, fig2, fig3, fig4, fig5, fig6          
-
-
 def main():
     st.title('Inventory Management System')
     # Sidebar navigation
@@ -374,10 +281,22 @@ def main():
     if page == 'Purchase':
         purchase_page(inflow_df, filepath)
     elif page == 'Distribute':
-        distribute_page()
+        distribute_page(data_version(), inflow_df, budget_df)
     else:  # View Data page
         try:
             if inflow_df is not None:
+                # Cross-filter every table, chart and KPI from the sidebar selection
+                version = data_version()
+                top_n = sync_top_n(version, inflow_df, outflow_df)
+                indexes = get_filter_indexes(version, inflow_df, outflow_df)
+                filters = filter_sidebar(indexes)
+                all_inflow_df, all_outflow_df = inflow_df, outflow_df
+                inflow_df, outflow_df, budget_df = filter_tables(indexes, inflow_df, outflow_df, budget_df, filters)
+                if filter_key(filters):
+                    # The trackers cover the whole history; filtered views rank directly
+                    top_n = None
+                    st.caption(f"Filtered to {len(inflow_df):,} purchases and {len(outflow_df):,} distributions")
+
                 # Data Tables Section
                 st.header('Current Inventory')
                 tabs = st.tabs(['Inflow', 'Outflow', 'Budget'])
@@ -388,21 +307,33 @@ def main():
                 # Visualizations Section
                 st.header('Data Visualizations')
                 
+                # Roll every chart and table up from the aggregate cube
+                cube = filter_cube(get_cube(version, all_inflow_df, all_outflow_df), filters)
+                if cube is None:
+                    # Vendors are not a cube dimension: roll up the filtered rows
+                    cube = get_cube((version, filter_key(filters)), inflow_df, outflow_df)
+                ledger = get_budget_ledger((version, filter_key(filters)), budget_df, cube)
+                st.caption(describe_cube(cube))
+                
+                # Compare any budgeted year against the Outflow actuals
+                budget_year = budget_year_picker(ledger)
+                
                 # Create visualizations
-                fig1, fig2, fig3, fig4, fig5, fig6 = create_visualizations(inflow_df, outflow_df, budget_df)
+                fig1, fig2, fig3, fig4, fig5, fig6 = create_visualizations(cube, ledger, budget_year)
                 
                 # Display main metrics
                 col1, col2, col3 = st.columns(3)
-                total_purchases = inflow_df['Total_Cost'].sum()
-                total_distributions = outflow_df['Cost_per_Item'].mul(outflow_df['Quantity']).sum()
-                total_budget = budget_df['2025_Budget_Amount'].sum()
+                total_purchases = cube.total('Inflow', 'Value')
+                total_distributions = cube.total('Outflow', 'Value')
+                total_budget, total_spent, _ = ledger.totals(budget_year)
                 
                 with col1:
                     st.metric("Total Purchases", f"${total_purchases:,.2f}")
                 with col2:
                     st.metric("Total Distributions", f"${total_distributions:,.2f}")
                 with col3:
-                    st.metric("Total Budget", f"${total_budget:,.2f}")
+                    st.metric(f"Total Budget ({budget_year})", f"${total_budget:,.2f}",
+                              f"${total_spent:,.2f} spent", delta_color="off")
                 
                 # Display visualizations in tabs
                 viz_tabs = st.tabs([
@@ -411,7 +342,8 @@ def main():
                     'Department Analysis',
                     'Budget Analysis',
                     'Item Distribution',
-                    'Purchase Trends'
+                    'Purchase Trends',
+                    'Lot Costing'
                 ])
                 
                 with viz_tabs[0]:
@@ -421,14 +353,14 @@ def main():
                     col1, col2 = st.columns(2)
                     with col1:
                         st.subheader("Top 5 Items by Quantity")
-                        top_items = inflow_df.nlargest(5, 'Quantity')[
+                        top_items = largest_rows(top_n, 'items_by_quantity', inflow_df, 5, 'Quantity')[
                             ['Item_name', 'Quantity', 'Total_Cost']
                         ]
                         st.dataframe(top_items)
                     
                     with col2:
                         st.subheader("Recent Distributions")
-                        recent_dist = outflow_df.nlargest(5, 'Date_of_Distribution')[
+                        recent_dist = largest_rows(top_n, 'recent_distributions', outflow_df, 5, 'Date_of_Distribution')[
                             ['Event_Name', 'Department', 'Quantity', 'Date_of_Distribution']
                         ]
                         # Format the date column
@@ -440,10 +372,7 @@ def main():
                     
                     # Item type summary
                     st.subheader("Item Type Summary")
-                    item_summary = inflow_df.groupby('Item_Type').agg({
-                        'Quantity': 'sum',
-                        'Total_Cost': 'sum'
-                    }).reset_index()
+                    item_summary = item_type_summary(cube)
                     st.dataframe(item_summary)
                 
                 with viz_tabs[2]:
@@ -451,36 +380,28 @@ def main():
                     
                     # Department distribution summary
                     st.subheader("Department Distribution Summary")
-                    dept_summary = outflow_df.groupby('Department').agg({
-                        'Quantity': 'sum',
-                        'Cost_per_Item': lambda x: (x * outflow_df.loc[x.index, 'Quantity']).sum()
-                    }).reset_index()
-                    dept_summary.columns = ['Department', 'Total Items', 'Total Value']
+                    dept_summary = department_summary(cube)
                     st.dataframe(dept_summary)
                 
                 with viz_tabs[3]:
                     st.plotly_chart(fig4, use_container_width=True)
                     
-                    # Budget utilization
-                    st.subheader("Budget Utilization")
-                    budget_summary = budget_df[['Event_Type', '2025_Budget_Amount', 'Actual_Amount_Spent']]
-                    budget_summary['Utilization %'] = (
-                        budget_summary['Actual_Amount_Spent'] / 
-                        budget_summary['2025_Budget_Amount'] * 100
-                    ).round(2)
-                    st.dataframe(budget_summary)
+                    # Budget utilization, with actuals computed from Outflow
+                    st.subheader(f"Budget Utilization ({budget_year})")
+                    budget_summary = ledger.report(budget_year)
+                    st.dataframe(budget_summary.style.format({
+                        'Budget_Amount': '${:,.2f}',
+                        'Actual_Amount_Spent': '${:,.2f}',
+                        'Remaining': '${:,.2f}',
+                        'Utilization %': '{:,.2f}'
+                    }))
                 
                 with viz_tabs[4]:  # New Item Distribution tab
                     st.plotly_chart(fig5, use_container_width=True)
                     
                     # Add summary table
                     st.subheader("Item Type Distribution Summary")
-                    type_summary = inflow_df.groupby('Item_Type').agg({
-                        'Quantity': 'sum',
-                        'Total_Cost': 'sum',
-                        'Item_name': 'count'
-                    }).reset_index()
-                    type_summary.columns = ['Item Type', 'Total Quantity', 'Total Cost', 'Unique Items']
+                    type_summary = type_distribution_summary(cube)
                     st.dataframe(type_summary.style.format({
                         'Total Cost': '${:,.2f}',
                         'Total Quantity': '{:,}',
@@ -489,73 +410,21 @@ def main():
                 
                 with viz_tabs[5]:  # New Purchase Trends tab
                     st.plotly_chart(fig6, use_container_width=True)
-                    
-                    # Add monthly summary
-                    st.subheader("Monthly Purchase Summary")
-                    monthly_summary = inflow_df.set_index('Purchase_Date').resample('ME').agg({
-                        'Total_Cost': 'sum',
-                        'Quantity': 'sum',
-                        'Item_name': 'count'
-                    }).reset_index()
-                    monthly_summary.columns = ['Month', 'Total Cost', 'Items Purchased', 'Unique Items']
-                    # Format the month in dd/mm/yyyy
-                    monthly_summary['Month'] = monthly_summary['Month'].dt.strftime('%d/%m/%Y')
-                    st.dataframe(monthly_summary.style.format({
-                        'Total Cost': '${:,.2f}',
-                        'Items Purchased': '{:,}',
-                        'Unique Items': '{:,}'
-                    }))
+                    purchase_trends_tab(cube)
+                
+                with viz_tabs[6]:  # FIFO lot costing
+                    lot_costing_tab(version, all_inflow_df, all_outflow_df)
                 
                 # Add Text Summary Section
                 st.header('Summary Report')
                 st.markdown("""---""")  # Horizontal line
-
-                # Calculate key metrics
-                total_purchases = inflow_df['Total_Cost'].sum()  # Sum of Total_Cost from Inflow sheet
-                total_distributions = outflow_df['Total_Cost'].sum()  # Sum of Total_Cost from Outflow sheet
-                total_items_purchased = inflow_df['Quantity'].sum()
-                total_items_distributed = outflow_df['Quantity'].sum()
-                items_in_stock = total_items_purchased - total_items_distributed
-                budget_utilization = (budget_df['Actual_Amount_Spent'].sum() / budget_df['2025_Budget_Amount'].sum() * 100).round(2)
-                
-                # Get top departments and items
-                top_departments = outflow_df.groupby('Department')['Quantity'].sum().nlargest(3)
-                top_items = inflow_df.groupby('Item_name')['Quantity'].sum().nlargest(3)
-                
-                # Create summary text
-                summary_text = f"""
-                ### Inventory Overview
-                As of {datetime.now().strftime('%B %d, %Y')}, our inventory system shows the following key metrics:
-
-                **Financial Summary:**
-                - Total purchases amount to ${total_purchases:,.2f}
-                - Total distributions value is ${total_distributions:,.2f}
-                - Current budget utilization is {budget_utilization}% of the total ${total_budget:,.2f} budget
-
-                **Inventory Status:**
-                - Total items purchased: {total_items_purchased:,}
-                - Total items distributed: {total_items_distributed:,}
-                - Current items in stock: {items_in_stock:,}
-
-                **Top Performing Departments:**
-                {', '.join([f"{dept} ({qty:,} items)" for dept, qty in top_departments.items()])}
-
-                **Most Active Items:**
-                {', '.join([f"{item} ({qty:,} units)" for item, qty in top_items.items()])}
-
-                **Key Observations:**
-                - {'Budget utilization is within expected range' if budget_utilization < 80 else 'Budget utilization is high and needs attention'}
-                - {'Inventory levels are healthy' if items_in_stock > 100 else 'Inventory levels are low and may need restocking'}
-                - The distribution pattern shows {outflow_df['Department'].nunique()} active departments
-                """
-                
-                st.markdown(summary_text)
+                summary_section(version, cube, ledger, top_n, inflow_df, outflow_df,
+                                all_inflow_df, all_outflow_df, budget_year)
                 
-                # Additional Notes or Recommendations
-                if budget_utilization > 80:
-                    st.warning("⚠️ Budget utilization is high. Consider reviewing spending patterns.")
-                if items_in_stock < 100:
-                    st.warning("⚠️ Low inventory levels detected. Consider restocking popular items.")
+                # Build the exportable report off the request path
+                # A job only exists once exported, so selections that are never exported cost nothing
+                report_panel(version, filters, inflow_df, outflow_df, budget_df,
+                             all_inflow_df, all_outflow_df, cube)
 
         except Exception as e:
             st.error(f"Error loading data: {str(e)}")
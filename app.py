@@ -1,17 +1,86 @@
 # Standard library imports
 import os
+import uuid
 
 # Third party imports
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 
 # Local imports
+from consolidation import consolidate, ingest_pool, site_names
+from cost_analysis import DIMENSIONS, FENCE, CostAnalysis
 from data_manager import DataManager
+from inventory_flow import DESTINATIONS, MAX_NODES, InventoryFlow
+from lazy_imports import lazy_import
+from session_store import SessionStore
+from storage_backends import available_backends, make_backend
+from vendor_analytics import FREQUENCIES, VendorAggregates
+
+# Plotly is only loaded once a chart is drawn
+px = lazy_import('plotly.express')
+go = lazy_import('plotly.graph_objects')
+
+@st.cache_resource
+def get_session_store():
+    """Frames of every session, spilled to disk when idle or over the memory caps"""
+    return SessionStore()
+
+def session_frames():
+    """This session's frames in the shared session store"""
+    if 'store_session' not in st.session_state:
+        st.session_state.store_session = uuid.uuid4().hex
+    return get_session_store().frames(st.session_state.store_session)
+
+def new_data_manager(backend=None):
+    """DataManager whose changes drop the derived views built from the changed table"""
+    # The pandas tables are kept in the session store rather than in session state
+    dm = DataManager(backend if backend is not None else make_backend('pandas', frames=session_frames()))
+    views = {}  # name -> (tables, value)
+
+    def invalidate(event):
+        for name in [name for name, (tables, _) in views.items() if event.table in tables]:
+            del views[name]
+
+    dm.subscribe(invalidate)
+    st.session_state.data_manager = dm
+    st.session_state.views = views
+    st.session_state.cost_analysis = CostAnalysis()
+    return dm
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def get_vendor_aggregates(inflow_fingerprint, _dm):
+    """Vendor aggregates, built once per Inflow contents and shared by every session"""
+    return VendorAggregates.build(_dm.get_data("inflow"))
+
+@st.cache_resource
+def get_ingest_pool():
+    """Process pool parsing site workbooks, shared by every session"""
+    return ingest_pool()
+
+@st.cache_data(max_entries=4, show_spinner="Consolidating site workbooks...")
+def get_consolidated(file_ids, _uploaded_files):
+    """Site workbooks parsed in parallel and merged, once per set of uploads"""
+    sites = site_names([uploaded_file.name for uploaded_file in _uploaded_files])
+    workbooks = [uploaded_file.getvalue() for uploaded_file in _uploaded_files]
+    return consolidate(zip(sites, workbooks), executor=get_ingest_pool())
+
+def cost_analysis():
+    """The session's unit-cost sketches, after taking in purchases added since the last run"""
+    dm = st.session_state.data_manager
+    analysis = st.session_state.cost_analysis
+    analysis.sync(dm.get_data("inflow"), dm.generation("inflow"))
+    return analysis
+
+def cached_view(name, tables, compute):
+    """Derived data reused across reruns until one of ``tables`` changes"""
+    views = st.session_state.views
+    if name not in views:
+        views[name] = (set(tables), compute())
+    return views[name][1]
 
 # Initialize DataManager
 if 'data_manager' not in st.session_state:
-    st.session_state.data_manager = DataManager()
+    new_data_manager()
 
 def main():
     st.title("Inventory Management System")
@@ -31,17 +100,46 @@ def main():
 
 def show_upload_page():
     st.header("Data Upload")
-    uploaded_file = st.file_uploader("Upload Excel File", type=['xlsx'])
+    backend = st.selectbox(
+        "Storage backend",
+        available_backends(),
+        help="pandas keeps the tables in memory; the SQL engines run the aggregations in the database"
+    )
+    uploaded_files = st.file_uploader("Upload Excel File, or one per site to consolidate them",
+                                      type=['xlsx'], accept_multiple_files=True)
     
-    if uploaded_file is not None:
+    if uploaded_files:
+        # The uploader keeps its files across reruns: load them once, not on every rerun, which
+        # would drop the derived views, the edit history and reload the engine's tables
+        upload_key = (backend, tuple(uploaded_file.file_id for uploaded_file in uploaded_files))
+        if st.session_state.get("loaded_upload") == upload_key:
+            stats = st.session_state.get("upload_stats")
+            if stats is not None:
+                with st.expander(f"Consolidated {len(stats)} site workbooks"):
+                    st.dataframe(stats)
+            st.success("Data uploaded successfully!")
+            return
         try:
-            # Read all sheets
-            inflow_df = pd.read_excel(uploaded_file, sheet_name="Inflow")
-            outflow_df = pd.read_excel(uploaded_file, sheet_name="Outflow")
-            budget_df = pd.read_excel(uploaded_file, sheet_name="Budget")
+            if len(uploaded_files) > 1:
+                # Site workbooks parsed in parallel, tagged with their site and merged
+                inflow_df, outflow_df, budget_df, stats = get_consolidated(upload_key[1], uploaded_files)
+                with st.expander(f"Consolidated {len(stats)} site workbooks"):
+                    st.dataframe(stats)
+            else:
+                stats = None
+                # Read all sheets
+                uploaded_file = uploaded_files[0]
+                inflow_df = pd.read_excel(uploaded_file, sheet_name="Inflow")
+                outflow_df = pd.read_excel(uploaded_file, sheet_name="Outflow")
+                budget_df = pd.read_excel(uploaded_file, sheet_name="Budget")
             
-            # Store in session state
+            # Store in session state, in the chosen backend
+            if st.session_state.data_manager.backend.name != backend:
+                # Dropping the previous backend's frames from the session store
+                session_frames().clear()
+                new_data_manager(make_backend(backend, frames=session_frames()))
             st.session_state.data_manager.set_data(inflow_df, outflow_df, budget_df)
+            st.session_state.loaded_upload, st.session_state.upload_stats = upload_key, stats
             st.success("Data uploaded successfully!")
             
         except Exception as e:
@@ -83,6 +181,11 @@ def show_management_page():
     
     data_type = st.selectbox("Select Data Type", ["Inflow", "Outflow", "Budget"])
     
+    show_edit_history()
+    dirty = st.session_state.data_manager.dirty_tables()
+    if dirty:
+        st.caption(f"Changed since upload: {', '.join(dirty)}")
+    
     if operation == "View Data":
         display_data(data_type)
     elif operation == "Add Item":
@@ -95,47 +198,203 @@ def show_management_page():
 def display_data(data_type):
     df = st.session_state.data_manager.get_data(data_type.lower())
     st.dataframe(df)
+    st.download_button(
+        label="Download as Excel",
+        # Rebuilt only after one of the tables changes, not on every rerun
+        data=cached_view("excel_export", ["inflow", "outflow", "budget"],
+                         st.session_state.data_manager.export_excel),
+        file_name="inventory.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+
+def show_edit_history():
+    """Undo/redo buttons and checkpoints for the edits made on this page"""
+    dm = st.session_state.data_manager
+    history = dm.history
+    st.sidebar.subheader("Edit History")
+    col1, col2 = st.sidebar.columns(2)
+    if col1.button("Undo", disabled=not history.can_undo()):
+        dm.undo()
+        st.rerun()
+    if col2.button("Redo", disabled=not history.can_redo()):
+        dm.redo()
+        st.rerun()
+    st.sidebar.caption(f"{len(history.done)} edits, {history.memory_usage() / 1024:,.1f} KB")
+    for description in history.recent(5):
+        st.sidebar.text(description)
+    
+    if st.sidebar.button("Save checkpoint"):
+        history.checkpoint()
+    checkpoints = dict(history.available_checkpoints())
+    if checkpoints:
+        seq = st.sidebar.selectbox("Checkpoint", list(checkpoints), format_func=checkpoints.get)
+        if st.sidebar.button("Restore checkpoint"):
+            dm.restore_checkpoint(seq)
+            st.rerun()
+
+def item_fields(df, defaults=None):
+    """One input per column of the table, typed after the column"""
+    values = {}
+    for column in df.columns:
+        default = None if defaults is None else defaults.get(column)
+        if default is not None and pd.isna(default):
+            default = None
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            date = st.date_input(column, value=default.date() if default is not None else None)
+            values[column] = pd.Timestamp(date) if date is not None else None
+        elif pd.api.types.is_integer_dtype(df[column]):
+            values[column] = int(st.number_input(column, value=int(default or 0), step=1))
+        elif pd.api.types.is_numeric_dtype(df[column]):
+            values[column] = st.number_input(column, value=float(default or 0.0))
+        else:
+            text = st.text_input(column, value="" if default is None else str(default))
+            values[column] = text or None
+    return values
 
 def add_item(data_type):
     st.subheader(f"Add New {data_type} Item")
-    # Add form fields based on data type
-    # Implementation details will be added later
+    df = st.session_state.data_manager.get_data(data_type.lower())
+    with st.form(f"add_{data_type}"):
+        values = item_fields(df)
+        if st.form_submit_button("Add Item"):
+            label = st.session_state.data_manager.add_item(data_type.lower(), values)
+            st.success(f"Added row {label}")
 
 def modify_item(data_type):
     st.subheader(f"Modify {data_type} Item")
-    # Modification form
-    # Implementation details will be added later
+    df = st.session_state.data_manager.get_data(data_type.lower())
+    if df.empty:
+        st.info("No rows to modify")
+        return
+    index = st.selectbox("Row", df.index)
+    with st.form(f"modify_{data_type}_{index}"):
+        values = item_fields(df, df.loc[index])
+        if st.form_submit_button("Save Changes"):
+            st.session_state.data_manager.modify_item(data_type.lower(), index, values)
+            st.success(f"Updated row {index}")
 
 def delete_item(data_type):
     st.subheader(f"Delete {data_type} Item")
-    # Delete interface
-    # Implementation details will be added later
+    df = st.session_state.data_manager.get_data(data_type.lower())
+    labels = st.multiselect("Rows to delete", df.index)
+    if labels:
+        st.dataframe(df.loc[labels])
+    if st.button("Delete", disabled=not labels):
+        st.session_state.data_manager.delete_item(data_type.lower(), labels)
+        st.rerun()
 
 def show_inventory_flow():
-    # Create inventory flow visualization
-    inflow_df = st.session_state.data_manager.get_data("inflow")
-    outflow_df = st.session_state.data_manager.get_data("outflow")
-    
-    # Example visualization
-    fig = px.timeline(
-        inflow_df,
-        x_start="date",
-        y="item_name",
-        color="item_type"
-    )
+    # Both charts come from backend-computed sums, so their size does not grow with the tables
+    flow = cached_view("inventory_flow", ["inflow", "outflow"],
+                       lambda: InventoryFlow.build(st.session_state.data_manager))
+    destination = st.radio("Distributed to", DESTINATIONS, horizontal=True,
+                           format_func=lambda column: column.replace("_", " "))
+    labels, links = flow.sankey(destination)
+    if links.empty:
+        st.info("No purchases or distributions to show")
+        return
+    
+    st.subheader("Inventory Flow")
+    fig = go.Figure(go.Sankey(
+        node=dict(label=labels, pad=15),
+        link=dict(source=links["source"], target=links["target"], value=links["value"])
+    ))
+    st.plotly_chart(fig)
+    st.caption(f"Vendors, item types and destinations beyond the largest {MAX_NODES} are grouped as Other")
+    
+    st.subheader("Stock Over Time")
+    item_type = st.selectbox("Item type", ["All"] + flow.item_types())
+    stock = flow.stock(None if item_type == "All" else item_type)
+    if stock.empty:
+        st.info("No dated purchases or distributions to show")
+        return
+    fig = px.line(stock, x="Day", y=["Cumulative_In", "Cumulative_Out", "Stock"])
     st.plotly_chart(fig)
 
 def show_item_types_distribution():
-    # Create item types distribution visualization
-    pass
+    # Purchased quantity and cost per item type, summed by the storage backend
+    summary = cached_view(
+        "item_types", ["inflow"],
+        lambda: st.session_state.data_manager.group_sum("inflow", by=["Item_Type"], columns=["Quantity", "Total_Cost"])
+    )
+    fig = px.pie(summary, values="Quantity", names="Item_Type", title="Items Purchased by Type")
+    st.plotly_chart(fig)
+    st.dataframe(summary)
 
 def show_vendor_analysis():
-    # Create vendor analysis visualization
-    pass
+    # Every widget below slices the cached aggregates; raw rows are read once per data version
+    dm = st.session_state.data_manager
+    aggregates = get_vendor_aggregates(dm.fingerprint("inflow"), dm)
+    summary = aggregates.summary()
+    if summary.empty:
+        st.info("No vendors found in the Inflow data")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Vendors", f"{len(summary):,}")
+    col2.metric("Total Spend", f"${summary['Spend'].sum():,.2f}")
+    col3.metric("Purchases", f"{summary['Purchases'].sum():,}")
+    st.caption("Spellings of the same vendor (name, email or phone) are counted as one vendor")
+    
+    st.subheader("Spend by Vendor")
+    fig = px.bar(summary.head(15), x="Vendor", y="Spend", hover_data=["Purchases", "Avg_Unit_Cost"])
+    st.plotly_chart(fig)
+    st.dataframe(summary)
+    
+    names = dict(zip(summary["Vendor_ID"], summary["Vendor"]))
+    selected = st.multiselect("Compare vendors", list(names), default=list(names)[:5], format_func=names.get)
+    if not selected:
+        return
+    
+    st.subheader("Average Unit Cost by Item Type")
+    unit_costs = aggregates.unit_costs(selected)
+    fig = px.bar(unit_costs, x="Item_Type", y="Avg_Unit_Cost", color="Vendor", barmode="group")
+    st.plotly_chart(fig)
+    st.dataframe(unit_costs.pivot_table(index="Vendor", columns="Item_Type", values="Avg_Unit_Cost"))
+    
+    st.subheader("Purchase Frequency")
+    period = st.radio("Period", list(FREQUENCIES), horizontal=True)
+    frequency = aggregates.frequency(selected, period)
+    fig = px.line(frequency, x="Period", y="Purchases", color="Vendor", markers=True)
+    st.plotly_chart(fig)
 
 def show_cost_analysis():
-    # Create cost analysis visualization
-    pass
+    # Percentiles are read from per-group quantile sketches, never from sorted unit costs
+    analysis = cost_analysis()
+    months = analysis.months()
+    selected_months = None
+    if len(months) > 1:
+        selected_months = st.select_slider("Months", options=months, value=(months[0], months[-1]))
+    dimension = st.radio("Group by", list(DIMENSIONS), horizontal=True)
+    column = DIMENSIONS[dimension]
+    summary = analysis.summary(dimension, selected_months)
+    if summary.empty:
+        st.info("No unit costs found in the Inflow data")
+        return
+    st.caption(f"Percentiles are approximate, within {analysis.relative_accuracy:.0%} of the exact unit cost")
+    
+    st.subheader(f"Unit Cost by {dimension}")
+    fig = px.bar(summary.head(20), x=column, y=["Median", "P90"], barmode="group")
+    st.plotly_chart(fig)
+    st.dataframe(summary)
+    
+    st.subheader("Outliers")
+    st.caption(f"Purchases more than {FENCE} interquartile ranges outside the quartiles of their {dimension.lower()}")
+    outliers = cached_view(
+        f"cost_outliers_{column}_{selected_months}", ["inflow"],
+        lambda: analysis.outliers(st.session_state.data_manager.get_data("inflow"), dimension, selected_months)
+    )
+    st.dataframe(outliers)
+    
+    st.subheader("Price Trend")
+    groups = summary[column].tolist()
+    selected = st.multiselect(dimension, groups, default=groups[:5])
+    trend = analysis.trend(dimension, selected)
+    if trend.empty:
+        st.info("No dated purchases to show")
+        return
+    fig = px.line(trend, x="Month", y="Median", color=column, markers=True, hover_data=["P90", "Purchases"])
+    st.plotly_chart(fig)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
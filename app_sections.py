@@ -0,0 +1,281 @@
+from datetime import datetime
+
+import streamlit as st
+
+from aggregate_cube import AggregateCube
+from dashboard import purchase_period_summary
+from filter_index import build_indexes, filter_key
+from filter_widgets import item_picker
+from forecasting import needs_restock, restock_forecast
+from lot_costing import fifo_costing
+from report_jobs import ReportJobs
+from search_index import SearchIndex
+from summary_report import compute_summary, summary_markdown
+from top_n import largest_groups
+
+# Cached helpers and page sections shared by the V3 and gd apps. ``version``
+# is the app's data version: caches are keyed on it, never on the frames.
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def get_cube(version, _inflow_df, _outflow_df):
+    """Aggregate cube, built once per data version (and vendor filter, which it has no dimension for)"""
+    return AggregateCube.build(_inflow_df, _outflow_df)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def get_fifo(version, key, _inflow_df, _outflow_df):
+    """FIFO lot costing over the whole history, once per data version and matching key"""
+    return fifo_costing(_inflow_df, _outflow_df, key=key)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def get_forecast(version, window_days, lead_time_days, _inflow_df, _outflow_df):
+    """Per-item distribution rate and reorder points, once per data version and settings"""
+    return restock_forecast(_inflow_df, _outflow_df, window_days=window_days, lead_time_days=lead_time_days)
+
+
+def restock_settings():
+    """Demand window and supplier lead time (days) chosen in the restock forecast settings"""
+    return (int(st.session_state.get("restock_window_days", 90)),
+            int(st.session_state.get("restock_lead_time_days", 14)))
+
+
+@st.cache_resource
+def get_report_jobs():
+    """Process pool building exported reports, shared by every session"""
+    return ReportJobs()
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def get_search_index(version, _items):
+    """Typeahead index over the distributable items, built once per data version"""
+    return SearchIndex(_items)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def get_filter_indexes(version, _inflow_df, _outflow_df):
+    """Date and category indexes behind the sidebar filters, built once per data version"""
+    return build_indexes(_inflow_df, _outflow_df)
+
+
+def budget_year_picker(ledger):
+    """Sidebar choice of the budget year, defaulting to the latest budgeted year"""
+    years = ledger.years()
+    default_year = ledger.default_year()
+    return st.sidebar.selectbox("Budget year", years,
+                                index=years.index(default_year) if default_year in years else 0)
+
+
+@st.fragment
+def purchase_trends_tab(cube):
+    """Monthly or quarterly purchase table; switching the period reruns only this tab"""
+    # Add monthly or quarterly summary
+    period = st.radio("Period", ['Monthly', 'Quarterly'], horizontal=True)
+    st.subheader(f"{period} Purchase Summary")
+    monthly_summary = purchase_period_summary(cube, freq='ME' if period == 'Monthly' else 'QE')
+    # Format the period end in dd/mm/yyyy
+    period_column = monthly_summary.columns[0]
+    monthly_summary[period_column] = monthly_summary[period_column].dt.strftime('%d/%m/%Y')
+    st.dataframe(monthly_summary.style.format({
+        'Total Cost': '${:,.2f}',
+        'Items Purchased': '{:,}',
+        'Unique Items': '{:,}'
+    }))
+
+
+@st.fragment
+def lot_costing_tab(version, inflow_df, outflow_df):
+    """FIFO lot costing; changing the matching key reruns only this tab"""
+    st.caption("Distributions are matched to purchase lots first-in-first-out over the full history, independent of the filters.")
+    basis = st.radio("Match lots by", ['Item_name', 'Item_Type'], horizontal=True)
+    fifo = get_fifo(version, basis, inflow_df, outflow_df)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Inventory Value (FIFO)", f"${fifo.inventory_value:,.2f}")
+    with col2:
+        st.metric("Cost of Goods Distributed", f"${fifo.cost_of_goods_distributed:,.2f}")
+    with col3:
+        st.metric("Unfilled Quantity", f"{fifo.unfilled_quantity:,.0f}")
+    
+    st.subheader("Largest Remaining Lots")
+    lot_columns = [column for column in ['Item_ID', basis, 'Purchase_Date', 'Quantity', 'Cost_per_Item',
+                                         'Remaining_Qty', 'Remaining_Value'] if column in fifo.lots]
+    st.dataframe(fifo.lots.nlargest(100, 'Remaining_Value')[lot_columns])
+
+
+@st.fragment
+def summary_section(version, cube, ledger, top_n, inflow_df, outflow_df,
+                    all_inflow_df, all_outflow_df, budget_year):
+    """Summary Report text and restock table; forecast settings rerun only this section"""
+    # Forecast stock-outs per item from the full distribution history
+    with st.expander("Restock forecast settings"):
+        st.number_input("Demand window (days)", min_value=7, value=90, step=1, key="restock_window_days")
+        st.number_input("Supplier lead time (days)", min_value=1, value=14, step=1, key="restock_lead_time_days")
+    forecast = get_forecast(version, *restock_settings(), all_inflow_df, all_outflow_df)
+    restock = needs_restock(forecast)
+    
+    # Get top departments and items
+    top_departments = largest_groups(top_n, 'departments_by_quantity', outflow_df, 3, 'Department', 'Quantity')
+    top_items = largest_groups(top_n, 'item_names_by_quantity', inflow_df, 3, 'Item_name', 'Quantity')
+    
+    # Calculate key metrics and create summary text
+    summary = compute_summary(cube, ledger, top_departments, top_items, restock,
+                              outflow_df['Department'].nunique(), budget_year=budget_year)
+    budget_utilization = summary['budget_utilization']
+    st.markdown(summary_markdown(summary))
+    
+    # Additional Notes or Recommendations
+    if budget_utilization > 80:
+        st.warning("⚠️ Budget utilization is high. Consider reviewing spending patterns.")
+    if len(restock):
+        st.warning(f"⚠️ {len(restock):,} items are out of stock or will run out within their supplier lead time. Consider restocking them.")
+        st.subheader("Needs Restock")
+        st.dataframe(restock.head(100).style.format({
+            'On_Hand': '{:,.0f}',
+            'Daily_Rate': '{:,.2f}',
+            'Demand_Std': '{:,.2f}',
+            'Days_of_Cover': '{:,.1f}',
+            'Reorder_Point': '{:,.1f}',
+            'Suggested_Order': '{:,.0f}'
+        }))
+
+
+@st.fragment
+def report_panel(version, filters, inflow_df, outflow_df, budget_df, all_inflow_df, all_outflow_df, cube=None):
+    """Start, poll and download the HTML export of the Summary Report"""
+    st.subheader("Export Report")
+    jobs = get_report_jobs()
+    # The report's Needs Restock is the page's: full history, the section's forecast settings
+    window_days, lead_time_days = restock_settings()
+    job_key = (version, filter_key(filters), window_days, lead_time_days)
+    status = jobs.status(job_key)
+    if status in (None, 'failed'):
+        if status == 'failed':
+            st.error(f"Report generation failed: {jobs.error(job_key)}")
+        if st.button("Generate HTML report"):
+            restock = needs_restock(get_forecast(version, window_days, lead_time_days,
+                                                 all_inflow_df, all_outflow_df))
+            jobs.submit(job_key, inflow_df, outflow_df, budget_df, cube=cube, restock=restock)
+            status = jobs.status(job_key)
+    if status in ('pending', 'running'):
+        st.info("The report is being generated in the background. You can keep using the page.")
+        # Only this panel reruns while polling
+        st.button("Check report status")
+    elif status == 'done':
+        st.download_button(
+            label="Download report",
+            data=jobs.result(job_key),
+            file_name=f"inventory_report_{datetime.now().strftime('%Y%m%d')}.html",
+            mime="text/html"
+        )
+
+
+def distribute_page(version, inflow_df, budget_df, on_submit=None):
+    """Distribution Form Page; ``on_submit`` is called with the data of each submitted distribution"""
+    st.header("Distribute Items")
+    
+    if inflow_df is None:
+        return
+    
+    # Show available items
+    st.subheader("Available Items")
+    available_items = inflow_df[['Item_ID', 'Item_Type', 'Item_name', 'Quantity', 'Cost_per_Item']]
+    available_items = available_items[available_items['Quantity'] > 0]  # Only show items with quantity > 0
+    st.dataframe(available_items)
+    
+    index = get_search_index(version, inflow_df[inflow_df['Quantity'] > 0])
+    distribution_form(available_items, budget_df, index, on_submit)
+
+
+@st.fragment
+def distribution_form(available_items, budget_df, index, on_submit=None):
+    """Item picker and distribution form; searching, picking an item or submitting reruns only this fragment"""
+    if not len(index):
+        st.info("No items are available to distribute.")
+        return
+    # Item Selection, outside the form so the quantity limit follows the selected item.
+    # Only the best matches of the search are rendered as options.
+    selected_item = item_picker(index, "Select Item to Distribute*", key="distribute_item")
+    if selected_item is None:
+        return
+    
+    # Get selected item details
+    item_details = available_items[available_items['Item_ID'] == selected_item].iloc[0]
+    
+    with st.form("distribution_form"):
+        col1, col2 = st.columns(2)
+        with col1:
+            # Required fields
+            department = st.text_input(
+                "Department*",
+                help="Enter the receiving department"
+            )
+            
+            gift = st.selectbox(
+                "Gift*",
+                options=['Yes', 'No'],
+                help="Is this a gift?"
+            )
+            
+            quantity = st.number_input(
+                "Quantity*",
+                min_value=1,
+                max_value=int(item_details['Quantity']),
+                help=f"Available quantity: {item_details['Quantity']}"
+            )
+        
+        with col2:
+            event_type = st.selectbox(
+                "Event Type*",
+                options=budget_df['Event_Type'].unique().tolist(),
+                help="Select the type of event"
+            )
+            
+            event_name = st.text_input(
+                "Event Name*",
+                help="Enter the name of the event"
+            )
+            
+            distribution_date = st.date_input(
+                "Distribution Date*",
+                help="Select the date of distribution"
+            )
+        
+        # Optional Notes
+        notes = st.text_area(
+            "Notes (Optional)",
+            help="Add any additional information"
+        )
+        
+        submitted = st.form_submit_button("Submit Distribution")
+        
+        if submitted:
+            # Validate required fields
+            if not all([department, event_type, event_name]):
+                st.error("Please fill in all required fields marked with *")
+                return
+            
+            # Prepare distribution data
+            distribution_data = {
+                'Item_ID': selected_item,
+                'Event_Type': event_type,
+                'Event_Name': event_name,
+                'Department': department,
+                'Gift': gift,
+                'Quantity': quantity,
+                'Cost_per_Item': item_details['Cost_per_Item'],
+                'Item_Code': '',  # Leave blank or generate if needed
+                'Contact_Name_(Event)': '',  # Can be added to form if needed
+                'Item_Type': item_details['Item_Type'],
+                'Gift_Type': 'Regular' if gift == 'No' else 'Gift',
+                'Date_of_Distribution': distribution_date.strftime('%Y-%m-%d'),
+                'Completion_Status': 'Completed'
+            }
+            
+            # Display the data that will be added
+            st.success("Here's what will be added to the Outflow sheet:")
+            st.write(distribution_data)
+            if on_submit is not None:
+                on_submit(distribution_data)
@@ -0,0 +1,188 @@
+import re
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from fingerprint import extend, rows_fingerprint
+
+# Wide Budget sheet columns such as 2025_Budget_Amount
+BUDGET_COLUMN = re.compile(r'^(\d{4})_Budget_Amount$')
+LEDGER_INDEX = ['Year', 'Event_Type']
+# Outflow columns the actuals are computed from
+ACTUALS_COLUMNS = ['Cost_per_Item', 'Quantity', 'Date_of_Distribution', 'Event_Type']
+
+
+def _empty():
+    return pd.Series(dtype=float, index=pd.MultiIndex.from_arrays([[], []], names=LEDGER_INDEX))
+
+
+def budget_long(budget_df):
+    """Budget sheet as one Budget_Amount per (Year, Event_Type).
+
+    Accepts the wide sheet with a ``<year>_Budget_Amount`` column per year
+    as well as a long sheet that already has Year and Budget_Amount
+    columns.
+    """
+    if budget_df is None or 'Event_Type' not in budget_df:
+        return _empty()
+    if {'Year', 'Budget_Amount'} <= set(budget_df.columns):
+        long = budget_df[['Year', 'Event_Type', 'Budget_Amount']]
+    else:
+        years = {}
+        for column in budget_df.columns:
+            match = BUDGET_COLUMN.match(str(column))
+            if match:
+                years[column] = int(match.group(1))
+        if not years:
+            return _empty()
+        long = budget_df.melt(id_vars='Event_Type', value_vars=list(years),
+                              var_name='Year', value_name='Budget_Amount')
+        long['Year'] = long['Year'].map(years)
+    amounts = pd.to_numeric(long['Budget_Amount'], errors='coerce').fillna(0)
+    years = pd.to_numeric(long['Year'], errors='coerce').astype('Int64')
+    return amounts.groupby([years.rename('Year'), long['Event_Type']]).sum().astype(float)
+
+
+def distribution_actuals(outflow_df):
+    """Distributed value (Cost_per_Item * Quantity) per (Year, Event_Type) in one grouped pass"""
+    if outflow_df is None or not len(outflow_df) or 'Event_Type' not in outflow_df:
+        return _empty()
+    value = (pd.to_numeric(outflow_df['Cost_per_Item'], errors='coerce')
+             * pd.to_numeric(outflow_df['Quantity'], errors='coerce')).fillna(0)
+    year = pd.to_datetime(outflow_df['Date_of_Distribution'], errors='coerce').dt.year.astype('Int64')
+    return value.groupby([year.rename('Year'), outflow_df['Event_Type']]).sum()
+
+
+class BudgetLedger:
+    """Budgets per year and Event_Type, with actual spend computed from Outflow.
+
+    Budgets are held in long form, so any year the Budget sheet carries can
+    be compared without a hardcoded column. Actuals are the value of the
+    distributions of each Event_Type in each calendar year. They come from
+    the aggregate cube when one is at hand (``from_cube``), and ``sync``
+    adds appended distributions to the running totals instead of rescanning
+    Outflow.
+
+    One ledger may be shared by concurrent sessions: every change and read
+    happens under its lock, budgets are only replaced when the Budget
+    version changes, and whether the counted distributions are unchanged is
+    decided from their content, so sessions loading Outflow in different
+    ways do not reset each other's totals.
+    """
+
+    def __init__(self, budget_df=None, max_versions=8):
+        self.budgets = budget_long(budget_df)
+        self.budget_version = None
+        self.actuals = _empty()
+        self.rows = 0
+        # Order-sensitive hash of the counted rows; None when they are not known (from_cube)
+        self.fingerprint = 0
+        # Outflow versions already synced, with their row counts
+        self.versions = OrderedDict()
+        self.max_versions = max_versions
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_cube(cls, budget_df, cube):
+        """Ledger whose actuals are rolled up from the cube's Outflow cells"""
+        ledger = cls(budget_df)
+        by_year = cube.rollup('Outflow', by=['Event_Type'], freq='YE', measures=['Value'])
+        if len(by_year):
+            year = by_year['Day'].dt.year.astype('Int64').rename('Year')
+            ledger.actuals = by_year['Value'].groupby([year, by_year['Event_Type']]).sum()
+        ledger.rows = cube.source_rows['Outflow']
+        ledger.fingerprint = None
+        return ledger
+
+    def set_budgets(self, budget_df, version=None):
+        """Replace the budgets, unless ``version`` (of the Budget sheet) is the one already set"""
+        with self._lock:
+            if version is not None and version == self.budget_version:
+                return
+            self.budgets = budget_long(budget_df)
+            self.budget_version = version
+
+    def sync(self, outflow_df, version=None):
+        """Bring actuals up to date with Outflow, reading only rows added since the last sync.
+
+        Counted rows that changed (a reload that edited or deleted rows)
+        recount Outflow; a ``version`` already synced at the current row
+        count skips reading the frame.
+        """
+        with self._lock:
+            if version is not None and self.versions.get(version) == len(outflow_df) == self.rows:
+                self.versions.move_to_end(version)
+                return
+            if len(outflow_df) < self.rows or \
+                    rows_fingerprint(outflow_df, ACTUALS_COLUMNS, 0, self.rows) != self.fingerprint:
+                self.actuals = _empty()
+                self.rows = 0
+                self.fingerprint = 0
+                self.versions.clear()
+            if len(outflow_df) > self.rows:
+                self._add(outflow_df.iloc[self.rows:])
+            if version is not None:
+                self.versions[version] = len(outflow_df)
+                self.versions.move_to_end(version)
+                while len(self.versions) > self.max_versions:
+                    self.versions.popitem(last=False)
+
+    def _add(self, rows):
+        self.actuals = self.actuals.add(distribution_actuals(rows), fill_value=0)
+        if self.fingerprint is not None:
+            self.fingerprint = extend(self.fingerprint, rows, ACTUALS_COLUMNS, self.rows)
+        self.rows += len(rows)
+
+    def years(self):
+        """Years with a budget or any spending, newest first"""
+        with self._lock:
+            years = set(self.budgets.index.get_level_values('Year').dropna())
+            years |= set(self.actuals.index.get_level_values('Year').dropna())
+        return sorted((int(year) for year in years), reverse=True)
+
+    def default_year(self):
+        """Latest budgeted year, or the latest year with spending"""
+        with self._lock:
+            budgeted = self.budgets.index.get_level_values('Year').dropna()
+        if len(budgeted):
+            return int(budgeted.max())
+        years = self.years()
+        return years[0] if years else None
+
+    def report(self, year=None):
+        """Budget vs actual per Event_Type for one year (the default year when None)"""
+        if year is None:
+            year = self.default_year()
+        with self._lock:
+            budgets, actuals = self.budgets, self.actuals
+        report = pd.DataFrame({
+            'Budget_Amount': _year(budgets, year),
+            'Actual_Amount_Spent': _year(actuals, year),
+        }).fillna(0)
+        report.index.name = 'Event_Type'
+        report['Remaining'] = report['Budget_Amount'] - report['Actual_Amount_Spent']
+        report['Utilization %'] = _utilization(report['Actual_Amount_Spent'], report['Budget_Amount'])
+        return report.reset_index()
+
+    def totals(self, year=None):
+        """Total budget, total spent and utilization % for one year"""
+        report = self.report(year)
+        budget = report['Budget_Amount'].sum()
+        spent = report['Actual_Amount_Spent'].sum()
+        return budget, spent, _utilization(spent, budget)
+
+
+def _year(series, year):
+    """One year's slice of a ledger series, indexed by Event_Type"""
+    if year is None or not len(series):
+        return pd.Series(dtype=float)
+    years = series.index.get_level_values('Year')
+    return series[years == year].droplevel('Year').groupby(level=0).sum()
+
+
+def _utilization(spent, budget):
+    """Spent as a percentage of budget, 0 where there is no budget"""
+    if isinstance(budget, pd.Series):
+        return (spent / budget.where(budget != 0) * 100).fillna(0).round(2)
+    return round(spent / budget * 100, 2) if budget else 0.0
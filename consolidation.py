@@ -0,0 +1,163 @@
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import pandas as pd
+
+SHEETS = ['Inflow', 'Outflow', 'Budget']
+
+# Parsed as dates in every workbook
+DATE_COLUMNS = {'Inflow': 'Purchase_Date', 'Outflow': 'Date_of_Distribution'}
+
+# Column tagging each consolidated row with the workbook it came from
+SITE_COLUMN = 'Site'
+
+# Spelling the dashboards expect; a header equal to one of these apart from
+# case, spaces and punctuation ("Item Name", "item-name") is renamed to it
+KNOWN_COLUMNS = ['Item_ID', 'Item_Type', 'Item_name', 'Cost_per_Item', 'Quantity', 'Code', 'Purchase_Date',
+                 'Vendor_Name', 'Vendor_Email', 'Vendor_Phone', 'Total_Cost', 'Event_Type', 'Event_Name',
+                 'Department', 'Date_of_Distribution', 'Actual_Amount_Spent', 'Year', 'Budget_Amount']
+
+
+def column_key(name):
+    return re.sub(r'[^0-9a-z]', '', str(name).lower())
+
+
+def site_names(file_names):
+    """Site of each workbook: its file name without extension, numbered when repeated"""
+    names, seen = [], {}
+    for file_name in file_names:
+        name = os.path.splitext(os.path.basename(file_name))[0] or 'site'
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name} ({seen[name]})")
+    return names
+
+
+def read_workbook(workbook):
+    """Inflow, Outflow and Budget frames of one workbook, given as bytes or a path"""
+    source = BytesIO(workbook) if isinstance(workbook, bytes) else workbook
+    frames = pd.read_excel(source, sheet_name=SHEETS)
+    for sheet, column in DATE_COLUMNS.items():
+        if column in frames[sheet]:
+            frames[sheet][column] = pd.to_datetime(frames[sheet][column], errors='coerce')
+    return [frames[sheet] for sheet in SHEETS]
+
+
+def _read_site(site, workbook):
+    start = time.perf_counter()
+    tables = read_workbook(workbook)
+    return site, tables, time.perf_counter() - start
+
+
+def align_columns(frames):
+    """The frames with every column renamed to one spelling, the known one or else the first seen"""
+    spellings = {column_key(column): column for column in KNOWN_COLUMNS}
+    aligned = []
+    for frame in frames:
+        renames = {}
+        for column in frame.columns:
+            target = spellings.setdefault(column_key(column), column)
+            if target != column and target not in frame:
+                renames[column] = target
+        aligned.append(frame.rename(columns=renames))
+    return aligned
+
+
+def merge_frames(frames):
+    """Concatenate aligned frames, settling columns whose type differs between them.
+
+    A column that is numeric in one frame and text in another becomes
+    numeric when all its text parses as numbers (a site that typed
+    quantities as text) and text otherwise (an ID that is numeric at one
+    site only), so values from different sites still compare equal.
+    """
+    merged = pd.concat(frames, ignore_index=True, sort=False)
+    for column in merged.columns:
+        present = [frame[column] for frame in frames if column in frame]
+        numeric = [pd.api.types.is_numeric_dtype(values) for values in present]
+        if any(pd.api.types.is_datetime64_any_dtype(values) for values in present):
+            merged[column] = pd.to_datetime(merged[column], errors='coerce')
+        elif any(numeric) and not all(numeric):
+            parsed = pd.to_numeric(merged[column], errors='coerce')
+            if parsed.notna().sum() == merged[column].notna().sum():
+                merged[column] = parsed
+            else:
+                merged[column] = merged[column].map(_text, na_action='ignore')
+    return merged
+
+
+def _text(value):
+    # 250001.0 read from a float column is the ID 250001
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def merge_sites(sites):
+    """One Inflow, Outflow and Budget frame from (site, [inflow, outflow, budget]) pairs.
+
+    Every row gets the site it came from in SITE_COLUMN. When the same
+    Item_ID is used at more than one site, all Item_IDs are prefixed with
+    their site so purchases and distributions are matched within a site.
+    """
+    merged = []
+    for position in range(len(SHEETS)):
+        frames = align_columns([tables[position] for _, tables in sites])
+        tagged = []
+        for (site, _), frame in zip(sites, frames):
+            frame = frame.drop(columns=[SITE_COLUMN], errors='ignore')
+            frame.insert(0, SITE_COLUMN, site)
+            tagged.append(frame)
+        merged.append(merge_frames(tagged))
+    inflow_df, outflow_df, budget_df = merged
+    if 'Item_ID' in inflow_df:
+        ids = inflow_df[['Item_ID', SITE_COLUMN]].dropna().astype(str).drop_duplicates()
+        if ids['Item_ID'].duplicated().any():
+            for frame in (inflow_df, outflow_df):
+                if 'Item_ID' in frame:
+                    frame['Item_ID'] = (frame[SITE_COLUMN].astype(str) + '-'
+                                        + frame['Item_ID'].map(_text, na_action='ignore')).where(frame['Item_ID'].notna())
+    return inflow_df, outflow_df, budget_df
+
+
+def ingest_pool():
+    """Process pool for ``consolidate`` with one worker per core, or None on a single core"""
+    workers = os.cpu_count() or 1
+    if workers < 2:
+        return None
+    # Spawned workers do not inherit the server's threads and locks
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def consolidate(workbooks, executor=None):
+    """Read (site, workbook) pairs in parallel and merge them into one data set.
+
+    Workbooks are bytes or paths. Each is parsed in a worker of
+    ``executor`` (else a new pool with one worker per core), so
+    reading N workbooks takes about as long as the slowest of them once
+    there are N cores. Returns the Inflow, Outflow and Budget frames and a
+    frame of rows and parse seconds per site.
+    """
+    workbooks = list(workbooks)
+    sites = [site for site, _ in workbooks]
+    data = [workbook for _, workbook in workbooks]
+    workers = min(len(workbooks), os.cpu_count() or 1)
+    if executor is not None:
+        results = list(executor.map(_read_site, sites, data))
+    elif workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = list(pool.map(_read_site, sites, data))
+    else:
+        results = [_read_site(site, workbook) for site, workbook in workbooks]
+    inflow_df, outflow_df, budget_df = merge_sites([(site, tables) for site, tables, _ in results])
+    stats = pd.DataFrame([{
+        SITE_COLUMN: site,
+        'Inflow_Rows': len(tables[0]),
+        'Outflow_Rows': len(tables[1]),
+        'Budget_Rows': len(tables[2]),
+        'Parse_Seconds': seconds,
+    } for site, tables, seconds in results])
+    return inflow_df, outflow_df, budget_df, stats
@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+
+from quantile_sketch import DEFAULT_ACCURACY, GroupedSketches
+from vendor_resolution import VendorResolution
+
+# Groupings offered by the Cost Analysis page -> column they group by
+DIMENSIONS = {'Item Type': 'Item_Type', 'Vendor': 'Vendor'}
+
+# Unit costs more than FENCE interquartile ranges below the first or above
+# the third quartile of their group are outliers (Tukey's fences)
+FENCE = 1.5
+
+SUMMARY_COLUMNS = ['Purchases', 'Min', 'P25', 'Median', 'P75', 'P90', 'Max', 'Mean', 'Low_Fence', 'High_Fence']
+
+
+def unit_costs(inflow_df):
+    """Cost per item of each purchase, Total_Cost / Quantity where Cost_per_Item is missing"""
+    if 'Cost_per_Item' in inflow_df:
+        cost = pd.to_numeric(inflow_df['Cost_per_Item'], errors='coerce')
+    else:
+        cost = pd.Series(np.nan, index=inflow_df.index)
+    if 'Total_Cost' in inflow_df and 'Quantity' in inflow_df:
+        quantity = pd.to_numeric(inflow_df['Quantity'], errors='coerce')
+        total = pd.to_numeric(inflow_df['Total_Cost'], errors='coerce')
+        cost = cost.fillna(total / quantity.where(quantity != 0))
+    return cost
+
+
+class CostAnalysis:
+    """Unit-cost distributions per Item_Type and per vendor, kept as quantile sketches.
+
+    Every purchase goes into one DDSketch per (Item_Type, month) and one per
+    (canonical vendor, month), so the median, p90 and outlier fences of any
+    group over any range of months come from merging a few sketches, within
+    their relative accuracy, without sorting or keeping the unit costs.
+    ``sync`` adds only the rows appended since the last call; a new
+    generation (an edit, a delete or a reload) rebuilds the sketches. The
+    prepared unit cost, group and month of every row are kept for
+    ``outliers``, so vendors are resolved once per row.
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.generation = None
+        self._reset()
+
+    def _reset(self):
+        self.sketches = {column: GroupedSketches([column, 'Month'], 'Unit_Cost', self.relative_accuracy)
+                         for column in DIMENSIONS.values()}
+        self.resolution = None
+        self.rows = 0
+        # Prepared rows, with the chunks appended since they were last joined
+        self.prepared = None
+        self.chunks = []
+
+    def sync(self, inflow_df, generation=None):
+        """Bring the sketches up to date with Inflow, reading only rows added since the last sync"""
+        if generation != self.generation or len(inflow_df) < self.rows:
+            self._reset()
+            self.generation = generation
+        if self.resolution is None:
+            # Vendors appended later are matched to these by name
+            self.resolution = VendorResolution(inflow_df)
+        if len(inflow_df) > self.rows:
+            prepared = self.prepare(inflow_df.iloc[self.rows:])
+            for sketches in self.sketches.values():
+                sketches.add(prepared)
+            self.chunks.append(prepared)
+            self.rows = len(inflow_df)
+
+    def prepare(self, rows):
+        """Unit cost, Item_Type, canonical vendor and purchase month ('' when unknown) of each row"""
+        vendor = self.resolution.names(rows)
+        if 'Vendor_Name' in rows:
+            vendor = vendor.fillna(rows['Vendor_Name'])
+        if 'Purchase_Date' in rows:
+            # Formatting each distinct month once; strftime per row is slow
+            codes, periods = pd.factorize(pd.to_datetime(rows['Purchase_Date'], errors='coerce').dt.to_period('M'))
+            month = np.append(periods.strftime('%Y-%m').to_numpy(dtype=object), '')[codes]
+        else:
+            month = ''
+        return pd.DataFrame({
+            'Unit_Cost': unit_costs(rows),
+            'Item_Type': rows['Item_Type'] if 'Item_Type' in rows else None,
+            'Vendor': vendor,
+            'Month': month,
+        }, index=rows.index)
+
+    def _prepared(self):
+        """Every synced row prepared, with the appended chunks joined in one concat"""
+        if self.chunks:
+            # None (nothing joined yet) is skipped by concat
+            self.prepared = pd.concat([self.prepared, *self.chunks])
+            self.chunks = []
+        return self.prepared
+
+    def months(self):
+        """Months with purchases, oldest first"""
+        return sorted({month for sketches in self.sketches.values() for _, month in sketches.keys() if month})
+
+    def summary(self, dimension, months=None):
+        """Purchases, unit-cost quantiles and outlier fences per group, most purchased first.
+
+        ``months`` is an inclusive (first, last) range of 'YYYY-MM' months;
+        purchases without a date only count when it is None.
+        """
+        column = DIMENSIONS[dimension]
+        sketches = self.sketches[column]
+        keys = {}
+        for key in sketches.keys():
+            if _in_range(key[1], months):
+                keys.setdefault(key[0], []).append(key)
+        rows = []
+        for group, group_keys in keys.items():
+            sketch = sketches.merged(group_keys)
+            p25, median, p75, p90 = sketch.quantiles([0.25, 0.5, 0.75, 0.9])
+            spread = FENCE * (p75 - p25)
+            rows.append([group, sketch.count, sketch.min, p25, median, p75, p90, sketch.max, sketch.mean(),
+                         p25 - spread, p75 + spread])
+        summary = pd.DataFrame(rows, columns=[column] + SUMMARY_COLUMNS)
+        return summary.sort_values(['Purchases', column], ascending=[False, True]).reset_index(drop=True)
+
+    def trend(self, dimension, groups):
+        """Median and p90 unit cost per group and month, with the month start as a timestamp"""
+        column = DIMENSIONS[dimension]
+        groups = set(groups)
+        rows = []
+        for (group, month), sketch in self.sketches[column].sketches.items():
+            if group in groups and month:
+                median, p90 = sketch.quantiles([0.5, 0.9])
+                rows.append([group, pd.Timestamp(month), median, p90, sketch.count])
+        trend = pd.DataFrame(rows, columns=[column, 'Month', 'Median', 'P90', 'Purchases'])
+        return trend.sort_values([column, 'Month']).reset_index(drop=True)
+
+    def outliers(self, inflow_df, dimension, months=None):
+        """Purchases whose unit cost lies outside their group's fences, furthest from the median first"""
+        column = DIMENSIONS[dimension]
+        self.sync(inflow_df, self.generation)
+        summary = self.summary(dimension, months).set_index(column)
+        prepared = self._prepared()
+        if prepared is None:
+            prepared = self.prepare(inflow_df.iloc[:0])
+        if months is not None:
+            prepared = prepared[prepared['Month'].ne('') & prepared['Month'].between(*months)]
+        group = prepared[column]
+        cost = prepared['Unit_Cost']
+        flagged = (cost < group.map(summary['Low_Fence'])) | (cost > group.map(summary['High_Fence']))
+        outliers = inflow_df.loc[flagged[flagged].index].copy()
+        outliers.insert(0, 'Group_Median', group[flagged].map(summary['Median']))
+        outliers.insert(0, 'Unit_Cost', cost[flagged])
+        if column not in outliers:
+            outliers.insert(0, column, group[flagged])
+        ratio = np.abs(np.log(outliers['Unit_Cost'].abs().clip(lower=1e-12) /
+                              outliers['Group_Median'].abs().clip(lower=1e-12)))
+        return outliers.iloc[np.argsort(-ratio.to_numpy(), kind='stable')]
+
+
+def _in_range(month, months):
+    if months is None:
+        return True
+    return bool(month) and months[0] <= month <= months[1]
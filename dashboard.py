@@ -0,0 +1,138 @@
+from lazy_imports import lazy_import
+
+# Plotly is only loaded once the first chart is built
+px = lazy_import('plotly.express')
+go = lazy_import('plotly.graph_objects')
+
+# Column label for each rollup frequency
+PERIOD_LABELS = {'D': 'Day', 'ME': 'Month', 'QE': 'Quarter', 'YE': 'Year'}
+
+
+def create_visualizations(cube, ledger, budget_year=None):
+    """Create visualizations using plotly, rolled up from the aggregate cube and budget ledger"""
+    # Total Inflow vs Outflow Bar Chart
+    fig1 = go.Figure(data=[
+        go.Bar(name='Total Purchases', x=['Total'], y=[cube.total('Inflow', 'Value')]),
+        go.Bar(name='Total Distributions', x=['Total'],
+               y=[cube.total('Outflow', 'Value')])
+    ])
+    fig1.update_layout(title='Total Purchases vs Distributions')
+
+    # Item Type Distribution for Inflow
+    inflow_by_type = cube.rollup('Inflow', by=['Item_Type'])
+    fig2 = px.pie(values=inflow_by_type['Value'],
+                  names=inflow_by_type['Item_Type'],
+                  title='Purchase Distribution by Item Type')
+
+    # Department-wise Distribution for Outflow
+    outflow_by_dept = cube.rollup('Outflow', by=['Department'])
+    fig3 = px.pie(values=outflow_by_dept['Unit_Cost'],
+                  names=outflow_by_dept['Department'],
+                  title='Distribution by Department')
+
+    # Budget vs Actual Spending
+    if budget_year is None:
+        budget_year = ledger.default_year()
+    budget_report = ledger.report(budget_year)
+    fig4 = go.Figure(data=[
+        go.Bar(name='Budget Amount', x=budget_report['Event_Type'], y=budget_report['Budget_Amount']),
+        go.Bar(name='Actual Spent', x=budget_report['Event_Type'], y=budget_report['Actual_Amount_Spent'])
+    ])
+    fig4.update_layout(title=f'Budget vs Actual Spending by Event Type ({budget_year})',
+                      barmode='group')
+
+    # New visualization: Item Count by Type Pie Chart
+    fig5 = px.pie(
+        values=inflow_by_type['Quantity'],
+        names=inflow_by_type['Item_Type'],
+        title='Item Distribution by Type',
+        hole=0.4  # Makes it a donut chart
+    )
+    fig5.update_traces(textposition='inside', textinfo='percent+label')
+
+    # New visualization: Purchase Costs Over Time
+    daily_costs = cube.rollup('Inflow', by=['Day'])
+
+    fig6 = go.Figure()
+    fig6.add_trace(go.Scatter(
+        x=daily_costs['Day'],
+        y=daily_costs['Value'],
+        mode='lines+markers',
+        name='Daily Purchase Cost',
+        hovertemplate='Date: %{x|%d/%m/%Y}<br>Cost: $%{y:,.2f}<extra></extra>'
+    ))
+
+    # Add trend line
+    fig6.add_trace(go.Scatter(
+        x=daily_costs['Day'],
+        y=daily_costs['Value'].rolling(window=7).mean(),
+        mode='lines',
+        name='7-day Moving Average',
+        line=dict(dash='dash'),
+        hovertemplate='Date: %{x|%d/%m/%Y}<br>Average: $%{y:,.2f}<extra></extra>'
+    ))
+
+    fig6.update_layout(
+        title='Purchase Costs Over Time',
+        xaxis_title='Date',
+        yaxis_title='Total Cost ($)',
+        hovermode='x unified',
+        xaxis=dict(
+            tickformat='%d/%m/%Y',
+            tickangle=45
+        )
+    )
+
+    return fig1, fig2, fig3, fig4, fig5, fig6
+
+
+def item_type_summary(cube):
+    """Purchased quantity and cost per Item_Type"""
+    summary = cube.rollup('Inflow', by=['Item_Type'], measures=['Quantity', 'Value'])
+    return summary.rename(columns={'Value': 'Total_Cost'})
+
+
+def department_summary(cube):
+    """Distributed items and value per Department"""
+    summary = cube.rollup('Outflow', by=['Department'], measures=['Quantity', 'Value'])
+    summary.columns = ['Department', 'Total Items', 'Total Value']
+    return summary
+
+
+def type_distribution_summary(cube):
+    """Purchased quantity, cost and named purchases per Item_Type"""
+    # 'Unique Items' has always counted the Item_name values, not distinct names
+    summary = cube.rollup('Inflow', by=['Item_Type'], measures=['Quantity', 'Value', 'Named_Rows'])
+    summary.columns = ['Item Type', 'Total Quantity', 'Total Cost', 'Unique Items']
+    return summary
+
+
+def purchase_period_summary(cube, freq='ME'):
+    """Purchases bucketed by period: 'ME' for months, 'QE' for quarters"""
+    summary = cube.rollup('Inflow', freq=freq, measures=['Value', 'Quantity', 'Named_Rows'])
+    summary.columns = [PERIOD_LABELS.get(freq, 'Period'), 'Total Cost', 'Items Purchased', 'Unique Items']
+    return summary
+
+
+def types_summary(cube, ledger, budget_year=None):
+    """Budget and distributions per Event_Type, purchases and distributions per Item_Type"""
+    budgets = ledger.report(budget_year)[['Event_Type', 'Budget_Amount']]
+    distributions = cube.rollup('Outflow', by=['Event_Type'], measures=['Value', 'Rows'])
+    event_type_summary = budgets.merge(distributions, on='Event_Type', how='outer').fillna(0)
+    event_type_summary.columns = ['Event_Type', 'Total_Budget', 'Total_Distributions', 'Distribution_Count']
+
+    purchases = cube.rollup('Inflow', by=['Item_Type'], measures=['Value', 'Rows'])
+    distributed = cube.rollup('Outflow', by=['Item_Type'], measures=['Value', 'Rows'])
+    item_type_summary = purchases.merge(distributed, on='Item_Type', how='outer',
+                                        suffixes=('_in', '_out')).fillna(0)
+    item_type_summary = item_type_summary[['Item_Type', 'Value_in', 'Value_out', 'Rows_in', 'Rows_out']]
+    item_type_summary.columns = ['Item_Type', 'Total_Purchases', 'Total_Distributions',
+                                 'Purchase_Count', 'Distribution_Count']
+    return event_type_summary, item_type_summary
+
+
+def describe_cube(cube):
+    """One-line report of the cube's size and build time"""
+    stats = cube.stats()
+    return (f"Aggregate cube: {stats['cube_rows']:,} cells from {stats['source_rows']:,} rows, "
+            f"{stats['bytes'] / 1024:,.1f} KB, built in {stats['build_seconds'] * 1000:,.1f} ms")
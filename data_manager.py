@@ -1,51 +1,231 @@
+import hashlib
+import threading
+from collections import namedtuple
+from io import BytesIO
+
 import pandas as pd
 
+from edit_history import EditHistory
+from storage_backends import TABLES, PandasBackend
+
+# Workbook sheet of each table
+SHEET_NAMES = {'inflow': 'Inflow', 'outflow': 'Outflow', 'budget': 'Budget'}
+
+# Emitted to subscribers after every change. item_ids is None when the whole
+# table was replaced; the Budget sheet has no Item_ID, so its edits carry none.
+ChangeEvent = namedtuple('ChangeEvent', ['table', 'operation', 'item_ids', 'version'])
+
 class DataManager:
-    def __init__(self):
-        self.inflow_data = None
-        self.outflow_data = None
-        self.budget_data = None
+    """The Inflow, Outflow and Budget tables behind the management pages.
+
+    Each table has a version that goes up by one with every change, and
+    subscribers are told which table changed, how, and which Item_IDs were
+    touched, so derived views can be dropped only when their inputs change.
+    Tables changed since the last ``mark_clean`` are reported as dirty.
+    Each table's generation goes up with every change other than appended
+    rows, so incremental views can read just the new rows within one.
+    """
+    
+    def __init__(self, backend=None, history=None):
+        # In-memory pandas frames unless another storage backend is given
+        self.backend = backend if backend is not None else PandasBackend()
+        # Row-level deltas of add/modify/delete, for undo and redo
+        self.history = history if history is not None else EditHistory()
+        self.versions = dict.fromkeys(TABLES, 0)
+        self.generations = dict.fromkeys(TABLES, 0)
+        self.dirty = set()
+        self.subscribers = []
+        self.fingerprints = {}  # table -> (version, digest)
+        self._lock = threading.Lock()
+    
+    def _table(self, data_type):
+        if data_type not in TABLES:
+            raise ValueError("Invalid data type")
+        return data_type
     
     def set_data(self, inflow_df, outflow_df, budget_df):
-        self.inflow_data = inflow_df
-        self.outflow_data = outflow_df
-        self.budget_data = budget_df
+        self.backend.load({'inflow': inflow_df, 'outflow': outflow_df, 'budget': budget_df})
+        self.history.clear()
+        self.history.checkpoint("Loaded data")
+        for table in TABLES:
+            self._changed(table, 'load', None)
+        # Freshly loaded data matches its source
+        self.mark_clean()
     
     def has_data(self):
-        return self.inflow_data is not None and \
-               self.outflow_data is not None and \
-               self.budget_data is not None
+        return self.backend.has_data()
     
     def get_data(self, data_type):
-        if data_type == "inflow":
-            return self.inflow_data
-        elif data_type == "outflow":
-            return self.outflow_data
-        elif data_type == "budget":
-            return self.budget_data
-        else:
-            raise ValueError("Invalid data type")
+        return self.backend.get(self._table(data_type))
+    
+    def column_names(self, data_type):
+        return self.backend.column_names(self._table(data_type))
     
     def add_item(self, data_type, item_data):
-        if data_type == "inflow":
-            self.inflow_data = pd.concat([self.inflow_data, pd.DataFrame([item_data])])
-        elif data_type == "outflow":
-            self.outflow_data = pd.concat([self.outflow_data, pd.DataFrame([item_data])])
-        elif data_type == "budget":
-            self.budget_data = pd.concat([self.budget_data, pd.DataFrame([item_data])])
+        table = self._table(data_type)
+        rows = pd.DataFrame([item_data])
+        labels = self.backend.append(table, rows)
+        self.history.record(table, 'insert', labels, after=rows.set_axis(labels))
+        self._changed(table, 'insert', _item_ids(rows))
+        return labels[0]
     
     def modify_item(self, data_type, index, item_data):
-        if data_type == "inflow":
-            self.inflow_data.loc[index] = item_data
-        elif data_type == "outflow":
-            self.outflow_data.loc[index] = item_data
-        elif data_type == "budget":
-            self.budget_data.loc[index] = item_data
+        table = self._table(data_type)
+        current = self.backend.rows(table, [index]).iloc[0]
+        # Only the cells whose value actually changes are kept
+        before, after = {}, {}
+        for column, value in dict(item_data).items():
+            old = current.get(column)
+            if _same(old, value):
+                continue
+            before[column], after[column] = old, value
+        if not after:
+            return
+        self.backend.update(table, index, after)
+        self.history.record(table, 'update', [index], before=before, after=after)
+        # A changed Item_ID touches both the old and the new item
+        self._changed(table, 'update', _item_ids(current.to_frame().T) | _item_ids(pd.DataFrame([after])))
     
     def delete_item(self, data_type, index):
-        if data_type == "inflow":
-            self.inflow_data = self.inflow_data.drop(index)
-        elif data_type == "outflow":
-            self.outflow_data = self.outflow_data.drop(index)
-        elif data_type == "budget":
-            self.budget_data = self.budget_data.drop(index) 
\ No newline at end of file
+        table = self._table(data_type)
+        labels = list(index) if pd.api.types.is_list_like(index) else [index]
+        if not labels:
+            return
+        removed = self.backend.rows(table, labels)
+        self.backend.delete(table, labels)
+        self.history.record(table, 'delete', labels, before=removed)
+        self._changed(table, 'delete', _item_ids(removed))
+    
+    def undo(self):
+        """Revert the last add/modify/delete; returns the edit or None"""
+        edit = self.history.undo(self.backend)
+        if edit is not None:
+            self._edit_changed(edit, 'undo')
+        return edit
+    
+    def redo(self):
+        edit = self.history.redo(self.backend)
+        if edit is not None:
+            self._edit_changed(edit, 'redo')
+        return edit
+    
+    def restore_checkpoint(self, seq):
+        edits = self.history.restore(self.backend, seq)
+        for edit in edits:
+            self._edit_changed(edit, 'restore')
+        return edits
+    
+    def version(self, data_type):
+        """Number of changes made to the table so far"""
+        return self.versions[self._table(data_type)]
+    
+    def generation(self, data_type):
+        """Number of changes to the table other than appending rows"""
+        return self.generations[self._table(data_type)]
+    
+    def fingerprint(self, data_type):
+        """Digest of the table's contents, recomputed only when its version changes.
+        
+        Equal tables loaded in different sessions get the same fingerprint,
+        so it can key caches shared across sessions.
+        """
+        table = self._table(data_type)
+        version = self.versions[table]
+        cached = self.fingerprints.get(table)
+        if cached is None or cached[0] != version:
+            df = self.get_data(table)
+            digest = hashlib.sha1()
+            if df is not None:
+                digest.update(','.join(map(str, df.columns)).encode())
+                digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+            cached = (version, digest.hexdigest())
+            self.fingerprints[table] = cached
+        return cached[1]
+    
+    def subscribe(self, callback, tables=None):
+        """Call ``callback(event)`` after each change to ``tables`` (all by default).
+        
+        Returns a function that removes the subscription.
+        """
+        tables = set(TABLES) if tables is None else {self._table(table) for table in tables}
+        entry = (callback, tables)
+        with self._lock:
+            self.subscribers.append(entry)
+        
+        def unsubscribe():
+            with self._lock:
+                if entry in self.subscribers:
+                    self.subscribers.remove(entry)
+        return unsubscribe
+    
+    def dirty_tables(self):
+        """Tables changed since the last ``mark_clean``, in table order"""
+        return [table for table in TABLES if table in self.dirty]
+    
+    def mark_clean(self, data_type=None):
+        """Forget the changes of one table, or of all of them, e.g. after saving"""
+        with self._lock:
+            if data_type is None:
+                self.dirty.clear()
+            else:
+                self.dirty.discard(self._table(data_type))
+    
+    def _changed(self, table, operation, item_ids):
+        with self._lock:
+            self.versions[table] += 1
+            if operation != 'insert':
+                self.generations[table] += 1
+            self.dirty.add(table)
+            event = ChangeEvent(table, operation, item_ids, self.versions[table])
+            subscribers = [callback for callback, tables in self.subscribers if table in tables]
+        for callback in subscribers:
+            callback(event)
+    
+    def _edit_changed(self, edit, operation):
+        """Emit the change made by undoing or redoing an edit"""
+        if edit.operation == 'update':
+            rows = self.backend.rows(edit.table, edit.labels)
+            item_ids = _item_ids(rows) | _item_ids(pd.DataFrame([edit.before, edit.after]))
+        else:
+            item_ids = _item_ids(edit.before if edit.operation == 'delete' else edit.after)
+        self._changed(edit.table, operation, item_ids)
+    
+    def group_sum(self, data_type, by=(), columns=(), period=None):
+        """Grouped sums, computed by the storage backend"""
+        return self.backend.group_sum(self._table(data_type), by, columns, period)
+    
+    def top_rows(self, data_type, n, column):
+        return self.backend.top_rows(self._table(data_type), n, column)
+    
+    def top_groups(self, data_type, n, by, column):
+        return self.backend.top_groups(self._table(data_type), n, by, column)
+    
+    def budget_vs_actual(self, year=None):
+        return self.backend.budget_vs_actual(year)
+    
+    def export_excel(self):
+        """The three tables as an xlsx workbook, the app's import/export format"""
+        buffer = BytesIO()
+        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            for table in TABLES:
+                self.get_data(table).to_excel(writer, sheet_name=SHEET_NAMES[table], index=False)
+        return buffer.getvalue()
+
+
+def _same(old, new):
+    """Whether a cell keeps its value, treating missing values as equal"""
+    if pd.api.types.is_list_like(old) or pd.api.types.is_list_like(new):
+        return False
+    if pd.isna(old) and pd.isna(new):
+        return True
+    try:
+        return bool(old == new)
+    except (TypeError, ValueError):
+        return False
+
+
+def _item_ids(rows):
+    """Item_IDs present in a frame of rows"""
+    if rows is None or 'Item_ID' not in rows:
+        return frozenset()
+    return frozenset(rows['Item_ID'].dropna())
@@ -0,0 +1,167 @@
+import sys
+import time
+from collections import deque
+
+import pandas as pd
+
+
+class RowEdit:
+    """One DataManager edit, kept as the rows and cells it touched.
+
+    insert: ``after`` holds the inserted rows under their labels.
+    delete: ``before`` holds the deleted rows under their labels.
+    update: ``before`` and ``after`` map each changed column of the row
+    ``labels[0]`` to its old and new value.
+    """
+
+    def __init__(self, seq, table, operation, labels, before=None, after=None):
+        self.seq = seq
+        self.table = table
+        self.operation = operation
+        self.labels = list(labels)
+        self.before = before
+        self.after = after
+        self.timestamp = time.time()
+
+    def undo(self, backend):
+        if self.operation == 'insert':
+            backend.delete(self.table, self.labels)
+        elif self.operation == 'delete':
+            backend.restore(self.table, self.before)
+        else:
+            backend.update(self.table, self.labels[0], self.before)
+
+    def redo(self, backend):
+        if self.operation == 'insert':
+            backend.restore(self.table, self.after)
+        elif self.operation == 'delete':
+            backend.delete(self.table, self.labels)
+        else:
+            backend.update(self.table, self.labels[0], self.after)
+
+    def nbytes(self):
+        """Approximate memory held by the edit"""
+        size = sys.getsizeof(self.labels)
+        for part in (self.before, self.after):
+            if isinstance(part, pd.DataFrame):
+                size += int(part.memory_usage(deep=True).sum())
+            elif part:
+                size += sys.getsizeof(part) + sum(sys.getsizeof(value) for value in part.values())
+        return size
+
+    def describe(self):
+        if self.operation == 'update':
+            return f"#{self.seq} update {self.table} row {self.labels[0]}: {', '.join(map(str, self.after))}"
+        rows = f"{len(self.labels)} row" + ("s" if len(self.labels) != 1 else "")
+        return f"#{self.seq} {self.operation} {rows} in {self.table}"
+
+
+class EditHistory:
+    """Undo/redo history of row edits.
+
+    Only the deltas are stored: the rows an insert added, the rows a delete
+    removed and the old and new values of the cells an update changed, so
+    memory follows the size of the edits rather than of the tables, and
+    undoing or redoing one edit touches only those rows. At most
+    ``max_edits`` edits are kept; older ones can no longer be undone.
+
+    Every ``checkpoint_every`` edits the current position is marked as a
+    checkpoint, and ``restore`` walks the history back or forward to any
+    checkpoint still in reach. Checkpoints are positions, not snapshots.
+    """
+
+    def __init__(self, max_edits=200, checkpoint_every=20):
+        self.max_edits = max_edits
+        self.checkpoint_every = checkpoint_every
+        self.clear()
+
+    def clear(self):
+        """Forget all edits, e.g. after new data was loaded"""
+        self.done = deque(maxlen=self.max_edits)
+        self.undone = []
+        self.seq = 0
+        # Position before the oldest edit still held
+        self.floor = 0
+        self.checkpoints = {}  # seq -> (label, timestamp)
+        self.since_checkpoint = 0
+
+    def position(self):
+        """Seq of the last applied edit, or the floor when there is none"""
+        return self.done[-1].seq if self.done else self.floor
+
+    def record(self, table, operation, labels, before=None, after=None):
+        self.seq += 1
+        edit = RowEdit(self.seq, table, operation, labels, before, after)
+        if len(self.done) == self.max_edits:
+            self.floor = self.done[0].seq
+        self.done.append(edit)
+        # A new edit ends the redo branch, with any checkpoint on it
+        for undone in self.undone:
+            self.checkpoints.pop(undone.seq, None)
+        self.undone = []
+        self._prune()
+        self.since_checkpoint += 1
+        if self.since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+        return edit
+
+    def can_undo(self):
+        return bool(self.done)
+
+    def can_redo(self):
+        return bool(self.undone)
+
+    def undo(self, backend):
+        """Revert the last edit; returns it, or None when there is nothing to undo"""
+        if not self.done:
+            return None
+        edit = self.done.pop()
+        edit.undo(backend)
+        self.undone.append(edit)
+        return edit
+
+    def redo(self, backend):
+        """Reapply the last undone edit; returns it, or None when there is nothing to redo"""
+        if not self.undone:
+            return None
+        edit = self.undone.pop()
+        edit.redo(backend)
+        self.done.append(edit)
+        return edit
+
+    def checkpoint(self, label=None):
+        """Mark the current position so ``restore`` can return to it"""
+        seq = self.position()
+        self.checkpoints[seq] = (label or f"Checkpoint at edit {seq}", time.time())
+        self.since_checkpoint = 0
+        return seq
+
+    def available_checkpoints(self):
+        """(seq, label) of the checkpoints that can be restored, oldest first"""
+        return [(seq, self.checkpoints[seq][0]) for seq in sorted(self.checkpoints)]
+
+    def restore(self, backend, seq):
+        """Undo or redo edits until the position is ``seq``; returns the edits applied"""
+        applied = []
+        if seq == self.floor or any(edit.seq == seq for edit in self.done):
+            while self.position() != seq:
+                applied.append(self.undo(backend))
+        elif any(edit.seq == seq for edit in self.undone):
+            while self.position() != seq:
+                applied.append(self.redo(backend))
+        else:
+            raise ValueError(f"Edit {seq} is no longer in the history")
+        return applied
+
+    def memory_usage(self):
+        """Approximate bytes held by the undo and redo stacks"""
+        return sum(edit.nbytes() for edit in self.done) + sum(edit.nbytes() for edit in self.undone)
+
+    def recent(self, n=10):
+        """Descriptions of the last ``n`` applied edits, newest first"""
+        return [edit.describe() for edit in list(self.done)[-n:][::-1]]
+
+    def _prune(self):
+        """Drop checkpoints that fell below the floor"""
+        for seq in [seq for seq in self.checkpoints if seq < self.floor]:
+            del self.checkpoints[seq]
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+# Filterable columns of each dashboard table
+INFLOW_FILTERS = ['Item_Type', 'Vendor_Name']
+OUTFLOW_FILTERS = ['Item_Type', 'Department', 'Event_Type']
+FILTER_COLUMNS = ['Department', 'Event_Type', 'Item_Type', 'Vendor_Name']
+
+EMPTY = np.array([], dtype=np.intp)
+
+
+class FilterIndex:
+    """Sorted date index and per-category row-position indexes for one table.
+
+    Date ranges are answered by binary search over the sorted dates and
+    category filters by looking up the precomputed row positions of each
+    selected value, so a filter never builds a full-frame boolean mask.
+    Build it once per data version.
+    """
+
+    def __init__(self, df, date_column, categories):
+        self.rows = len(df)
+        if date_column in df:
+            dates = pd.to_datetime(df[date_column], errors='coerce').to_numpy(dtype='datetime64[ns]')
+        else:
+            dates = np.full(len(df), np.datetime64('NaT'), dtype='datetime64[ns]')
+        dated = np.flatnonzero(~np.isnat(dates))
+        order = np.argsort(dates[dated], kind='stable')
+        self.date_positions = dated[order]
+        self.sorted_dates = dates[self.date_positions]
+
+        self.categories = {}
+        for column in categories:
+            if column in df:
+                self.categories[column] = {
+                    value: np.asarray(positions, dtype=np.intp)
+                    for value, positions in df.groupby(column, sort=False).indices.items()
+                }
+
+    def values(self, column):
+        """Distinct values of an indexed column, sorted"""
+        return sorted(self.categories.get(column, {}), key=str)
+
+    def date_bounds(self):
+        """Earliest and latest date, or (None, None) when there are no dates"""
+        if not len(self.sorted_dates):
+            return None, None
+        return pd.Timestamp(self.sorted_dates[0]), pd.Timestamp(self.sorted_dates[-1])
+
+    def date_range(self, start=None, end=None):
+        """Row positions with start <= date < end, via binary search"""
+        lo = 0 if start is None else np.searchsorted(self.sorted_dates, np.datetime64(start, 'ns'), side='left')
+        hi = len(self.sorted_dates) if end is None else np.searchsorted(self.sorted_dates, np.datetime64(end, 'ns'), side='left')
+        return np.sort(self.date_positions[lo:hi])
+
+    def lookup(self, column, values):
+        """Row positions whose column holds any of the values"""
+        index = self.categories.get(column, {})
+        arrays = [index[value] for value in values if value in index]
+        if not arrays:
+            return EMPTY
+        return np.unique(np.concatenate(arrays)) if len(arrays) > 1 else arrays[0]
+
+    def select(self, start=None, end=None, **filters):
+        """Row positions matching a date range and category filters.
+
+        Returns None when nothing is filtered. A filter value of None means
+        "any"; filters on columns this table does not index are ignored.
+        """
+        selections = []
+        if start is not None or end is not None:
+            selections.append(self.date_range(start, end))
+        for column, values in filters.items():
+            if values is not None and column in self.categories:
+                selections.append(self.lookup(column, values))
+        if not selections:
+            return None
+        # Intersect from the smallest selection up
+        selections.sort(key=len)
+        positions = selections[0]
+        for other in selections[1:]:
+            positions = np.intersect1d(positions, other, assume_unique=True)
+        return positions
+
+
+def build_indexes(inflow_df, outflow_df):
+    """Filter indexes for the Inflow and Outflow tables"""
+    return {
+        'Inflow': FilterIndex(inflow_df, 'Purchase_Date', INFLOW_FILTERS + ['Item_ID']),
+        'Outflow': FilterIndex(outflow_df, 'Date_of_Distribution', OUTFLOW_FILTERS + ['Item_ID']),
+    }
+
+
+def take(df, positions):
+    """Rows at the given positions; the whole frame when positions is None"""
+    return df if positions is None else df.iloc[positions]
+
+
+def filter_tables(indexes, inflow_df, outflow_df, budget_df, filters):
+    """Cross-filter the three tables.
+
+    ``filters`` holds 'start'/'end' dates (end exclusive) and lists of
+    values for Department, Event_Type, Item_Type and Vendor_Name (None for
+    no filter). A vendor filter reaches Outflow through the Item_IDs
+    bought from those vendors.
+    """
+    start, end = filters.get('start'), filters.get('end')
+    categories = {column: filters.get(column) for column in FILTER_COLUMNS}
+
+    inflow_positions = indexes['Inflow'].select(start, end, **categories)
+    outflow_positions = indexes['Outflow'].select(start, end, **categories)
+
+    vendors = categories.get('Vendor_Name')
+    if vendors is not None:
+        vendor_rows = indexes['Inflow'].lookup('Vendor_Name', vendors)
+        item_ids = pd.unique(inflow_df['Item_ID'].to_numpy()[vendor_rows])
+        by_item = indexes['Outflow'].lookup('Item_ID', item_ids)
+        outflow_positions = by_item if outflow_positions is None else \
+            np.intersect1d(outflow_positions, by_item, assume_unique=True)
+
+    event_types = categories.get('Event_Type')
+    if event_types is not None and 'Event_Type' in budget_df:
+        budget_df = budget_df[budget_df['Event_Type'].isin(event_types)]
+
+    return take(inflow_df, inflow_positions), take(outflow_df, outflow_positions), budget_df
+
+
+def filter_key(filters):
+    """Hashable form of a filter selection, for cache keys"""
+    return tuple(sorted(
+        (name, tuple(value) if isinstance(value, list) else value)
+        for name, value in filters.items() if value is not None
+    ))
+
+
+def filter_cube(cube, filters):
+    """The version's AggregateCube narrowed to a filter selection, as filter_tables narrows the rows.
+
+    Dates and Item_Type, Department and Event_Type are dimensions of the
+    cube. Returns None when the selection also filters on something the
+    cube does not have (Vendor_Name), so the caller rolls up the filtered
+    rows instead.
+    """
+    if filters.get('Vendor_Name') is not None:
+        return None
+    if not filter_key(filters):
+        return cube
+    categories = {
+        'Inflow': {column: filters.get(column) for column in INFLOW_FILTERS if column != 'Vendor_Name'},
+        'Outflow': {column: filters.get(column) for column in OUTFLOW_FILTERS},
+    }
+    return cube.filter(filters.get('start'), filters.get('end'), categories)
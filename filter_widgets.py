@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+import pandas as pd
+import streamlit as st
+
+from filter_index import FILTER_COLUMNS
+
+
+def filter_sidebar(indexes):
+    """Render the dashboard filters in the sidebar and return the selection"""
+    st.sidebar.header("Filters")
+    filters = {}
+
+    bounds = [bound for index in indexes.values() for bound in index.date_bounds() if bound is not None]
+    if bounds:
+        first, last = min(bounds).date(), max(bounds).date()
+        selected = st.sidebar.date_input("Date range", value=(first, last),
+                                         min_value=first, max_value=last)
+        # The range is only complete once both ends are picked
+        if isinstance(selected, (tuple, list)) and len(selected) == 2 and tuple(selected) != (first, last):
+            filters['start'] = pd.Timestamp(selected[0])
+            filters['end'] = pd.Timestamp(selected[1] + timedelta(days=1))
+
+    for column in FILTER_COLUMNS:
+        options = sorted({value for index in indexes.values() for value in index.values(column)}, key=str)
+        if options:
+            chosen = st.sidebar.multiselect(column.replace('_', ' '), options)
+            filters[column] = chosen or None
+    return filters
+
+
+def item_picker(index, label, key, limit=20):
+    """Search box and a selectbox of the best matching items from a SearchIndex.
+
+    Only the top ``limit`` matches are rendered as options. Returns the
+    chosen key, or None when nothing matches.
+    """
+    query = st.text_input("Search items", key=f"{key}_query",
+                          placeholder="Item ID, name, code or vendor")
+    matches = index.search(query, limit)
+    if not matches:
+        if len(index):
+            st.caption("No items match the search")
+        return None
+    if len(index) > len(matches):
+        st.caption(f"Showing {len(matches)} of {len(index):,} items; type to narrow the list")
+    return st.selectbox(label, matches, format_func=index.label, key=f"{key}_choice")
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+
+def rows_fingerprint(df, columns, start=0, stop=None, offset=None):
+    """Order-sensitive hash of rows start..stop of ``columns``, additive over consecutive chunks.
+
+    Values are hashed in a canonical form (numbers as floats, text as str)
+    so the same rows parsed with different dtypes match. The hash of rows
+    0..n plus that of rows n..m, taken with ``offset=n``, is the hash of
+    rows 0..m (mod 2**64), so a fingerprint can be extended as rows are
+    appended.
+    """
+    stop = len(df) if stop is None else stop
+    offset = start if offset is None else offset
+    columns = [column for column in columns if column in df]
+    if stop <= start or not columns:
+        return 0
+    rows = df.iloc[start:stop]
+    canonical = pd.DataFrame({
+        column: (pd.to_numeric(rows[column], errors='coerce').astype(float)
+                 if pd.api.types.is_numeric_dtype(rows[column]) else
+                 rows[column] if pd.api.types.is_datetime64_any_dtype(rows[column]) else
+                 rows[column].astype(str))
+        for column in columns
+    })
+    hashes = pd.util.hash_pandas_object(canonical, index=False).to_numpy()
+    weights = np.arange(offset, offset + len(rows), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    return int((hashes * weights).sum(dtype=np.uint64))
+
+
+def extend(fingerprint, rows, columns, offset):
+    """``fingerprint`` of the first ``offset`` rows extended with ``rows`` appended after them"""
+    return (fingerprint + rows_fingerprint(rows, columns, offset=offset)) % 2 ** 64
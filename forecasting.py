@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+
+def restock_forecast(inflow_df, outflow_df, key='Item_name', window_days=90,
+                     lead_time_days=14, service_z=1.65, as_of=None):
+    """Distribution rate, days of cover and reorder point for every item at once.
+
+    Demand is read from a day x item matrix of distributed quantities over
+    the last ``window_days`` days up to ``as_of`` (the latest movement by
+    default). The matrix is kept sparse, as the non-empty (item, day)
+    cells, and its per-item mean and standard deviation come from
+    ``bincount`` sums, so the cost grows with the number of movements and
+    never loops over items.
+
+    Stock on hand is purchased minus distributed quantity. The reorder
+    point covers the expected demand over the lead time plus
+    ``service_z`` standard deviations of it (1.65 is roughly a 95%
+    service level). Items are keyed by name by default, as every purchase
+    gets its own Item_ID. An item with no stock left is flagged even
+    without recent demand.
+    """
+    in_keys = inflow_df[key]
+    out_keys = outflow_df[key] if key in outflow_df else outflow_df['Item_ID'].map(
+        inflow_df.drop_duplicates('Item_ID').set_index('Item_ID')[key])
+    codes, items = pd.factorize(pd.concat([in_keys, out_keys], ignore_index=True))
+    in_codes, out_codes = codes[:len(inflow_df)], codes[len(inflow_df):]
+    n_items = len(items)
+
+    in_qty = pd.to_numeric(inflow_df['Quantity'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    out_qty = pd.to_numeric(outflow_df['Quantity'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    valid_in, valid_out = in_codes >= 0, out_codes >= 0
+    purchased = np.bincount(in_codes[valid_in], weights=in_qty[valid_in], minlength=n_items)
+    distributed = np.bincount(out_codes[valid_out], weights=out_qty[valid_out], minlength=n_items)
+    on_hand = purchased - distributed
+
+    dates = pd.to_datetime(outflow_df['Date_of_Distribution'], errors='coerce')
+    if as_of is None:
+        latest = [dates.max(), pd.to_datetime(inflow_df['Purchase_Date'], errors='coerce').max()]
+        latest = [date for date in latest if pd.notna(date)]
+        as_of = max(latest) if latest else pd.Timestamp.now()
+    as_of = pd.Timestamp(as_of).normalize()
+
+    # Sparse day x item matrix of the window's distributions
+    day = (as_of - dates.dt.normalize()).dt.days.to_numpy(dtype=float)
+    in_window = valid_out & (day >= 0) & (day < window_days)
+    cell = out_codes[in_window].astype(np.int64) * window_days + day[in_window].astype(np.int64)
+    cells, cell_index = np.unique(cell, return_inverse=True)
+    daily = np.bincount(cell_index, weights=out_qty[in_window], minlength=len(cells))
+    cell_item = cells // window_days
+    demand_sum = np.bincount(cell_item, weights=daily, minlength=n_items)
+    demand_sq = np.bincount(cell_item, weights=daily ** 2, minlength=n_items)
+
+    rate = demand_sum / window_days
+    std = np.sqrt(np.maximum(demand_sq / window_days - rate ** 2, 0))
+    reorder_point = rate * lead_time_days + service_z * std * np.sqrt(lead_time_days)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cover = np.where(rate > 0, np.maximum(on_hand, 0) / rate, np.where(on_hand > 0, np.inf, 0))
+    # No stock-out date when it would fall past the last representable Timestamp
+    horizon = (pd.Timestamp.max - as_of) / pd.Timedelta(days=1) - 1
+    stockout = as_of + pd.to_timedelta(np.where(np.isfinite(cover) & (cover < horizon), cover, np.nan), unit='D')
+
+    forecast = pd.DataFrame({
+        key: items,
+        'On_Hand': on_hand,
+        'Daily_Rate': rate,
+        'Demand_Std': std,
+        'Days_of_Cover': cover,
+        'Reorder_Point': reorder_point,
+        'Stockout_Date': stockout,
+        'Needs_Restock': ((rate > 0) | (on_hand <= 0)) & (on_hand <= reorder_point),
+        'Suggested_Order': np.ceil(np.maximum(reorder_point + rate * lead_time_days - on_hand, 0)),
+    })
+    if key != 'Item_name' and 'Item_name' in inflow_df:
+        names = inflow_df.drop_duplicates(key).set_index(key)['Item_name']
+        forecast.insert(1, 'Item_name', forecast[key].map(names))
+    return forecast.sort_values('Days_of_Cover', kind='stable').reset_index(drop=True)
+
+
+def needs_restock(forecast):
+    """Items at or below their reorder point, soonest stock-out first"""
+    return forecast[forecast['Needs_Restock']]
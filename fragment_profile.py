@@ -0,0 +1,126 @@
+"""Rerun cost of the apps' fragments.
+
+A widget inside an st.fragment reruns only that fragment. For each
+interaction below this times the whole-script rerun Streamlit would do
+without the fragment, and the time spent inside the fragment function,
+which is what a fragment rerun executes, on synthetic data of the given
+size:
+
+    python fragment_profile.py --app gd --inflow-rows 50000 --outflow-rows 300000
+
+AppTest always reruns the whole script, so the fragment's share is taken
+by wrapping st.fragment to time every call of a fragment function.
+"""
+import argparse
+import functools
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+import streamlit as st
+
+from load_test import APPS, ROOT, _page, _widget, serve_sheets, synthetic_tables, write_workbook
+
+# name -> (page, fragment function, widget step)
+INTERACTIONS = {
+    'Purchase Trends period': ('View Data', 'purchase_trends_tab',
+                               lambda at, turn: _widget(at.radio, 'Period').set_value(
+                                   ['Monthly', 'Quarterly'][turn % 2])),
+    'Lot Costing basis': ('View Data', 'lot_costing_tab',
+                          lambda at, turn: _widget(at.radio, 'Match lots by').set_value(
+                              ['Item_Type', 'Item_name'][turn % 2])),
+    'Restock window': ('View Data', 'summary_section',
+                       lambda at, turn: _widget(at.number_input, 'Demand window').set_value(60 + turn)),
+    'Distribute item': ('Distribute', 'distribution_form',
+                        lambda at, turn: _widget(at.selectbox, 'Select Item to Distribute').select_index(
+                            (turn + 1) % 2)),
+}
+
+# Seconds spent in each fragment function during the last script run
+fragment_seconds = {}
+
+
+def timed_fragment(func=None, *, run_every=None, _fragment=st.fragment):
+    """st.fragment that also records how long each call of the function takes"""
+    if func is None:
+        return lambda inner: timed_fragment(inner, run_every=run_every)
+
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            fragment_seconds[func.__name__] = fragment_seconds.get(func.__name__, 0) + time.perf_counter() - start
+
+    return _fragment(timed, run_every=run_every)
+
+
+def profile_app(app, inflow_rows, outflow_rows, repeats, timeout):
+    """Full rerun and fragment milliseconds per interaction, one row per repeat"""
+    from streamlit.testing.v1 import AppTest
+
+    scratch = tempfile.mkdtemp(prefix='fragment-profile-')
+    server = None
+    os.environ['INVENTORY_SPILL_DIR'] = os.path.join(scratch, 'sessions')
+    os.environ['INVENTORY_ID_FILE'] = os.path.join(scratch, 'item_ids.counter')
+    try:
+        inflow, outflow, budget = synthetic_tables(inflow_rows, outflow_rows)
+        if app == 'V3':
+            workbook = os.path.join(scratch, 'fragment_profile.xlsx')
+            write_workbook(workbook, inflow, outflow, budget)
+            os.environ['INVENTORY_WORKBOOK'] = workbook
+        else:
+            server, os.environ['INVENTORY_SHEET_URL'] = serve_sheets(inflow, outflow, budget)
+        samples = []
+        for name, (page, fragment, step) in INTERACTIONS.items():
+            at = AppTest.from_file(os.path.join(ROOT, APPS[app]), default_timeout=timeout)
+            at.run()
+            _page(at, page)
+            at.run()
+            # One untimed turn warms the caches the interaction reads
+            for turn in range(repeats + 1):
+                step(at, turn)
+                fragment_seconds.clear()
+                start = time.perf_counter()
+                at.run()
+                seconds = time.perf_counter() - start
+                if at.exception:
+                    raise RuntimeError(f"{app} {name}: {at.exception[0].value}")
+                if turn:
+                    samples.append({'App': app, 'Interaction': name, 'Full_Rerun_ms': seconds * 1000,
+                                    'Fragment_ms': fragment_seconds.get(fragment, 0) * 1000})
+        return samples
+    finally:
+        if server is not None:
+            server.shutdown()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', nargs='+', choices=list(APPS), default=list(APPS), dest='apps')
+    parser.add_argument('--inflow-rows', type=int, default=20000)
+    parser.add_argument('--outflow-rows', type=int, default=100000)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=600)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    st.fragment = timed_fragment
+    samples = []
+    for app in args.apps:
+        samples.extend(profile_app(app, args.inflow_rows, args.outflow_rows, args.repeats, args.timeout))
+    table = pd.DataFrame(samples).groupby(['App', 'Interaction'], sort=False).median().reset_index()
+    table['Speedup'] = table['Full_Rerun_ms'] / table['Fragment_ms']
+    print(f"{args.inflow_rows:,} purchases and {args.outflow_rows:,} distributions, "
+          f"median of {args.repeats} reruns")
+    print(table.to_string(index=False, formatters={
+        'Full_Rerun_ms': '{:,.0f}'.format, 'Fragment_ms': '{:,.1f}'.format, 'Speedup': '{:,.0f}x'.format}))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,166 +1,166 @@
+import os
+import sys
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime
-import requests
-import gspread
-from google.oauth2.service_account import Credentials
+
+from delta_sync import DeltaSync
+from sheet_client import SheetClient
+
+# Shared modules live at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app_sections import (budget_year_picker, distribute_page, get_cube, get_filter_indexes,
+                          lot_costing_tab, purchase_trends_tab, report_panel, summary_section)
+from budget_ledger import BudgetLedger
+from dashboard import (create_visualizations, department_summary, describe_cube,
+                       item_type_summary, type_distribution_summary, types_summary)
+from filter_index import filter_cube, filter_key, filter_tables
+from filter_widgets import filter_sidebar
+from id_allocator import IdAllocator
+from top_n import TopNService, largest_rows
 
 # Google Sheet ID
 SHEET_ID = "1cRSUykiV5tWa6917qEJfTcAJz9rAHMmfFCRl-UgM2wM"
-SHEET_URL = f"https://docs.google.com/spreadsheets/d/{SHEET_ID}/gviz/tq?tqx=out:csv&sheet="
+# CSV export URL the sheet name is appended to; INVENTORY_SHEET_URL points it
+# elsewhere, e.g. at the local server of load_test.py
+SHEET_URL = os.environ.get("INVENTORY_SHEET_URL",
+                           f"https://docs.google.com/spreadsheets/d/{SHEET_ID}/gviz/tq?tqx=out:csv&sheet=")
+# Last Item_ID issued, shared by every session and server process;
+# INVENTORY_ID_FILE keeps it elsewhere, e.g. in load_test.py's scratch directory
+ITEM_ID_FILE = os.environ.get("INVENTORY_ID_FILE",
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), "item_ids.counter"))
+
+@st.cache_resource
+def get_sheet_client():
+    """One pooled HTTP client shared by every session and rerun"""
+    return SheetClient(SHEET_URL)
+
+@st.cache_resource
+def get_delta_sync():
+    """Row-level sync state for the append-mostly Inflow and Outflow sheets"""
+    return DeltaSync(get_sheet_client())
+
+def show_sync_stats():
+    """Show bytes transferred and the revalidation hit rate in the sidebar"""
+    stats = get_sheet_client().get_stats()
+    delta_stats = get_delta_sync().get_stats()
+    with st.sidebar.expander("Sheet sync"):
+        st.checkbox("Delta sync", value=True, key="delta_sync",
+                    help="Download only rows appended since the last sync")
+        st.caption(f"Requests: {stats['requests']:,} ({stats['retries']:,} retries, {stats['errors']:,} errors)")
+        st.caption(f"Bytes transferred: {stats['bytes_transferred']:,}")
+        st.caption(f"Revalidation hit rate: {stats['hit_rate']:.0%}")
+        st.caption(f"Delta syncs: {delta_stats['delta_syncs']:,}, "
+                   f"full reloads: {delta_stats['full_reloads']:,}, "
+                   f"rows appended: {delta_stats['rows_appended']:,}")
+
+def parse_inflow_dates(df):
+    """Convert Purchase_Date to datetime with the sheet's format"""
+    df['Purchase_Date'] = pd.to_datetime(df['Purchase_Date'], format='%d/%m/%Y')
+    return df
+
+def parse_outflow_dates(df):
+    """Convert Date_of_Distribution to datetime with the sheet's format"""
+    df['Date_of_Distribution'] = pd.to_datetime(df['Date_of_Distribution'], format='%d/%m/%Y')
+    return df
 
 def load_data():
     """Load data from all sheets into pandas DataFrames"""
     try:
-        # Load sheets
-        inflow_df = pd.read_csv(SHEET_URL + "Inflow")
-        outflow_df = pd.read_csv(SHEET_URL + "Outflow")
-        budget_df = pd.read_csv(SHEET_URL + "Budget")
-        
-        # Convert date columns to datetime with the correct format
-        inflow_df['Purchase_Date'] = pd.to_datetime(inflow_df['Purchase_Date'], format='%d/%m/%Y')
-        outflow_df['Date_of_Distribution'] = pd.to_datetime(outflow_df['Date_of_Distribution'], format='%d/%m/%Y')
+        client = get_sheet_client()
+        if st.session_state.get("delta_sync", True):
+            # Append only the rows added since the last sync
+            sync = get_delta_sync()
+            inflow_df = sync.sync("Inflow", prepare=parse_inflow_dates)
+            outflow_df = sync.sync("Outflow", prepare=parse_outflow_dates)
+        else:
+            # Load sheets, reusing cached frames when the sheet is unchanged
+            inflow_df = parse_inflow_dates(client.fetch("Inflow"))
+            outflow_df = parse_outflow_dates(client.fetch("Outflow"))
+        budget_df = client.fetch("Budget")
         
         return inflow_df, outflow_df, budget_df
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
         return None, None, None
 
-def get_types_summary(inflow_df, outflow_df, budget_df):
-    """Create summary of Event Types and Item Types"""
-    # Get unique types
-    event_types = pd.concat([
-        outflow_df['Event_Type'],
-        budget_df['Event_Type']
-    ]).unique()
-    
-    item_types = pd.concat([
-        inflow_df['Item_Type'],
-        outflow_df['Item_Type']
-    ]).unique()
-    
-    # Create summary DataFrames
-    event_type_summary = pd.DataFrame({
-        'Event_Type': event_types,
-        'Total_Budget': [budget_df[budget_df['Event_Type'] == et]['2025_Budget_Amount'].sum() for et in event_types],
-        'Total_Distributions': [outflow_df[outflow_df['Event_Type'] == et]['Cost_per_Item'].mul(outflow_df['Quantity']).sum() for et in event_types],
-        'Distribution_Count': [outflow_df[outflow_df['Event_Type'] == et].shape[0] for et in event_types]
-    })
-    
-    item_type_summary = pd.DataFrame({
-        'Item_Type': item_types,
-        'Total_Purchases': [inflow_df[inflow_df['Item_Type'] == it]['Total_Cost'].sum() for it in item_types],
-        'Total_Distributions': [outflow_df[outflow_df['Item_Type'] == it]['Cost_per_Item'].mul(outflow_df['Quantity']).sum() for it in item_types],
-        'Purchase_Count': [inflow_df[inflow_df['Item_Type'] == it].shape[0] for it in item_types],
-        'Distribution_Count': [outflow_df[outflow_df['Item_Type'] == it].shape[0] for it in item_types]
-    })
-    
-    return event_type_summary, item_type_summary
+def data_version():
+    """Version of the Inflow and Outflow data currently served by load_data"""
+    if st.session_state.get("delta_sync", True):
+        sync = get_delta_sync()
+        return ('delta', sync.version("Inflow"), sync.version("Outflow"))
+    client = get_sheet_client()
+    return ('fetch', client.version("Inflow"), client.version("Outflow"))
 
-def create_visualizations(inflow_df, outflow_df, budget_df):
-    """Create visualizations using plotly"""
-    # Total Inflow vs Outflow Bar Chart
-    fig1 = go.Figure(data=[
-        go.Bar(name='Total Purchases', x=['Total'], y=[inflow_df['Total_Cost'].sum()]),
-        go.Bar(name='Total Distributions', x=['Total'], 
-               y=[outflow_df['Cost_per_Item'].mul(outflow_df['Quantity']).sum()])
-    ])
-    fig1.update_layout(title='Total Purchases vs Distributions')
+@st.cache_resource
+def get_id_allocator():
+    """Item_IDs unique across sessions and processes, in the sheet's 250001, 250002, ... format"""
+    # Six digits like the sheet's IDs: after 999999 they get a seventh, and keep sorting as the
+    # numbers the sheet stores them as, but no longer as strings
+    return IdAllocator(ITEM_ID_FILE, digits=6, start=250001)
 
-    # Item Type Distribution for Inflow
-    inflow_by_type = inflow_df.groupby('Item_Type')['Total_Cost'].sum()
-    fig2 = px.pie(values=inflow_by_type.values,
-                  names=inflow_by_type.index,
-                  title='Purchase Distribution by Item Type')
+def next_item_id(inflow_df):
+    """A new Item_ID, above every ID of the Inflow sheet"""
+    allocator = get_id_allocator()
+    # The sheet's IDs are looked at once per data version, not on every purchase
+    version = data_version()
+    if st.session_state.get("item_ids_seen", ()) != (version,):
+        allocator.advance_past(inflow_df['Item_ID'])
+        st.session_state.item_ids_seen = (version,)
+    return allocator.next_id()
 
-    # Department-wise Distribution for Outflow
-    outflow_by_dept = outflow_df.groupby('Department')['Cost_per_Item'].sum()
-    fig3 = px.pie(values=outflow_by_dept.values,
-                  names=outflow_by_dept.index,
-                  title='Distribution by Department')
+def pending_item_id(inflow_df):
+    """Item_ID of the purchase this session is entering, reserved once and kept until the sheet has it"""
+    # Showing the row again, or adding it, reuses the ID instead of reserving another
+    pending = st.session_state.get("pending_item_id")
+    if pending is None or pd.to_numeric(inflow_df['Item_ID'], errors='coerce').eq(int(pending)).any():
+        pending = next_item_id(inflow_df)
+        st.session_state.pending_item_id = pending
+    return pending
 
-    # Budget vs Actual Spending
-    fig4 = go.Figure(data=[
-        go.Bar(name='Budget Amount', x=budget_df['Event_Type'], y=budget_df['2025_Budget_Amount']),
-        go.Bar(name='Actual Spent', x=budget_df['Event_Type'], y=budget_df['Actual_Amount_Spent'])
-    ])
-    fig4.update_layout(title='Budget vs Actual Spending by Event Type',
-                      barmode='group')
+@st.cache_resource
+def get_top_n():
+    """Top-N trackers shared by every session, fed with each synced batch of rows"""
+    return TopNService()
 
-    # New visualization: Item Count by Type Pie Chart
-    item_type_counts = inflow_df.groupby('Item_Type')['Quantity'].sum()
-    fig5 = px.pie(
-        values=item_type_counts.values,
-        names=item_type_counts.index,
-        title='Item Distribution by Type',
-        hole=0.4  # Makes it a donut chart
-    )
-    fig5.update_traces(textposition='inside', textinfo='percent+label')
+def sync_top_n(version, inflow_df, outflow_df):
+    """Feed rows added since the last run to the Top-N trackers"""
+    # Changed rows rebuild the trackers and appended ones only update them, whichever
+    # way the session loads the sheets; the versions only spare re-reading unchanged frames
+    service = get_top_n()
+    service.sync('Inflow', inflow_df, (version[0], version[1]))
+    service.sync('Outflow', outflow_df, (version[0], version[2]))
+    return service
 
-    # New visualization: Purchase Costs Over Time
-    # Date is already in datetime format from load_data()
-    daily_costs = inflow_df.groupby('Purchase_Date')['Total_Cost'].sum().reset_index()
-    
-    fig6 = go.Figure()
-    fig6.add_trace(go.Scatter(
-        x=daily_costs['Purchase_Date'],
-        y=daily_costs['Total_Cost'],
-        mode='lines+markers',
-        name='Daily Purchase Cost',
-        hovertemplate='Date: %{x|%d/%m/%Y}<br>Cost: $%{y:,.2f}<extra></extra>'
-    ))
-    
-    # Add trend line
-    fig6.add_trace(go.Scatter(
-        x=daily_costs['Purchase_Date'],
-        y=daily_costs['Total_Cost'].rolling(window=7).mean(),
-        mode='lines',
-        name='7-day Moving Average',
-        line=dict(dash='dash'),
-        hovertemplate='Date: %{x|%d/%m/%Y}<br>Average: $%{y:,.2f}<extra></extra>'
-    ))
-    
-    fig6.update_layout(
-        title='Purchase Costs Over Time',
-        xaxis_title='Date',
-        yaxis_title='Total Cost ($)',
-        hovermode='x unified',
-        xaxis=dict(
-            tickformat='%d/%m/%Y',
-            tickangle=45
-        )
-    )
+@st.cache_resource
+def get_budget_ledger():
+    """Budget ledger shared by every session, its actuals kept in step with Outflow"""
+    return BudgetLedger()
 
-    return fig1, fig2, fig3, fig4, fig5, fig6
+def sync_budget_ledger(version, outflow_df, budget_df):
+    """Add distributions appended since the last run to the ledger's actuals"""
+    # Shared by every session: budgets are replaced only when the Budget sheet changes, and
+    # actuals follow the Outflow rows themselves, whichever way the session loads them
+    ledger = get_budget_ledger()
+    ledger.set_budgets(budget_df, get_sheet_client().version("Budget"))
+    ledger.sync(outflow_df, (version[0], version[2]))
+    return ledger
 
-def generate_summary_report(inflow_df, outflow_df, budget_df):
-    """Generate a summary report"""
-    total_purchases = inflow_df['Total_Cost'].sum()
-    total_distributions = outflow_df['Cost_per_Item'].mul(outflow_df['Quantity']).sum()
-    total_budget = budget_df['2025_Budget_Amount'].sum()
-    total_spent = budget_df['Actual_Amount_Spent'].sum()
-    
-    return {
-        'Total Purchases': total_purchases,
-        'Total Distributions': total_distributions,
-        'Total Budget': total_budget,
-        'Total Spent': total_spent,
-        'Budget Remaining': total_budget - total_spent,
-        'Top Vendors': inflow_df.groupby('Vendor_Name')['Total_Cost'].sum().nlargest(5),
-        'Top Departments': outflow_df.groupby('Department')['Cost_per_Item'].sum().nlargest(5)
-    }
+def get_types_summary(cube, ledger, budget_year=None):
+    """Create summary of Event Types and Item Types"""
+    # One rollup per dimension instead of a scan per type
+    return types_summary(cube, ledger, budget_year)
 
 def add_purchase_to_sheet(purchase_data):
     """Add a new purchase record to Inflow sheet"""
     try:
         # Load Inflow sheet
-        inflow_df = pd.read_csv(SHEET_URL + "Inflow")
+        inflow_df = get_sheet_client().fetch("Inflow")
         
-        # Get the next Item_ID
-        last_row = len(inflow_df)
-        new_item_id = f"25{last_row+1:04d}"  # Format: 250001, 250002, etc.
+        # The Item_ID shown when the purchase was entered
+        if not purchase_data.get('Item_ID'):
+            purchase_data = {**purchase_data, 'Item_ID': pending_item_id(inflow_df)}
         
         # Prepare row data in the correct order
         headers = inflow_df.columns.tolist()
@@ -172,6 +172,7 @@ def add_purchase_to_sheet(purchase_data):
         
         # Save the updated DataFrame back to the sheet
         inflow_df.to_csv(SHEET_URL + "Inflow", index=False)
+        st.session_state.pop("pending_item_id", None)
         return True
         
     except Exception as e:
@@ -182,7 +183,7 @@ def add_distribution(data):
     """Add a new distribution record to Outflow sheet"""
     try:
         # Load Outflow sheet
-        outflow_df = pd.read_csv(SHEET_URL + "Outflow")
+        outflow_df = get_sheet_client().fetch("Outflow")
         
         # Convert dictionary to DataFrame
         new_row = pd.DataFrame([data])
@@ -235,7 +236,7 @@ def manage_data_page(inflow_df, outflow_df, budget_df):
                 
                 # Prepare data for submission
                 purchase_data = {
-                    'Item_ID': f"ITM{len(inflow_df) + 1:04d}",
+                    'Item_ID': next_item_id(inflow_df),
                     'Item_Type': item_type,
                     'Item_name': item_name,
                     'Cost_per_Item': cost_per_item,
@@ -250,7 +251,7 @@ def manage_data_page(inflow_df, outflow_df, budget_df):
                 
                 if add_purchase_to_sheet(purchase_data):
                     st.success("Purchase added successfully!")
-                    st.experimental_rerun()
+                    st.rerun()
     
     else:  # Distribution
         st.subheader("Add New Distribution")
@@ -308,7 +309,7 @@ def manage_data_page(inflow_df, outflow_df, budget_df):
                 
                 if add_distribution(distribution_data):
                     st.success("Distribution added successfully!")
-                    st.experimental_rerun()
+                    st.rerun()
     
     # Show current data
     st.subheader("Current Data")
@@ -322,7 +323,11 @@ def manage_data_page(inflow_df, outflow_df, budget_df):
 def purchase_page():
     """Purchase Form Page"""
     st.header("Add New Purchase")
-    
+    purchase_form()
+
+@st.fragment
+def purchase_form():
+    """Purchase form and its submission; submitting reruns only this fragment"""
     with st.form("purchase_form"):
         # Required fields
         item_type = st.selectbox(
@@ -374,9 +379,16 @@ def purchase_page():
             # Calculate total cost
             total_cost = cost_per_item * quantity
             
+            # The row's Item_ID is reserved for this session, so two people entering purchases
+            # never share one, and showing it again does not use up another
+            inflow_df, _, _ = load_data()
+            if inflow_df is None:
+                return
+            
             # Display the data that would be added
             st.success("Here's what will be added to the sheet:")
             purchase_data = {
+                'Item_ID': pending_item_id(inflow_df),
                 'Item_Type': item_type,
                 'Item_name': item_name,
                 'Cost_per_Item': cost_per_item,
@@ -401,114 +413,16 @@ def purchase_page():
             # Add link to open the sheet
             st.markdown("[Open Google Sheet](https://docs.google.com/spreadsheets/d/1cRSUykiV5tWa6917qEJfTcAJz9rAHMmfFCRl-UgM2wM/edit)")
 
-def distribute_page():
-    """Distribution Form Page"""
-    st.header("Distribute Items")
-    
-    # Load current data
-    inflow_df, outflow_df, budget_df = load_data()
-    
-    if inflow_df is None:
-        return
+def show_sheet_instructions(distribution_data):
+    """How to enter a submitted distribution in the Google Sheet by hand"""
+    # Provide link to update the sheets
+    st.info("""
+    To update the sheets:
+    1. Open the Google Sheet using the link below
+    2. Add this distribution to the 'Outflow' sheet
+    3. Update the quantity in the 'Inflow' sheet for item: """ + str(distribution_data['Item_ID']))
     
-    # Show available items
-    st.subheader("Available Items")
-    available_items = inflow_df[['Item_ID', 'Item_Type', 'Item_name', 'Quantity', 'Cost_per_Item']]
-    available_items = available_items[available_items['Quantity'] > 0]  # Only show items with quantity > 0
-    st.dataframe(available_items)
-    
-    with st.form("distribution_form"):
-        # Item Selection
-        selected_item = st.selectbox(
-            "Select Item to Distribute*",
-            options=available_items['Item_ID'].tolist(),
-            format_func=lambda x: f"{x} - {available_items[available_items['Item_ID'] == x]['Item_name'].iloc[0]}"
-        )
-        
-        # Get selected item details
-        item_details = available_items[available_items['Item_ID'] == selected_item].iloc[0]
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            # Required fields
-            department = st.text_input(
-                "Department*",
-                help="Enter the receiving department"
-            )
-            
-            gift = st.selectbox(
-                "Gift*",
-                options=['Yes', 'No'],
-                help="Is this a gift?"
-            )
-            
-            quantity = st.number_input(
-                "Quantity*",
-                min_value=1,
-                max_value=int(item_details['Quantity']),
-                help=f"Available quantity: {item_details['Quantity']}"
-            )
-        
-        with col2:
-            event_type = st.selectbox(
-                "Event Type*",
-                options=budget_df['Event_Type'].unique().tolist(),
-                help="Select the type of event"
-            )
-            
-            event_name = st.text_input(
-                "Event Name*",
-                help="Enter the name of the event"
-            )
-            
-            distribution_date = st.date_input(
-                "Distribution Date*",
-                help="Select the date of distribution"
-            )
-        
-        # Optional Notes
-        notes = st.text_area(
-            "Notes (Optional)",
-            help="Add any additional information"
-        )
-        
-        submitted = st.form_submit_button("Submit Distribution")
-        
-        if submitted:
-            # Validate required fields
-            if not all([department, event_type, event_name]):
-                st.error("Please fill in all required fields marked with *")
-                return
-            
-            # Prepare distribution data
-            distribution_data = {
-                'Item_ID': selected_item,
-                'Event_Type': event_type,
-                'Event_Name': event_name,
-                'Department': department,
-                'Gift': gift,
-                'Quantity': quantity,
-                'Cost_per_Item': item_details['Cost_per_Item'],
-                'Item_Code': '',  # Leave blank or generate if needed
-                'Contact_Name_(Event)': '',  # Can be added to form if needed
-                'Item_Type': item_details['Item_Type'],
-                'Gift_Type': 'Regular' if gift == 'No' else 'Gift',
-                'Date_of_Distribution': distribution_date.strftime('%Y-%m-%d'),
-                'Completion_Status': 'Completed'
-            }
-            
-            # Display the data that will be added
-            st.success("Here's what will be added to the Outflow sheet:")
-            st.write(distribution_data)
-            
-            # Provide link to update the sheet
-            st.info("""
-            To update the sheets:
-            1. Open the Google Sheet using the link below
-            2. Add this distribution to the 'Outflow' sheet
-            3. Update the quantity in the 'Inflow' sheet for item: """ + selected_item)
-            
-            st.markdown(f"[Open Google Sheet](https://docs.google.com/spreadsheets/d/{SHEET_ID}/edit)")
+    st.markdown(f"[Open Google Sheet](https://docs.google.com/spreadsheets/d/{SHEET_ID}/edit)")
 
 def main():
     st.title('Inventory Management System')
@@ -519,12 +433,26 @@ def main():
     if page == 'Purchase':
         purchase_page()
     elif page == 'Distribute':
-        distribute_page()
+        inflow_df, _, budget_df = load_data()
+        distribute_page(data_version(), inflow_df, budget_df, on_submit=show_sheet_instructions)
     else:  # View Data page
         try:
             # Load and display data
             inflow_df, outflow_df, budget_df = load_data()
             if inflow_df is not None:
+                # Cross-filter every table, chart and KPI from the sidebar selection
+                version = data_version()
+                top_n = sync_top_n(version, inflow_df, outflow_df)
+                ledger = sync_budget_ledger(version, outflow_df, budget_df)
+                indexes = get_filter_indexes(version, inflow_df, outflow_df)
+                filters = filter_sidebar(indexes)
+                all_inflow_df, all_outflow_df = inflow_df, outflow_df
+                inflow_df, outflow_df, budget_df = filter_tables(indexes, inflow_df, outflow_df, budget_df, filters)
+                if filter_key(filters):
+                    # The trackers cover the whole history; filtered views rank directly
+                    top_n = None
+                    st.caption(f"Filtered to {len(inflow_df):,} purchases and {len(outflow_df):,} distributions")
+
                 # Data Tables Section
                 st.header('Current Inventory')
                 tabs = st.tabs(['Inflow', 'Outflow', 'Budget'])
@@ -535,21 +463,35 @@ def main():
                 # Visualizations Section
                 st.header('Data Visualizations')
                 
+                # Roll every chart and table up from the aggregate cube
+                cube = filter_cube(get_cube(version, all_inflow_df, all_outflow_df), filters)
+                if cube is None:
+                    # Vendors are not a cube dimension: roll up the filtered rows
+                    cube = get_cube((version, filter_key(filters)), inflow_df, outflow_df)
+                if filter_key(filters):
+                    # The shared ledger covers all distributions; filtered views roll up from the cube
+                    ledger = BudgetLedger.from_cube(budget_df, cube)
+                st.caption(describe_cube(cube))
+                
+                # Compare any budgeted year against the Outflow actuals
+                budget_year = budget_year_picker(ledger)
+                
                 # Create visualizations
-                fig1, fig2, fig3, fig4, fig5, fig6 = create_visualizations(inflow_df, outflow_df, budget_df)
+                fig1, fig2, fig3, fig4, fig5, fig6 = create_visualizations(cube, ledger, budget_year)
                 
                 # Display main metrics
                 col1, col2, col3 = st.columns(3)
-                total_purchases = inflow_df['Total_Cost'].sum()
-                total_distributions = outflow_df['Cost_per_Item'].mul(outflow_df['Quantity']).sum()
-                total_budget = budget_df['2025_Budget_Amount'].sum()
+                total_purchases = cube.total('Inflow', 'Value')
+                total_distributions = cube.total('Outflow', 'Value')
+                total_budget, total_spent, _ = ledger.totals(budget_year)
                 
                 with col1:
                     st.metric("Total Purchases", f"${total_purchases:,.2f}")
                 with col2:
                     st.metric("Total Distributions", f"${total_distributions:,.2f}")
                 with col3:
-                    st.metric("Total Budget", f"${total_budget:,.2f}")
+                    st.metric(f"Total Budget ({budget_year})", f"${total_budget:,.2f}",
+                              f"${total_spent:,.2f} spent", delta_color="off")
                 
                 # Display visualizations in tabs
                 viz_tabs = st.tabs([
@@ -558,7 +500,8 @@ def main():
                     'Department Analysis',
                     'Budget Analysis',
                     'Item Distribution',
-                    'Purchase Trends'
+                    'Purchase Trends',
+                    'Lot Costing'
                 ])
                 
                 with viz_tabs[0]:
@@ -568,14 +511,14 @@ def main():
                     col1, col2 = st.columns(2)
                     with col1:
                         st.subheader("Top 5 Items by Quantity")
-                        top_items = inflow_df.nlargest(5, 'Quantity')[
+                        top_items = largest_rows(top_n, 'items_by_quantity', inflow_df, 5, 'Quantity')[
                             ['Item_name', 'Quantity', 'Total_Cost']
                         ]
                         st.dataframe(top_items)
                     
                     with col2:
                         st.subheader("Recent Distributions")
-                        recent_dist = outflow_df.nlargest(5, 'Date_of_Distribution')[
+                        recent_dist = largest_rows(top_n, 'recent_distributions', outflow_df, 5, 'Date_of_Distribution')[
                             ['Event_Name', 'Department', 'Quantity', 'Date_of_Distribution']
                         ]
                         # Format the date column
@@ -587,10 +530,7 @@ def main():
                     
                     # Item type summary
                     st.subheader("Item Type Summary")
-                    item_summary = inflow_df.groupby('Item_Type').agg({
-                        'Quantity': 'sum',
-                        'Total_Cost': 'sum'
-                    }).reset_index()
+                    item_summary = item_type_summary(cube)
                     st.dataframe(item_summary)
                 
                 with viz_tabs[2]:
@@ -598,36 +538,28 @@ def main():
                     
                     # Department distribution summary
                     st.subheader("Department Distribution Summary")
-                    dept_summary = outflow_df.groupby('Department').agg({
-                        'Quantity': 'sum',
-                        'Cost_per_Item': lambda x: (x * outflow_df.loc[x.index, 'Quantity']).sum()
-                    }).reset_index()
-                    dept_summary.columns = ['Department', 'Total Items', 'Total Value']
+                    dept_summary = department_summary(cube)
                     st.dataframe(dept_summary)
                 
                 with viz_tabs[3]:
                     st.plotly_chart(fig4, use_container_width=True)
                     
-                    # Budget utilization
-                    st.subheader("Budget Utilization")
-                    budget_summary = budget_df[['Event_Type', '2025_Budget_Amount', 'Actual_Amount_Spent']]
-                    budget_summary['Utilization %'] = (
-                        budget_summary['Actual_Amount_Spent'] / 
-                        budget_summary['2025_Budget_Amount'] * 100
-                    ).round(2)
-                    st.dataframe(budget_summary)
+                    # Budget utilization, with actuals computed from Outflow
+                    st.subheader(f"Budget Utilization ({budget_year})")
+                    budget_summary = ledger.report(budget_year)
+                    st.dataframe(budget_summary.style.format({
+                        'Budget_Amount': '${:,.2f}',
+                        'Actual_Amount_Spent': '${:,.2f}',
+                        'Remaining': '${:,.2f}',
+                        'Utilization %': '{:,.2f}'
+                    }))
                 
                 with viz_tabs[4]:  # New Item Distribution tab
                     st.plotly_chart(fig5, use_container_width=True)
                     
                     # Add summary table
                     st.subheader("Item Type Distribution Summary")
-                    type_summary = inflow_df.groupby('Item_Type').agg({
-                        'Quantity': 'sum',
-                        'Total_Cost': 'sum',
-                        'Item_name': 'count'
-                    }).reset_index()
-                    type_summary.columns = ['Item Type', 'Total Quantity', 'Total Cost', 'Unique Items']
+                    type_summary = type_distribution_summary(cube)
                     st.dataframe(type_summary.style.format({
                         'Total Cost': '${:,.2f}',
                         'Total Quantity': '{:,}',
@@ -636,77 +568,27 @@ def main():
                 
                 with viz_tabs[5]:  # New Purchase Trends tab
                     st.plotly_chart(fig6, use_container_width=True)
-                    
-                    # Add monthly summary
-                    st.subheader("Monthly Purchase Summary")
-                    monthly_summary = inflow_df.set_index('Purchase_Date').resample('ME').agg({
-                        'Total_Cost': 'sum',
-                        'Quantity': 'sum',
-                        'Item_name': 'count'
-                    }).reset_index()
-                    monthly_summary.columns = ['Month', 'Total Cost', 'Items Purchased', 'Unique Items']
-                    # Format the month in dd/mm/yyyy
-                    monthly_summary['Month'] = monthly_summary['Month'].dt.strftime('%d/%m/%Y')
-                    st.dataframe(monthly_summary.style.format({
-                        'Total Cost': '${:,.2f}',
-                        'Items Purchased': '{:,}',
-                        'Unique Items': '{:,}'
-                    }))
+                    purchase_trends_tab(cube)
+                
+                with viz_tabs[6]:  # FIFO lot costing
+                    lot_costing_tab(version, all_inflow_df, all_outflow_df)
                 
                 # Add Text Summary Section
                 st.header('Summary Report')
                 st.markdown("""---""")  # Horizontal line
-
-                # Calculate key metrics
-                total_purchases = inflow_df['Total_Cost'].sum()  # Sum of Total_Cost from Inflow sheet
-                total_distributions = outflow_df['Total_Cost'].sum()  # Sum of Total_Cost from Outflow sheet
-                total_items_purchased = inflow_df['Quantity'].sum()
-                total_items_distributed = outflow_df['Quantity'].sum()
-                items_in_stock = total_items_purchased - total_items_distributed
-                budget_utilization = (budget_df['Actual_Amount_Spent'].sum() / budget_df['2025_Budget_Amount'].sum() * 100).round(2)
-                
-                # Get top departments and items
-                top_departments = outflow_df.groupby('Department')['Quantity'].sum().nlargest(3)
-                top_items = inflow_df.groupby('Item_name')['Quantity'].sum().nlargest(3)
-                
-                # Create summary text
-                summary_text = f"""
-                ### Inventory Overview
-                As of {datetime.now().strftime('%B %d, %Y')}, our inventory system shows the following key metrics:
-
-                **Financial Summary:**
-                - Total purchases amount to ${total_purchases:,.2f}
-                - Total distributions value is ${total_distributions:,.2f}
-                - Current budget utilization is {budget_utilization}% of the total ${total_budget:,.2f} budget
-
-                **Inventory Status:**
-                - Total items purchased: {total_items_purchased:,}
-                - Total items distributed: {total_items_distributed:,}
-                - Current items in stock: {items_in_stock:,}
-
-                **Top Performing Departments:**
-                {', '.join([f"{dept} ({qty:,} items)" for dept, qty in top_departments.items()])}
-
-                **Most Active Items:**
-                {', '.join([f"{item} ({qty:,} units)" for item, qty in top_items.items()])}
-
-                **Key Observations:**
-                - {'Budget utilization is within expected range' if budget_utilization < 80 else 'Budget utilization is high and needs attention'}
-                - {'Inventory levels are healthy' if items_in_stock > 100 else 'Inventory levels are low and may need restocking'}
-                - The distribution pattern shows {outflow_df['Department'].nunique()} active departments
-                """
+                summary_section(version, cube, ledger, top_n, inflow_df, outflow_df,
+                                all_inflow_df, all_outflow_df, budget_year)
                 
-                st.markdown(summary_text)
-                
-                # Additional Notes or Recommendations
-                if budget_utilization > 80:
-                    st.warning("⚠️ Budget utilization is high. Consider reviewing spending patterns.")
-                if items_in_stock < 100:
-                    st.warning("⚠️ Low inventory levels detected. Consider restocking popular items.")
+                # Build the exportable report off the request path
+                # A job only exists once exported, so selections that are never exported cost nothing
+                report_panel(version, filters, inflow_df, outflow_df, budget_df,
+                             all_inflow_df, all_outflow_df, cube)
 
         except Exception as e:
             st.error(f"Error loading data: {str(e)}")
             st.info("Please make sure the Google Sheet is accessible.")
 
+    show_sync_stats()
+
 if __name__ == '__main__':
     main() 
\ No newline at end of file
@@ -0,0 +1,187 @@
+import csv
+import hashlib
+import threading
+from io import StringIO
+from urllib.parse import quote
+
+import pandas as pd
+
+
+def rows_checksum(rows, digest=None):
+    """Stable checksum of raw CSV rows (lists of strings).
+
+    Passing the ``digest`` the earlier rows were hashed into extends it
+    with ``rows``, so the checksum of a growing sheet is kept up to date
+    from its appended rows alone.
+    """
+    digest = hashlib.sha1() if digest is None else digest
+    for row in rows:
+        digest.update("\x1f".join(row).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.copy().hexdigest()
+
+
+class DeltaSync:
+    """Keep append-mostly sheets in sync by downloading only new rows.
+
+    For every sheet the last synced row count and a checksum of the last
+    ``tail_rows`` raw rows are remembered. A sync asks the sheet for the
+    rows starting at the beginning of that tail: if the tail still matches,
+    only the rows after it are parsed and appended to the cached frame,
+    otherwise earlier rows were edited or deleted and the sheet is reloaded
+    in full. A full reload is also forced every ``full_every`` syncs to pick
+    up edits made above the tail window.
+
+    Appended rows are kept as parsed chunks and joined to the cached frame
+    only when it is asked for, and the frame is handed out as it is, not
+    copied, so a sync that finds nothing new costs nothing per row.
+    """
+
+    def __init__(self, client, tail_rows=20, full_every=50):
+        self.client = client
+        self.tail_rows = max(1, tail_rows)
+        self.full_every = full_every
+        self._state = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'full_reloads': 0,
+            'delta_syncs': 0,
+            'rows_fetched': 0,
+            'rows_appended': 0,
+        }
+
+    def sync(self, sheet, prepare=None):
+        """Return the up-to-date frame for a sheet.
+
+        ``prepare`` is applied to each newly parsed chunk (the whole sheet on
+        a full reload, only the new rows otherwise), so per-row conversions
+        such as date parsing also scale with the new rows. The frame is the
+        cached one, shared by every caller: treat it as read-only.
+        """
+        with self._sheet_lock(sheet):
+            state = self._state.get(sheet)
+            if state is None or state['syncs_since_full'] >= self.full_every:
+                return self._full_reload(sheet, prepare)
+
+            offset = max(state['row_count'] - self.tail_rows, 0)
+            header, rows = self._query(sheet, offset)
+            overlap = state['row_count'] - offset
+            if (header != state['header'] or len(rows) < overlap
+                    or rows_checksum(rows[:overlap]) != state['tail_checksum']):
+                return self._full_reload(sheet, prepare)
+
+            new_rows = rows[overlap:]
+            state['syncs_since_full'] += 1
+            self._count('delta_syncs', 1)
+            if new_rows:
+                chunk = self._parse(header, new_rows, prepare)
+                frame = state['frame']
+                if len(frame) or state['chunks']:
+                    for column in chunk.columns.intersection(frame.columns):
+                        if chunk[column].dtype != frame[column].dtype:
+                            try:
+                                chunk[column] = chunk[column].astype(frame[column].dtype)
+                            except (TypeError, ValueError):
+                                pass
+                    state['chunks'].append(chunk)
+                else:
+                    # Rows appended to a sheet that only had its header keep their own types
+                    state['frame'] = chunk
+                state['row_count'] += len(new_rows)
+                state['tail'] = (state['tail'] + new_rows)[-self.tail_rows:]
+                state['tail_checksum'] = rows_checksum(state['tail'])
+                # The whole-sheet checksum the next full reload compares against
+                state['checksum'] = rows_checksum(new_rows, state['digest'])
+                state['version'] += 1
+                self._count('rows_appended', len(new_rows))
+            return self._frame(state)
+
+    def version(self, sheet):
+        """Counter that increases whenever the sheet's frame changes"""
+        state = self._state.get(sheet)
+        return state['version'] if state else 0
+
+    def generation(self, sheet):
+        """Counter that increases whenever the sheet is replaced by a full reload"""
+        state = self._state.get(sheet)
+        return state['generation'] if state else 0
+
+    def invalidate(self, sheet=None):
+        """Force the next sync of one sheet, or of all sheets, to reload in full"""
+        with self._lock:
+            sheets = list(self._state) if sheet is None else [sheet]
+            for name in sheets:
+                if name in self._state:
+                    self._state[name]['syncs_since_full'] = self.full_every
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def _full_reload(self, sheet, prepare):
+        header, rows = self._query(sheet, 0)
+        digest = hashlib.sha1()
+        checksum = rows_checksum(rows, digest)
+        previous = self._state.get(sheet)
+        self._count('full_reloads', 1)
+        if previous is not None and previous['checksum'] == checksum and previous['header'] == header:
+            # Nothing changed anywhere in the sheet: keep the parsed frame
+            previous['syncs_since_full'] = 0
+            return self._frame(previous)
+
+        tail = rows[-self.tail_rows:]
+        self._state[sheet] = {
+            'header': header,
+            'frame': self._parse(header, rows, prepare),
+            'chunks': [],  # parsed appended rows not yet joined to the frame
+            'row_count': len(rows),
+            'tail': tail,
+            'tail_checksum': rows_checksum(tail),
+            'checksum': checksum,
+            'digest': digest,
+            'syncs_since_full': 0,
+            'version': previous['version'] + 1 if previous else 1,
+            'generation': previous['generation'] + 1 if previous else 1,
+        }
+        return self._state[sheet]['frame']
+
+    def _frame(self, state):
+        """The sheet's frame, with any appended chunks joined to it in one concat"""
+        if state['chunks']:
+            state['frame'] = pd.concat([state['frame'], *state['chunks']], ignore_index=True)
+            state['chunks'] = []
+        return state['frame']
+
+    def _query(self, sheet, offset):
+        """Download the sheet's rows from ``offset`` on, as (header, rows)"""
+        query = f"select * offset {offset}" if offset else "select *"
+        url = f"{self.client.base_url}{quote(sheet)}&headers=1&tq={quote(query)}"
+        response = self.client.get(url)
+        rows = list(csv.reader(StringIO(response.text)))
+        if not rows:
+            return [], []
+        self._count('rows_fetched', len(rows) - 1)
+        return rows[0], rows[1:]
+
+    def _parse(self, header, rows, prepare):
+        if not header:
+            return pd.DataFrame()
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        writer.writerows(rows)
+        buffer.seek(0)
+        # A sheet with only its header is an empty frame with its columns
+        frame = pd.read_csv(buffer) if rows else pd.DataFrame(columns=header)
+        if prepare is not None:
+            frame = prepare(frame)
+        return frame
+
+    def _sheet_lock(self, sheet):
+        with self._lock:
+            return self._locks.setdefault(sheet, threading.Lock())
+
+    def _count(self, key, amount):
+        with self._lock:
+            self.stats[key] += amount
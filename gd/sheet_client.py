@@ -0,0 +1,146 @@
+import hashlib
+import random
+import threading
+import time
+from io import StringIO
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class SheetClient:
+    """Fetch Google Sheet CSV exports over one pooled keep-alive session.
+
+    Each sheet remembers the ETag/Last-Modified validators of its last
+    download together with the parsed DataFrame, so a 304 response reuses
+    the frame without downloading or parsing anything.
+
+    ``stats`` counts every response, including those that were retried or
+    failed, and ``bytes_transferred`` is their body size as received, i.e.
+    compressed when the server gzips the export.
+    """
+
+    def __init__(self, base_url, timeout=30, max_retries=3, backoff=0.5,
+                 max_backoff=8.0, pool_size=10):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+
+        self._cache = {}  # sheet -> {'etag', 'last_modified', 'digest', 'frame', 'version'}
+        self._lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'retries': 0,
+            'not_modified': 0,
+            'downloads': 0,
+            'errors': 0,  # error statuses and connection failures
+            'bytes_transferred': 0,
+        }
+
+    def get(self, url, headers=None):
+        """GET a URL, retrying transient failures with backoff and jitter"""
+        attempt = 0
+        while True:
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+                self._record(response)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+            except (requests.ConnectionError, requests.Timeout):
+                with self._lock:
+                    self.stats['errors'] += 1
+                if attempt >= self.max_retries:
+                    raise
+            attempt += 1
+            with self._lock:
+                self.stats['retries'] += 1
+            # Full jitter: sleep a random amount up to the exponential cap
+            time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+
+    def fetch(self, sheet, **read_csv_kwargs):
+        """Return the sheet as a DataFrame, revalidating any cached copy"""
+        with self._lock:
+            cached = self._cache.get(sheet)
+
+        headers = {}
+        if cached is not None:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        response = self.get(self.base_url + sheet, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            return cached['frame'].copy()
+
+        digest = hashlib.sha1(response.content).hexdigest()
+        if cached is not None and cached['digest'] == digest:
+            # Servers without validators still often return identical bytes
+            frame = cached['frame']
+            version = cached['version']
+        else:
+            frame = pd.read_csv(StringIO(response.text), **read_csv_kwargs)
+            version = cached['version'] + 1 if cached else 1
+        with self._lock:
+            self._cache[sheet] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'digest': digest,
+                'frame': frame,
+                'version': version,
+            }
+        return frame.copy()
+
+    def version(self, sheet):
+        """Counter that increases whenever the sheet's content changes"""
+        with self._lock:
+            cached = self._cache.get(sheet)
+            return cached['version'] if cached else 0
+
+    def invalidate(self, sheet=None):
+        """Drop cached validators for one sheet, or for all sheets"""
+        with self._lock:
+            if sheet is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(sheet, None)
+
+    def revalidation_hit_rate(self):
+        """Share of requests answered with 304 Not Modified"""
+        with self._lock:
+            answered = self.stats['not_modified'] + self.stats['downloads']
+            return self.stats['not_modified'] / answered if answered else 0.0
+
+    def get_stats(self):
+        """Snapshot of the transfer counters plus the revalidation hit rate"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['hit_rate'] = self.revalidation_hit_rate()
+        return stats
+
+    def _record(self, response):
+        # Bytes read off the connection, before any gzip decoding; the header's count without raw
+        received = getattr(response.raw, 'tell', None)
+        size = received() if received is not None else int(response.headers.get('Content-Length') or 0)
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['bytes_transferred'] += size
+            if response.status_code == 304:
+                self.stats['not_modified'] += 1
+            elif response.ok:
+                self.stats['downloads'] += 1
+            else:
+                self.stats['errors'] += 1
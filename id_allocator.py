@@ -0,0 +1,221 @@
+"""Unique, increasing Item_IDs.
+
+IdAllocator hands out zero-padded numeric IDs from a counter file that
+every thread and process of a deployment shares, so two purchases never
+get the same Item_ID, however close together they are recorded and
+whichever server handles them. Run ``python id_allocator.py`` to allocate
+from many threads in several processes at once; it exits non-zero when an
+ID is repeated or a worker's IDs are out of order.
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _lock(file):
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+    else:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock(file):
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+    else:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class IdAllocator:
+    """Item_IDs from a counter file shared by threads and processes.
+
+    The file holds the last number reserved by any allocator using it.
+    Numbers are reserved ``block_size`` at a time under an exclusive lock
+    on a companion ``.lock`` file, and the new value replaces the file in
+    one rename, so a crash never leaves it half written. Within a block,
+    IDs come from memory under a thread lock, without touching the file.
+
+    IDs are ``prefix`` followed by the number padded to ``digits``, so
+    they sort as strings in the order they were issued. One allocator's
+    IDs always increase; with several processes they increase in the
+    order their blocks were reserved, and with ``block_size`` 1 in the
+    order they were issued. Numbers left in a block when a process exits
+    are skipped, never reused.
+    """
+
+    def __init__(self, path, digits=6, prefix='', block_size=1, start=1):
+        self.path = os.path.abspath(path)
+        self.lock_path = self.path + '.lock'
+        self.digits = digits
+        self.prefix = prefix
+        self.block_size = max(1, int(block_size))
+        self.start = start
+        self._next = 0  # next number of the current block
+        self._end = 0  # one past its last number
+        self._lock = threading.Lock()
+
+    def format(self, number):
+        return f"{self.prefix}{number:0{self.digits}d}"
+
+    def next_id(self):
+        """A new ID"""
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = self._reserve(self.block_size)
+            number = self._next
+            self._next += 1
+        return self.format(number)
+
+    def reserve(self, count):
+        """``count`` consecutive new IDs, e.g. for a bulk import, in one trip to the counter file"""
+        if count <= 0:
+            return []
+        with self._lock:
+            # From the file, so they follow every ID issued so far and any left in this allocator's block
+            first, end = self._reserve(count)
+            self._next = self._end = 0
+        return [self.format(number) for number in range(first, end)]
+
+    def advance_past(self, ids):
+        """Make sure later IDs are above every numeric one in ``ids`` (an Item_ID column).
+
+        Meant for when a data set is loaded, so IDs typed into the sheet or
+        issued before the counter file existed are never handed out again;
+        allocating itself never looks at the table.
+        """
+        values = pd.Series(ids, dtype=object).dropna().astype(str).str.strip()
+        if self.prefix:
+            values = values[values.str.startswith(self.prefix)].str[len(self.prefix):]
+        numbers = pd.to_numeric(values, errors='coerce').dropna()
+        if numbers.empty:
+            return
+        floor = int(numbers.max())
+        with self._lock:
+            with self._counter() as state:
+                state['last'] = max(state['last'], floor)
+            # A block reserved before these IDs were seen may overlap them
+            if self._next <= floor:
+                self._next = self._end = 0
+
+    def last(self):
+        """The last number reserved by any allocator sharing the counter file"""
+        with self._counter() as state:
+            return state['last']
+
+    def _reserve(self, count):
+        with self._counter() as state:
+            first = max(state['last'] + 1, self.start)
+            state['last'] = first + count - 1
+        return first, first + count
+
+    def _counter(self):
+        return _Counter(self.path, self.lock_path, self.start - 1)
+
+
+class _Counter:
+    """The counter file, locked and read on enter, written on exit if it changed"""
+
+    def __init__(self, path, lock_path, default):
+        self.path = path
+        self.lock_path = lock_path
+        self.default = default
+
+    def __enter__(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.lock_path, 'a+')
+        _lock(self.file)
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                last = int(file.read().strip() or self.default)
+        except FileNotFoundError:
+            last = self.default
+        except Exception:
+            _unlock(self.file)
+            self.file.close()
+            raise
+        self.read = last
+        self.state = {'last': last}
+        return self.state
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            if exc_type is None and self.state['last'] != self.read:
+                temp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(temp, 'w', encoding='utf-8') as file:
+                    file.write(str(self.state['last']))
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(temp, self.path)
+        finally:
+            _unlock(self.file)
+            self.file.close()
+        return False
+
+
+def _allocate(path, threads, per_thread, block_size, bulk):
+    """IDs issued by each thread of one process, in the order each thread got them"""
+    allocator = IdAllocator(path, block_size=block_size, digits=9)
+
+    def work(thread):
+        ids = []
+        for index in range(per_thread):
+            # Every tenth request is a small bulk import
+            if bulk and index % 10 == 9:
+                ids.extend(allocator.reserve(bulk))
+            else:
+                ids.append(allocator.next_id())
+        return ids
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(work, range(threads)))
+
+
+def check(processes=4, threads=8, per_thread=250, block_size=1, bulk=5):
+    """IDs issued, repeats, out-of-order workers and seconds for one concurrent run"""
+    with tempfile.TemporaryDirectory(prefix='inventory-ids-') as directory:
+        path = os.path.join(directory, 'item_ids')
+        # IDs already in the data are never reissued
+        IdAllocator(path, digits=9).advance_past(['000000100', 'ITM0042', None, 99.0])
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [executor.submit(_allocate, path, threads, per_thread, block_size, bulk)
+                       for _ in range(processes)]
+            workers = [ids for future in futures for ids in future.result()]
+        seconds = time.perf_counter() - start
+    issued = [item for ids in workers for item in ids]
+    repeats = len(issued) - len(set(issued))
+    # Zero-padded, so string order is number order
+    unordered = sum(any(a >= b for a, b in zip(ids, ids[1:])) for ids in workers)
+    too_low = sum(int(item) <= 100 for item in issued)
+    return len(issued), repeats + too_low, unordered, seconds
+
+
+def main():
+    failed = False
+    for block_size in (1, 64):
+        issued, repeats, unordered, seconds = check(block_size=block_size)
+        ok = not repeats and not unordered
+        failed = failed or not ok
+        print(f"block size {block_size:>3}: {issued:,} IDs in {seconds:.2f} s ({issued / seconds:,.0f}/s), "
+              f"{repeats} repeated or reused, {unordered} workers out of order {'ok' if ok else 'FAILED'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
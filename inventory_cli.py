@@ -0,0 +1,174 @@
+"""Headless inventory reports.
+
+Builds the Summary Report (key metrics, summary tables and charts) of one
+or more data sets without Streamlit and writes it as JSON, CSV or HTML,
+e.g. for nightly runs. Each input is an .xlsx workbook with Inflow,
+Outflow and Budget sheets, or a directory holding Inflow.csv, Outflow.csv
+and Budget.csv (naming any of those CSVs works too). Inputs are processed
+in parallel, one per worker process:
+
+    python inventory_cli.py data/*.xlsx --format html json --output reports
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from report_jobs import build_report, report_html
+
+SHEETS = ['Inflow', 'Outflow', 'Budget']
+
+# Parsed as dates whatever the input format
+DATE_COLUMNS = {'Inflow': 'Purchase_Date', 'Outflow': 'Date_of_Distribution'}
+
+FORMATS = ['json', 'csv', 'html']
+
+
+def source_of(path):
+    """The workbook, or the directory of CSVs, an input path stands for"""
+    if path.lower().endswith('.csv'):
+        return os.path.dirname(os.path.abspath(path))
+    return os.path.abspath(path)
+
+
+def load_tables(source):
+    """Inflow, Outflow and Budget frames of a workbook or a directory of CSVs"""
+    if os.path.isdir(source):
+        files = {os.path.splitext(name)[0].lower(): os.path.join(source, name)
+                 for name in os.listdir(source) if name.lower().endswith('.csv')}
+        missing = [f"{sheet}.csv" for sheet in SHEETS if sheet.lower() not in files]
+        if missing:
+            raise ValueError(f"{source} has no {', '.join(missing)}")
+        frames = {sheet: pd.read_csv(files[sheet.lower()]) for sheet in SHEETS}
+    else:
+        frames = pd.read_excel(source, sheet_name=SHEETS)
+    for sheet, column in DATE_COLUMNS.items():
+        if column in frames[sheet]:
+            frames[sheet][column] = pd.to_datetime(frames[sheet][column], errors='coerce')
+    return [frames[sheet] for sheet in SHEETS]
+
+
+def report_name(source):
+    return os.path.splitext(os.path.basename(source.rstrip(os.sep)))[0] or 'report'
+
+
+def slug(text):
+    return re.sub(r'[^0-9a-z]+', '_', text.lower()).strip('_')
+
+
+def write_report(source, name, output, formats, title):
+    """Build one input's report and write it in each format; returns the files written"""
+    start = time.perf_counter()
+    inflow_df, outflow_df, budget_df = load_tables(source)
+    summary, tables, figures = build_report(inflow_df, outflow_df, budget_df,
+                                            charts='json' in formats or 'html' in formats)
+    written = []
+    if 'html' in formats:
+        path = os.path.join(output, f"{name}.html")
+        with open(path, 'wb') as file:
+            file.write(report_html(summary, tables, figures, title=f"{title}: {name}"))
+        written.append(path)
+    if 'json' in formats:
+        path = os.path.join(output, f"{name}.json")
+        report = {
+            'source': source,
+            'summary': summary,
+            # Through pandas, so dates and missing values come out as JSON
+            'tables': {heading: json.loads(table.to_json(orient='records', date_format='iso'))
+                       for heading, table in tables},
+            'figures': [json.loads(figure.to_json()) for figure in figures],
+        }
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, default=_json_default, indent=1)
+        written.append(path)
+    if 'csv' in formats:
+        directory = os.path.join(output, name)
+        os.makedirs(directory, exist_ok=True)
+        metrics = json.loads(json.dumps(summary, default=_json_default))
+        metrics = pd.DataFrame({
+            'Metric': list(metrics),
+            # Top departments and items as "name: quantity; ..."
+            'Value': ['; '.join(f"{key}: {item}" for key, item in value.items()) if isinstance(value, dict)
+                      else value for value in metrics.values()],
+        })
+        files = [('summary', metrics)] + [(slug(heading), table) for heading, table in tables]
+        for file_name, table in files:
+            path = os.path.join(directory, f"{file_name}.csv")
+            table.to_csv(path, index=False)
+            written.append(path)
+    return {'source': source, 'files': written, 'rows': len(inflow_df) + len(outflow_df),
+            'seconds': time.perf_counter() - start}
+
+
+def _json_default(value):
+    """JSON form of the summary's pandas, numpy and datetime values"""
+    if isinstance(value, pd.Series):
+        return json.loads(value.to_json())
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def _run(function, source, *args):
+    try:
+        return function(source, *args)
+    except Exception as error:
+        return {'source': source, 'error': error}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('inputs', nargs='+', help='.xlsx workbooks, or directories / CSVs of Inflow, Outflow and Budget')
+    parser.add_argument('--format', nargs='+', choices=FORMATS, default=['html'], dest='formats')
+    parser.add_argument('--output', default='reports', help='directory the reports are written to')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='worker processes (default: one per core)')
+    parser.add_argument('--title', default='Inventory Summary Report')
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    # CSVs of one directory are one input; equal names get a numbered suffix
+    sources = list(dict.fromkeys(source_of(path) for path in args.inputs))
+    names, seen = [], {}
+    for source in sources:
+        name = report_name(source)
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name}_{seen[name]}")
+
+    start = time.perf_counter()
+    failed = False
+    jobs = max(1, min(args.jobs or 1, len(sources)))
+    if jobs == 1:
+        results = [_run(write_report, source, name, args.output, args.formats, args.title)
+                   for source, name in zip(sources, names)]
+    else:
+        # Spawned, like the report jobs of the apps, so workers start clean
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = {executor.submit(write_report, source, name, args.output, args.formats, args.title): source
+                       for source, name in zip(sources, names)}
+            results = []
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as error:
+                    results.append({'source': futures[future], 'error': error})
+    for result in results:
+        if 'error' in result:
+            failed = True
+            print(f"{result['source']}: FAILED: {result['error']}", file=sys.stderr)
+        else:
+            print(f"{result['source']}: {result['rows']:,} rows in {result['seconds']:.2f} s -> "
+                  f"{', '.join(result['files'])}")
+    print(f"{len(sources)} input(s) in {time.perf_counter() - start:.2f} s with {jobs} worker(s)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+import time
+
+import pandas as pd
+
+from vendor_resolution import VENDOR_COLUMNS, VendorResolution
+
+# Outflow columns the flow can end in
+DESTINATIONS = ['Department', 'Event_Type']
+
+# Nodes drawn per Sankey column; smaller ones are lumped into one "Other" node
+MAX_NODES = 12
+
+UNKNOWN = '(unknown)'
+IN_STOCK = 'In stock'
+
+
+class InventoryFlow:
+    """Quantities flowing from vendors through Item_Types to destinations, and stock over time.
+
+    Built only from grouped sums computed by the storage backend: Inflow
+    per vendor spelling and Item_Type, per Item_ID and per day, Outflow per
+    Item_ID and destination and per day. Outflow knows its items by
+    Item_ID, so its sums are joined to the Item_Type each item was bought
+    as; the joins only ever see aggregates. The Sankey keeps at most
+    ``max_nodes`` nodes per column, so its node and link counts are
+    bounded whatever the number of rows.
+    """
+
+    def __init__(self, purchases, distributions, daily, build_seconds):
+        self.purchases = purchases  # Vendor, Item_Type, Quantity
+        self.distributions = distributions  # Item_Type, destinations, Quantity
+        self.daily = daily  # Day, Item_Type, In, Out
+        self.build_seconds = build_seconds
+
+    @classmethod
+    def build(cls, dm):
+        start = time.perf_counter()
+        inflow_columns = dm.column_names("inflow")
+        outflow_columns = dm.column_names("outflow")
+        vendor_columns = [column for column in VENDOR_COLUMNS if column in inflow_columns]
+        destinations = [column for column in DESTINATIONS if column in outflow_columns]
+
+        # Item_Type each Item_ID was bought as, the most purchased one if several
+        types = dm.group_sum("inflow", by=["Item_ID", "Item_Type"], columns=["Quantity"])
+        types = (types.sort_values("Quantity", kind="stable").drop_duplicates("Item_ID", keep="last")
+                 .set_index("Item_ID")["Item_Type"])
+
+        purchases = dm.group_sum("inflow", by=vendor_columns + ["Item_Type"], columns=["Quantity"])
+        if vendor_columns:
+            # Resolving the distinct spellings only, not the purchases
+            purchases["Vendor"] = VendorResolution(purchases).names(purchases)
+        else:
+            purchases["Vendor"] = None
+        purchases = _fill(purchases, ["Vendor", "Item_Type"]).groupby(
+            ["Vendor", "Item_Type"], as_index=False)["Quantity"].sum()
+
+        distributed = dm.group_sum("outflow", by=["Item_ID"] + destinations, columns=["Quantity"])
+        distributed["Item_Type"] = distributed["Item_ID"].map(types)
+        distributions = _fill(distributed, ["Item_Type"] + destinations).groupby(
+            ["Item_Type"] + destinations, as_index=False)["Quantity"].sum()
+
+        daily_in = dm.group_sum("inflow", by=["Item_Type"], columns=["Quantity"], period="day")
+        daily_out = dm.group_sum("outflow", by=["Item_ID"], columns=["Quantity"], period="day")
+        daily_out["Item_Type"] = daily_out["Item_ID"].map(types)
+        daily = pd.concat([
+            _fill(daily_in, ["Item_Type"])[["Period", "Item_Type", "Quantity"]].rename(columns={"Quantity": "In"}),
+            _fill(daily_out, ["Item_Type"])[["Period", "Item_Type", "Quantity"]].rename(columns={"Quantity": "Out"}),
+        ])
+        daily = (daily.dropna(subset=["Period"]).groupby(["Period", "Item_Type"])[["In", "Out"]].sum()
+                 .reset_index().rename(columns={"Period": "Day"}))
+        return cls(purchases, distributions, daily, time.perf_counter() - start)
+
+    def item_types(self):
+        types = set(self.purchases["Item_Type"]) | set(self.distributions["Item_Type"])
+        return sorted(types, key=str)
+
+    def sankey(self, destination="Department", max_nodes=MAX_NODES):
+        """Node labels and (source, target, value) links of the vendor -> Item_Type -> destination flow.
+
+        Item_Types bought but not distributed flow into an "In stock" node.
+        """
+        purchases = self.purchases.copy()
+        purchases["Vendor"] = _top(purchases["Vendor"], purchases["Quantity"], max_nodes, "Other vendors")
+        purchases["Item_Type"] = _top(purchases["Item_Type"], purchases["Quantity"], max_nodes, "Other item types")
+        distributions = self.distributions.copy()
+        if destination in distributions:
+            distributions["Destination"] = distributions[destination]
+        else:
+            distributions["Destination"] = UNKNOWN
+        distributions["Destination"] = _top(distributions["Destination"], distributions["Quantity"], max_nodes,
+                                            f"Other {destination.replace('_', ' ').lower()}s")
+        # Types lumped on the purchase side are lumped on this side too
+        kept = set(purchases["Item_Type"])
+        distributions["Item_Type"] = distributions["Item_Type"].where(
+            distributions["Item_Type"].isin(kept) | (distributions["Item_Type"] == UNKNOWN), "Other item types")
+
+        bought = purchases.groupby("Item_Type")["Quantity"].sum()
+        given = distributions.groupby("Item_Type")["Quantity"].sum()
+        stock = bought.sub(given, fill_value=0)
+        stock = stock[stock > 0].rename_axis("Item_Type").reset_index().assign(Destination=IN_STOCK)
+
+        first = purchases.groupby(["Vendor", "Item_Type"], as_index=False)["Quantity"].sum()
+        second = pd.concat([distributions, stock]).groupby(["Item_Type", "Destination"], as_index=False)["Quantity"].sum()
+        second = second[second["Quantity"] > 0]
+        # Largest flows first, so nodes are drawn roughly in order of size
+        first = first.sort_values("Quantity", ascending=False, kind="stable")
+        second = second.sort_values("Quantity", ascending=False, kind="stable")
+        # Vendors, types and destinations share names (UNKNOWN, say), so nodes are keyed by column
+        nodes = ([("Vendor", name) for name in first["Vendor"].unique()]
+                 + [("Item_Type", name) for name in pd.unique(pd.concat([first["Item_Type"], second["Item_Type"]]))]
+                 + [("Destination", name) for name in second["Destination"].unique()])
+        position = {node: i for i, node in enumerate(nodes)}
+        links = pd.DataFrame({
+            "source": [position[("Vendor", name)] for name in first["Vendor"]]
+                      + [position[("Item_Type", name)] for name in second["Item_Type"]],
+            "target": [position[("Item_Type", name)] for name in first["Item_Type"]]
+                      + [position[("Destination", name)] for name in second["Destination"]],
+            "value": pd.concat([first["Quantity"], second["Quantity"]]).to_numpy(),
+        })
+        return [str(name) for _, name in nodes], links
+
+    def stock(self, item_type=None):
+        """Cumulative quantities bought and distributed, and the stock they leave, per day"""
+        daily = self.daily if item_type is None else self.daily[self.daily["Item_Type"] == item_type]
+        stock = daily.groupby("Day")[["In", "Out"]].sum().sort_index()
+        stock = stock.cumsum().rename(columns={"In": "Cumulative_In", "Out": "Cumulative_Out"})
+        stock["Stock"] = stock["Cumulative_In"] - stock["Cumulative_Out"]
+        return stock.reset_index()
+
+
+def _fill(frame, columns):
+    """Missing group keys as UNKNOWN, so they still show in the flow"""
+    return frame.assign(**{column: frame[column].where(frame[column].notna(), UNKNOWN) for column in columns})
+
+
+def _top(names, quantities, max_nodes, other):
+    """Names outside the ``max_nodes`` largest by quantity replaced by ``other``"""
+    totals = quantities.groupby(names).sum().sort_values(ascending=False, kind="stable")
+    if len(totals) <= max_nodes:
+        return names
+    # One node goes to "Other", so the column keeps max_nodes nodes
+    return names.where(names.isin(totals.index[:max_nodes - 1]), other)
@@ -0,0 +1,31 @@
+import importlib
+import importlib.util
+import sys
+import types
+
+
+class _LazyModule(types.ModuleType):
+    """Stand-in for a module that imports it on first attribute access.
+
+    The import goes through the regular import system, whose per-module
+    locks make sessions touching it at once wait for one complete import
+    (importlib's LazyLoader lets a second thread see a half-executed
+    module).
+    """
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self.__name__), attr)
+
+
+def lazy_import(name):
+    """Module object that is only executed on first attribute access.
+
+    Heavy libraries used by a few pages (plotly for the charts) can be
+    bound at module level without slowing down worker start and the
+    pages that never touch them.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    return _LazyModule(name)
@@ -0,0 +1,363 @@
+"""Concurrent-session load test of the Streamlit apps.
+
+Drives V3/streamlit_app.py and gd/app.py headlessly with Streamlit's
+AppTest, many simulated sessions at once, each running scripted flows
+against synthetic data: open the app (the ingest), view the data and
+switch the purchase trends period, submit a purchase, and distribute an
+item. Every script run is timed, and the report gives the p50, p95 and
+p99 rerun latency per step, reruns per second and the peak memory of the
+processes serving the sessions:
+
+    python load_test.py --sessions 20 --iterations 3 --workers 4
+
+The sessions are spread over worker processes (one per core by default)
+that run at once; the sessions of one worker share its caches, as on a
+Streamlit server. V3 loads a generated workbook through
+INVENTORY_WORKBOOK, and gd reads generated sheets from a local HTTP
+server through INVENTORY_SHEET_URL. It exits non-zero when a run fails.
+"""
+import argparse
+import csv
+import http.server
+import io
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+APPS = {
+    'V3': os.path.join('V3', 'streamlit_app.py'),
+    'gd': os.path.join('gd', 'app.py'),
+}
+
+FLOWS = ['view', 'purchase', 'distribute']
+
+PERCENTILES = [50, 95, 99]
+
+ITEM_TYPES = ['S', 'M', 'L']
+EVENT_TYPES = ['Conference', 'Workshop', 'Outreach', 'Gala']
+DEPARTMENTS = ['Finance', 'HR', 'IT', 'Marketing', 'Operations', 'Sales']
+VENDORS = ['Acme Supplies', 'ACME Supplies Inc.', 'Globex', 'Initech', 'Northwind Traders', 'Umbrella Corp']
+
+
+def synthetic_tables(inflow_rows=2000, outflow_rows=3000, seed=0):
+    """Inflow, Outflow and Budget frames with the columns both apps read"""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2024-01-01')
+    inflow = pd.DataFrame({
+        'Item_ID': [f"25{i:04d}" for i in range(1, inflow_rows + 1)],
+        'Item_Type': rng.choice(ITEM_TYPES, inflow_rows),
+        'Item_name': [f"Item {i}" for i in rng.integers(1, 200, inflow_rows)],
+        'Cost_per_Item': rng.lognormal(2.5, 0.8, inflow_rows).round(2),
+        'Quantity': rng.integers(1, 200, inflow_rows),
+        'Code': [f"C{i:03d}" for i in rng.integers(1, 100, inflow_rows)],
+        'Purchase_Date': start + pd.to_timedelta(rng.integers(0, 730, inflow_rows), unit='D'),
+        'Vendor_Name': rng.choice(VENDORS, inflow_rows),
+        'Vendor_Email': 'orders@example.com',
+        'Vendor_Phone': '555-0100',
+    })
+    inflow['Total_Cost'] = (inflow['Cost_per_Item'] * inflow['Quantity']).round(2)
+    picks = rng.integers(0, inflow_rows, outflow_rows)
+    outflow = pd.DataFrame({
+        'Item_ID': inflow['Item_ID'].to_numpy()[picks],
+        'Item_Type': inflow['Item_Type'].to_numpy()[picks],
+        'Event_Type': rng.choice(EVENT_TYPES, outflow_rows),
+        'Event_Name': [f"Event {i}" for i in rng.integers(1, 50, outflow_rows)],
+        'Department': rng.choice(DEPARTMENTS, outflow_rows),
+        'Quantity': rng.integers(1, 10, outflow_rows),
+        'Cost_per_Item': inflow['Cost_per_Item'].to_numpy()[picks],
+        'Date_of_Distribution': start + pd.to_timedelta(rng.integers(0, 730, outflow_rows), unit='D'),
+    })
+    budget = pd.DataFrame({'Event_Type': EVENT_TYPES})
+    for year in (2024, 2025):
+        budget[f"{year}_Budget_Amount"] = rng.integers(20, 200, len(EVENT_TYPES)) * 1000.0
+    return inflow, outflow, budget
+
+
+def write_workbook(path, inflow, outflow, budget):
+    with pd.ExcelWriter(path) as writer:
+        inflow.to_excel(writer, sheet_name='Inflow', index=False)
+        outflow.to_excel(writer, sheet_name='Outflow', index=False)
+        budget.to_excel(writer, sheet_name='Budget', index=False)
+
+
+class SheetHandler(http.server.BaseHTTPRequestHandler):
+    """Google Sheets CSV export of the server's tables: ``?sheet=<name>`` plus gd's ``select * offset n`` queries"""
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        rows = self.server.sheets.get(query.get('sheet', [''])[0])
+        if rows is None:
+            self.send_error(404)
+            return
+        tq = query.get('tq', [''])[0]
+        offset = int(tq.split('offset')[1]) if 'offset' in tq else 0
+        out = io.StringIO()
+        writer = csv.writer(out, quoting=csv.QUOTE_ALL)
+        writer.writerow(rows[0])
+        writer.writerows(rows[1 + offset:])
+        body = out.getvalue().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_sheets(inflow, outflow, budget):
+    """Start a local sheet server in a daemon thread; returns it and its SHEET_URL"""
+    # Dates as the public sheet writes them
+    inflow = inflow.assign(Purchase_Date=inflow['Purchase_Date'].dt.strftime('%d/%m/%Y'))
+    outflow = outflow.assign(Date_of_Distribution=outflow['Date_of_Distribution'].dt.strftime('%d/%m/%Y'))
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), SheetHandler)
+    server.sheets = {name: [list(frame.columns)] + frame.astype(str).values.tolist()
+                     for name, frame in (('Inflow', inflow), ('Outflow', outflow), ('Budget', budget))}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/gviz/tq?tqx=out:csv&sheet="
+
+
+def _widget(elements, label):
+    """First element whose label starts with ``label``"""
+    for element in elements:
+        if element.label.startswith(label):
+            return element
+    raise LookupError(f"No widget labelled {label!r}")
+
+
+def _page(at, page):
+    _widget(at.sidebar.selectbox, 'Select Function').set_value(page)
+
+
+def session_flow(at, session, flows, iterations):
+    """Steps of one simulated user: sets the widgets of each step, then yields its name for the run"""
+    yield 'open'
+    for iteration in range(iterations):
+        for flow in flows:
+            if flow == 'view':
+                _page(at, 'View Data')
+                yield 'view'
+                radio = [radio for radio in at.radio if radio.label == 'Period']
+                if radio:
+                    radio[0].set_value('Quarterly' if radio[0].value == 'Monthly' else 'Monthly')
+                    yield 'view_period'
+            elif flow == 'purchase':
+                _page(at, 'Purchase')
+                yield 'purchase_page'
+                _widget(at.text_input, 'Item Name').set_value(f"Load test item {session}-{iteration}")
+                _widget(at.number_input, 'Cost per Item').set_value(12.5)
+                _widget(at.number_input, 'Quantity').set_value(3)
+                _widget(at.text_input, 'Vendor Name').set_value(VENDORS[iteration % len(VENDORS)])
+                _widget(at.button, 'Submit Purchase').click()
+                yield 'purchase_submit'
+            else:
+                _page(at, 'Distribute')
+                yield 'distribute_page'
+                _widget(at.text_input, 'Department').set_value(DEPARTMENTS[session % len(DEPARTMENTS)])
+                _widget(at.text_input, 'Event Name').set_value(f"Load test event {iteration}")
+                _widget(at.button, 'Submit Distribution').click()
+                yield 'distribute_submit'
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, or None where unavailable"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def run_worker(app, sessions, flows, iterations, timeout, environment):
+    """Serve some of the simulated sessions in this process; returns their timed runs and the peak memory.
+
+    AppTest swaps process-wide Streamlit state on every run, so the
+    sessions of one worker take turns, one run each, as the script runs
+    of a busy server interleave; they share the worker's caches.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    os.environ.update(environment)
+    # Failures are collected from the runs; the apps' warnings would drown the report
+    logging.disable(logging.WARNING)
+
+    path = os.path.join(ROOT, APPS[app])
+    # As under ``streamlit run``, the app's own modules are importable
+    sys.path.insert(0, os.path.dirname(path))
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+
+    samples = []
+    active = []
+    for session in sessions:
+        at = AppTest.from_file(path, default_timeout=timeout)
+        active.append((session, at, session_flow(at, session, flows, iterations)))
+    while active:
+        for entry in list(active):
+            session, at, flow = entry
+            try:
+                step = next(flow)
+            except StopIteration:
+                active.remove(entry)
+                continue
+            except Exception as exception:
+                # A widget the flow needs is missing
+                samples.append({'session': session, 'step': 'flow', 'seconds': 0.0,
+                                'error': f"{type(exception).__name__}: {exception}"})
+                active.remove(entry)
+                continue
+            start = time.perf_counter()
+            error = None
+            try:
+                at.run(timeout=timeout)
+                failures = [element.value for element in list(at.exception) + list(at.error)]
+                if failures:
+                    error = str(failures[0])
+            except Exception as exception:
+                error = f"{type(exception).__name__}: {exception}"
+            samples.append({'session': session, 'step': step, 'seconds': time.perf_counter() - start,
+                            'error': error})
+            if error is not None:
+                # A failed run ends the session
+                active.remove(entry)
+    return {'samples': samples, 'seconds': time.perf_counter() - started,
+            'baseline_rss_mb': baseline, 'peak_rss_mb': peak_rss_mb()}
+
+
+def run_app(app, sessions, workers, iterations, flows, inflow_rows, outflow_rows, timeout):
+    """Run ``sessions`` simulated sessions against one app on ``workers`` processes; returns the results"""
+    scratch = tempfile.mkdtemp(prefix='load-test-')
+    environment = {'INVENTORY_SPILL_DIR': os.path.join(scratch, 'sessions'),
+                   'INVENTORY_ID_FILE': os.path.join(scratch, 'item_ids.counter')}
+    saved = None
+    server = None
+    try:
+        inflow, outflow, budget = synthetic_tables(inflow_rows, outflow_rows)
+        if app == 'V3':
+            workbook = os.path.join(scratch, f"load_test_{os.getpid()}.xlsx")
+            write_workbook(workbook, inflow, outflow, budget)
+            environment['INVENTORY_WORKBOOK'] = workbook
+            # Purchases are saved next to the app under the workbook's name, as for an upload
+            saved = os.path.join(ROOT, os.path.dirname(APPS[app]), os.path.basename(workbook))
+        else:
+            # One sheet server for every worker, like the one Google Sheet
+            server, environment['INVENTORY_SHEET_URL'] = serve_sheets(inflow, outflow, budget)
+        workers = max(1, min(workers, sessions))
+        shares = [list(range(sessions))[worker::workers] for worker in range(workers)]
+        # Spawned, so every worker starts with cold caches
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            results = list(executor.map(run_worker, [app] * workers, shares, [flows] * workers,
+                                        [iterations] * workers, [timeout] * workers, [environment] * workers))
+        return {
+            'app': app,
+            'sessions': sessions,
+            'workers': workers,
+            # From the sessions' start, leaving out the workers' start-up and imports
+            'seconds': max(result['seconds'] for result in results),
+            'samples': [sample for result in results for sample in result['samples']],
+            'baseline_rss_mb': [result['baseline_rss_mb'] for result in results],
+            'peak_rss_mb': [result['peak_rss_mb'] for result in results],
+        }
+    finally:
+        if server is not None:
+            server.shutdown()
+        if saved is not None and os.path.exists(saved):
+            os.remove(saved)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def latency_table(samples):
+    """Reruns, failures and p50/p95/p99 latency in ms per step, with an 'all' row"""
+    frame = pd.DataFrame(samples, columns=['session', 'step', 'seconds', 'error'])
+    rows = []
+    for step, group in list(frame.groupby('step', sort=False)) + [('all', frame)]:
+        timed = group.loc[group['error'].isna(), 'seconds'].to_numpy() * 1000
+        row = {'Step': step, 'Reruns': len(group), 'Failed': int(group['error'].notna().sum())}
+        for percentile in PERCENTILES:
+            row[f"P{percentile}_ms"] = float(np.percentile(timed, percentile)) if len(timed) else float('nan')
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def report(result):
+    """Summary of one app's run: throughput, memory, the latency table and the first failures"""
+    table = latency_table(result['samples'])
+    reruns = len(result['samples'])
+    errors = [sample for sample in result['samples'] if sample['error'] is not None]
+    summary = {
+        'app': result['app'],
+        'sessions': result['sessions'],
+        'workers': result['workers'],
+        'reruns': reruns,
+        'failed': len(errors),
+        'seconds': result['seconds'],
+        'reruns_per_second': reruns / result['seconds'] if result['seconds'] else float('nan'),
+        # Per worker process, and summed over them (peaks need not coincide, so an upper bound)
+        'baseline_rss_mb': _max(result['baseline_rss_mb']),
+        'peak_rss_mb': _max(result['peak_rss_mb']),
+        'total_peak_rss_mb': None if None in result['peak_rss_mb'] else sum(result['peak_rss_mb']),
+        'latency': table.to_dict(orient='records'),
+        'errors': [f"session {sample['session']} {sample['step']}: {sample['error']}" for sample in errors[:5]],
+    }
+    return summary, table
+
+
+def _max(values):
+    return None if None in values else max(values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', nargs='+', choices=list(APPS), default=list(APPS), dest='apps')
+    parser.add_argument('--sessions', type=int, default=20, help='simulated sessions running at once')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes (default: one per core)')
+    parser.add_argument('--iterations', type=int, default=3, help='times each session runs its flows')
+    parser.add_argument('--flows', nargs='+', choices=FLOWS, default=FLOWS)
+    parser.add_argument('--inflow-rows', type=int, default=2000)
+    parser.add_argument('--outflow-rows', type=int, default=3000)
+    parser.add_argument('--timeout', type=float, default=120, help='seconds one script run may take')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    summaries = []
+    for app in args.apps:
+        result = run_app(app, args.sessions, args.workers or 1, args.iterations, args.flows,
+                         args.inflow_rows, args.outflow_rows, args.timeout)
+        summary, table = report(result)
+        summaries.append(summary)
+        if summary['peak_rss_mb'] is None:
+            memory = "peak RSS unavailable"
+        else:
+            memory = (f"peak RSS {summary['peak_rss_mb']:,.0f} MB per worker (after imports "
+                      f"{summary['baseline_rss_mb']:,.0f} MB), {summary['total_peak_rss_mb']:,.0f} MB in all")
+        print(f"{app}: {summary['sessions']} sessions on {summary['workers']} worker(s), "
+              f"{summary['reruns']:,} reruns in {summary['seconds']:.1f} s "
+              f"({summary['reruns_per_second']:.1f}/s), {summary['failed']} failed, {memory}")
+        print(table.to_string(index=False, float_format=lambda value: f"{value:,.0f}"))
+        for error in summary['errors']:
+            print(f"  {error}", file=sys.stderr)
+        print()
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(summaries, file, indent=1)
+    sys.exit(1 if any(summary['failed'] for summary in summaries) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""First-in-first-out costing of distributions against purchase lots.
+
+Run ``python lot_costing.py`` to compare fifo_costing with a row-by-row
+FIFO on random data (restocks after running out, same-day purchases and
+distributions, undated rows) and to time it on a million movements; it
+exits non-zero when a cost or remaining quantity differs.
+"""
+import sys
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+class FifoResult:
+    """Outcome of matching distributions to purchase lots first-in-first-out"""
+
+    def __init__(self, lots, distributions):
+        # Inflow rows with Remaining_Qty and Remaining_Value
+        self.lots = lots
+        # Outflow rows with FIFO_Cost, FIFO_Unit_Cost and Unfilled_Qty
+        self.distributions = distributions
+        self.cost_of_goods_distributed = float(distributions['FIFO_Cost'].sum())
+        self.inventory_value = float(lots['Remaining_Value'].sum())
+        self.unfilled_quantity = float(distributions['Unfilled_Qty'].sum())
+
+
+def _sort_dates(series):
+    """Dates as sortable integers, undated rows last"""
+    dates = pd.to_datetime(series, errors='coerce')
+    return dates.fillna(pd.Timestamp.max).to_numpy(dtype='datetime64[ns]').view('int64')
+
+
+def _search(keys, values, query_keys, query_values, side='left'):
+    """searchsorted over (key, value) pairs sorted by key then value, for (key, value) queries.
+
+    Done with one lexsort of lots and queries together, so each key's
+    values are compared only with each other and never offset onto a
+    shared axis.
+    """
+    n = len(keys)
+    # At equal pairs, 'left' puts the queries before the sorted rows and 'right' after them
+    rank = np.concatenate([np.ones(n), np.zeros(len(query_keys))] if side == 'left'
+                          else [np.zeros(n), np.ones(len(query_keys))])
+    order = np.lexsort((rank, np.concatenate([values, query_values]), np.concatenate([keys, query_keys])))
+    is_query = order >= n
+    rows_before = np.cumsum(~is_query) - (~is_query)
+    result = np.empty(len(query_keys), dtype=np.int64)
+    result[order[is_query] - n] = rows_before[is_query]
+    return result
+
+
+def _cost_before(x, codes, s_code, cum_qty, cum_cost, unit_cost):
+    """Cost of the first x units of each key's lots, oldest first"""
+    if not len(cum_qty):
+        return np.zeros(len(x))
+    lot = np.minimum(_search(s_code, cum_qty, codes, x), len(cum_qty) - 1)
+    return np.where(x > 0, cum_cost[lot] - (cum_qty[lot] - x) * unit_cost[lot], 0.0)
+
+
+def fifo_costing(inflow_df, outflow_df, key='Item_name'):
+    """Cost Outflow against Inflow lots first-in-first-out, per ``key``.
+
+    Lots are consumed in Purchase_Date order and distributions in
+    Date_of_Distribution order within each key, and a distribution only
+    draws on lots purchased on or before its date. Units it asks for
+    beyond the stock on hand at that date are reported as Unfilled_Qty at
+    no cost; they are not taken from later purchases.
+
+    Everything is done with sorts, per-key cumulative sums and searches
+    over all keys at once. With D the cumulative quantity distributed and
+    S the cumulative quantity purchased by each distribution's date, the
+    units filled so far are F = D + min(0, cummin(S - D)), the recurrence
+    F = min(F_prev + quantity, S) in closed form, and a distribution's
+    cost is the difference of its key's cumulative cost curve at F_prev
+    and F.
+
+    When Outflow has no ``key`` column it is looked up from Inflow through
+    Item_ID.
+    """
+    lot_qty = pd.to_numeric(inflow_df['Quantity'], errors='coerce').fillna(0).clip(lower=0).to_numpy(dtype=float)
+    if 'Cost_per_Item' in inflow_df:
+        unit = pd.to_numeric(inflow_df['Cost_per_Item'], errors='coerce')
+    else:
+        unit = pd.to_numeric(inflow_df['Total_Cost'], errors='coerce') / inflow_df['Quantity']
+    lot_unit = unit.fillna(0).to_numpy(dtype=float)
+    dist_qty = pd.to_numeric(outflow_df['Quantity'], errors='coerce').fillna(0).clip(lower=0).to_numpy(dtype=float)
+
+    if key in outflow_df:
+        dist_keys = outflow_df[key]
+    else:
+        key_by_id = inflow_df.drop_duplicates('Item_ID').set_index('Item_ID')[key]
+        dist_keys = outflow_df['Item_ID'].map(key_by_id)
+
+    codes, uniques = pd.factorize(pd.concat([inflow_df[key], dist_keys], ignore_index=True))
+    groups = len(uniques)
+    # Lots without a key form their own group; distributions without one match nothing
+    lot_code = np.where(codes[:len(inflow_df)] < 0, groups, codes[:len(inflow_df)])
+    dist_code = np.where(codes[len(inflow_df):] < 0, groups + 1, codes[len(inflow_df):])
+    groups += 2
+
+    # Every key's lots oldest first, with cumulative sums restarting at each key
+    lot_dates = _sort_dates(inflow_df['Purchase_Date'])
+    lot_order = np.lexsort((np.arange(len(lot_qty)), lot_dates, lot_code))
+    s_qty = lot_qty[lot_order]
+    s_unit = lot_unit[lot_order]
+    s_code = lot_code[lot_order]
+    s_dates = lot_dates[lot_order]
+    cum_qty = pd.Series(s_qty).groupby(s_code).cumsum().to_numpy()
+    cum_cost = pd.Series(s_qty * s_unit).groupby(s_code).cumsum().to_numpy()
+
+    # Every key's distributions oldest first
+    dist_dates = _sort_dates(outflow_df['Date_of_Distribution'])
+    dist_order = np.lexsort((np.arange(len(dist_qty)), dist_dates, dist_code))
+    d_qty = dist_qty[dist_order]
+    d_code = dist_code[dist_order]
+    demanded = pd.Series(d_qty).groupby(d_code).cumsum().to_numpy()
+
+    # Units of the key purchased by each distribution's date
+    last_lot = _search(s_code, s_dates, d_code, dist_dates[dist_order], side='right') - 1
+    in_stock = last_lot >= np.searchsorted(s_code, d_code, side='left')
+    supplied = np.zeros(len(d_code))
+    supplied[in_stock] = cum_qty[last_lot[in_stock]]
+
+    shortfall = pd.Series(supplied - demanded).groupby(d_code).cummin().to_numpy()
+    filled_end = demanded + np.minimum(shortfall, 0)
+    filled_start = pd.Series(filled_end).groupby(d_code).shift(fill_value=0).to_numpy()
+
+    cost = (_cost_before(filled_end, d_code, s_code, cum_qty, cum_cost, s_unit)
+            - _cost_before(filled_start, d_code, s_code, cum_qty, cum_cost, s_unit))
+    filled = filled_end - filled_start
+
+    # Units left in each lot once its key's distributions are filled
+    consumed = pd.Series(filled).groupby(d_code).sum().reindex(range(groups), fill_value=0).to_numpy()[s_code]
+    lot_start = cum_qty - s_qty
+    remaining = s_qty - np.clip(consumed - lot_start, 0, s_qty)
+
+    lots = inflow_df.copy()
+    lots['Remaining_Qty'] = _unsort(remaining, lot_order)
+    lots['Remaining_Value'] = _unsort(remaining * s_unit, lot_order)
+
+    distributions = outflow_df.copy()
+    distributions['FIFO_Cost'] = _unsort(cost, dist_order)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        distributions['FIFO_Unit_Cost'] = _unsort(np.where(filled > 0, cost / filled, np.nan), dist_order)
+    distributions['Unfilled_Qty'] = _unsort(d_qty - filled, dist_order)
+    return FifoResult(lots, distributions)
+
+
+def _unsort(values, order):
+    """Put values computed in sorted order back in original row order"""
+    result = np.empty(len(values), dtype=float)
+    result[order] = values
+    return result
+
+
+def reference_costing(inflow_df, outflow_df, key='Item_name'):
+    """FIFO costs, unfilled and remaining quantities, one row at a time; the slow definition fifo_costing matches"""
+    lots = inflow_df.assign(Sort_Date=_sort_dates(inflow_df['Purchase_Date']), Row=np.arange(len(inflow_df)))
+    dists = outflow_df.assign(Sort_Date=_sort_dates(outflow_df['Date_of_Distribution']), Row=np.arange(len(outflow_df)))
+    remaining = pd.to_numeric(lots['Quantity'], errors='coerce').fillna(0).clip(lower=0).to_numpy(dtype=float)
+    cost = np.zeros(len(dists))
+    unfilled = np.zeros(len(dists))
+    queues = {}
+    pending = lots.sort_values(['Sort_Date', 'Row'])
+    next_lot = 0
+    for dist in dists.sort_values(['Sort_Date', 'Row']).itertuples():
+        # Lots purchased by this date join their key's queue, oldest first
+        while next_lot < len(pending) and pending['Sort_Date'].iloc[next_lot] <= dist.Sort_Date:
+            lot = pending.iloc[next_lot]
+            queues.setdefault(lot[key], deque()).append(int(lot['Row']))
+            next_lot += 1
+        wanted = max(float(dist.Quantity), 0)
+        queue = queues.get(getattr(dist, key), deque())
+        while wanted > 0 and queue:
+            row = queue[0]
+            take = min(wanted, remaining[row])
+            cost[dist.Row] += take * lots['Cost_per_Item'].iloc[row]
+            remaining[row] -= take
+            wanted -= take
+            if remaining[row] <= 0:
+                queue.popleft()
+        unfilled[dist.Row] = wanted
+    return cost, unfilled, remaining
+
+
+def _movements(inflow_rows, outflow_rows, items, seed):
+    rng = np.random.default_rng(seed)
+    days = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, inflow_rows + outflow_rows), unit='D')
+    inflow_df = pd.DataFrame({
+        'Item_ID': np.arange(inflow_rows),
+        'Item_name': rng.integers(0, items, inflow_rows).astype(str),
+        'Quantity': rng.integers(1, 50, inflow_rows),
+        'Cost_per_Item': rng.uniform(0.5, 100, inflow_rows).round(2),
+        'Purchase_Date': pd.Series(days[:inflow_rows]).mask(rng.random(inflow_rows) < 0.02),
+    })
+    outflow_df = pd.DataFrame({
+        'Item_name': rng.integers(0, items, outflow_rows).astype(str),
+        'Quantity': rng.integers(1, 60, outflow_rows),
+        'Date_of_Distribution': pd.Series(days[inflow_rows:]).mask(rng.random(outflow_rows) < 0.02),
+    })
+    return inflow_df, outflow_df
+
+
+def check(rows=2_000, movements=1_000_000, seed=0):
+    """Largest differences from reference_costing, and seconds to cost ``movements`` rows"""
+    inflow_df, outflow_df = _movements(rows, rows, 20, seed)
+    result = fifo_costing(inflow_df, outflow_df)
+    cost, unfilled, remaining = reference_costing(inflow_df, outflow_df)
+    differences = {
+        'FIFO_Cost': float(np.abs(result.distributions['FIFO_Cost'].to_numpy() - cost).max()),
+        'Unfilled_Qty': float(np.abs(result.distributions['Unfilled_Qty'].to_numpy() - unfilled).max()),
+        'Remaining_Qty': float(np.abs(result.lots['Remaining_Qty'].to_numpy() - remaining).max()),
+    }
+    inflow_df, outflow_df = _movements(movements // 2, movements // 2, 5_000, seed)
+    start = time.perf_counter()
+    fifo_costing(inflow_df, outflow_df)
+    return differences, time.perf_counter() - start
+
+
+def main():
+    movements = 1_000_000
+    differences, seconds = check(movements=movements)
+    failed = False
+    for name, difference in differences.items():
+        ok = difference <= 1e-6
+        failed = failed or not ok
+        print(f"{name:>13}: max difference from row-by-row FIFO {difference:.2e} {'ok' if ok else 'FAILED'}")
+    print(f"{movements:,} movements costed in {seconds:.2f} s")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from html import escape
+
+from dashboard import (create_visualizations, department_summary, item_type_summary,
+                       purchase_period_summary, types_summary)
+from summary_report import summary_from_frames, summary_html
+
+
+def build_report(inflow_df, outflow_df, budget_df, charts=True, cube=None, restock=None,
+                 window_days=90, lead_time_days=14):
+    """Summary, named tables and figures of the report, computed without Streamlit"""
+    summary, cube, ledger, restock = summary_from_frames(inflow_df, outflow_df, budget_df, cube=cube,
+                                                         restock=restock, window_days=window_days,
+                                                         lead_time_days=lead_time_days)
+    event_types, item_types = types_summary(cube, ledger, summary['budget_year'])
+    tables = [
+        ('Item Type Summary', item_type_summary(cube)),
+        ('Department Distribution Summary', department_summary(cube)),
+        ('Monthly Purchase Summary', purchase_period_summary(cube, 'ME')),
+        ('Quarterly Purchase Summary', purchase_period_summary(cube, 'QE')),
+        (f"Budget vs Actual ({summary['budget_year']})", ledger.report(summary['budget_year'])),
+        ('Event Type Summary', event_types),
+        ('Purchases and Distributions by Item Type', item_types),
+        ('Needs Restock', restock.head(100)),
+    ]
+    figures = create_visualizations(cube, ledger, summary['budget_year']) if charts else ()
+    return summary, tables, figures
+
+
+def report_html(summary, tables, figures, title='Inventory Summary Report'):
+    """Self-contained HTML page of a built report"""
+    parts = [
+        '<!DOCTYPE html><html><head><meta charset="utf-8">',
+        f'<title>{escape(title)}</title>',
+        '<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse}'
+        'td,th{border:1px solid #ccc;padding:4px 8px;text-align:right}</style>',
+        '</head><body>',
+        f'<h1>{escape(title)}</h1>',
+        f"<p>Generated {datetime.now().strftime('%d/%m/%Y %H:%M')}</p>",
+        summary_html(summary),
+    ]
+    # Inline plotly.js once so the file opens offline
+    for index, figure in enumerate(figures):
+        parts.append(figure.to_html(full_html=False, include_plotlyjs='inline' if index == 0 else False))
+    for heading, table in tables:
+        parts.append(f'<h2>{escape(heading)}</h2>')
+        parts.append(table.to_html(index=False, float_format=lambda value: f'{value:,.2f}'))
+    parts.append('</body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def build_report_html(inflow_df, outflow_df, budget_df, title='Inventory Summary Report', **options):
+    """Self-contained HTML report: summary, tables and interactive charts.
+
+    Runs in a worker process, so it must not touch Streamlit. ``options``
+    go to ``build_report``: the page passes its AggregateCube for the same
+    rows and its Needs Restock table, so the worker neither builds them
+    again nor forecasts with other settings.
+    """
+    return report_html(*build_report(inflow_df, outflow_df, budget_df, **options), title=title)
+
+
+class ReportJobs:
+    """Build reports in a process pool, one job per data version.
+
+    ``submit`` returns immediately; callers poll ``status`` and fetch the
+    finished bytes with ``result``. Submitting a version that already has
+    a pending or finished job reuses it, and the most recent
+    ``max_results`` jobs are kept.
+    """
+
+    def __init__(self, max_workers=2, max_results=8):
+        # Spawned workers do not inherit the server's threads and locks
+        self.executor = ProcessPoolExecutor(max_workers=max_workers,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        self.max_results = max_results
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, version, inflow_df, outflow_df, budget_df, **kwargs):
+        with self._lock:
+            job = self.jobs.get(version)
+            if job is not None and not (job.done() and job.exception() is not None):
+                self.jobs.move_to_end(version)
+                return job
+            job = self.executor.submit(build_report_html, inflow_df, outflow_df, budget_df, **kwargs)
+            self.jobs[version] = job
+            while len(self.jobs) > self.max_results:
+                self.jobs.popitem(last=False)
+            return job
+
+    def status(self, version):
+        """None, 'pending', 'running', 'done' or 'failed'"""
+        with self._lock:
+            job = self.jobs.get(version)
+        if job is None:
+            return None
+        if not job.done():
+            return 'running' if job.running() else 'pending'
+        return 'failed' if job.exception() is not None else 'done'
+
+    def result(self, version):
+        """Finished report bytes, or None while the job is not done"""
+        with self._lock:
+            job = self.jobs.get(version)
+        if job is None or not job.done() or job.exception() is not None:
+            return None
+        return job.result()
+
+    def error(self, version):
+        with self._lock:
+            job = self.jobs.get(version)
+        return job.exception() if job is not None and job.done() else None
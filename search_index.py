@@ -0,0 +1,136 @@
+import re
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+# Columns searched by the item pickers, with the weight of a match in each
+SEARCH_FIELDS = {'Item_ID': 1.0, 'Item_name': 1.0, 'Code': 0.75, 'Vendor_Name': 0.5}
+
+# Score of a query term that equals a word, starts one or occurs inside one
+EXACT, PREFIX, SUBSTRING = 3.0, 2.0, 1.0
+
+TOKEN = re.compile(r'[0-9a-z]+')
+
+
+def tokenize(text):
+    """Lower-case words of a value, e.g. 'Acme, Inc.' -> ['acme', 'inc']"""
+    return TOKEN.findall(str(text).lower())
+
+
+def trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class SearchIndex:
+    """Typeahead search over the items of a frame, one result per key.
+
+    Every word of the searched columns is stored once in a sorted word
+    list next to the item it belongs to, so the words starting with a
+    query term are one contiguous slice found by binary search. Words are
+    also indexed by trigram to match terms typed from the middle of a word.
+    An item matches when every query term matches one of its words; items
+    are ranked by how well the terms match (whole word, prefix, inside a
+    word) and in which column. Build it once per data version.
+    """
+
+    def __init__(self, df, key='Item_ID', fields=None, label_fields=('Item_ID', 'Item_name')):
+        fields = SEARCH_FIELDS if fields is None else fields
+        fields = {column: weight for column, weight in fields.items() if column in df}
+        # One result per key, in order of first appearance; every row's words count
+        codes, keys = pd.factorize(df[key])
+        self.keys = list(keys)
+        items = df.drop_duplicates(subset=key).dropna(subset=[key])
+        self.labels = {}
+        label_columns = [column for column in label_fields if column in items]
+        for row in items[label_columns].itertuples(index=False):
+            self.labels[row[0]] = ' - '.join(str(value) for value in row)
+
+        # Best weight of each (word, item), tokenizing each distinct value once
+        frames = []
+        for column, weight in fields.items():
+            values, uniques = pd.factorize(df[column])
+            words = pd.Series([tokenize(value) for value in uniques], dtype=object).explode().dropna()
+            pairs = pd.DataFrame({'item': codes, 'value': values})
+            pairs = pairs[(pairs['item'] >= 0) & (pairs['value'] >= 0)].drop_duplicates()
+            pairs = pairs.merge(words.rename('word'), left_on='value', right_index=True)
+            frames.append(pairs[['word', 'item']].assign(weight=weight))
+        if frames:
+            entries = pd.concat(frames).groupby(['word', 'item'])['weight'].max()
+        else:
+            entries = pd.Series(dtype=float, index=pd.MultiIndex.from_arrays([[], []], names=['word', 'item']))
+        self.items = entries.index.get_level_values('item').to_numpy(dtype=np.intp)
+        self.weights = entries.to_numpy(dtype=float)
+        # Distinct words, sorted; the entries of vocabulary[v] are starts[v]:starts[v + 1]
+        counts = entries.groupby(level='word').size()
+        self.vocabulary = counts.index.tolist()
+        self.starts = np.concatenate([[0], np.cumsum(counts.to_numpy())]).astype(np.intp)
+
+        # Trigram -> distinct words containing it, for terms typed from inside a word
+        grams = {}
+        for v, word in enumerate(self.vocabulary):
+            for gram in trigrams(word):
+                grams.setdefault(gram, []).append(v)
+        self.grams = {gram: np.array(words, dtype=np.intp) for gram, words in grams.items()}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, query, limit=20):
+        """Keys of the best ``limit`` items for the query; the first items when it is empty"""
+        terms = tokenize(query)
+        if not terms:
+            return self.keys[:limit]
+        total = np.zeros(len(self.keys))
+        matched = np.ones(len(self.keys), dtype=bool)
+        for term in terms:
+            scores = self._term_scores(term)
+            matched &= scores > 0
+            total += scores
+        candidates = np.flatnonzero(matched)
+        if len(candidates) > limit:
+            # Everything scoring above the limit-th best score, then the earliest of the ties
+            scores = total[candidates]
+            kth = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+            better = candidates[scores > kth]
+            tied = candidates[scores == kth][:limit - len(better)]
+            candidates = np.concatenate([better, tied])
+        order = np.lexsort((candidates, -total[candidates]))
+        return [self.keys[position] for position in candidates[order]]
+
+    def label(self, key):
+        return self.labels.get(key, str(key))
+
+    def _term_scores(self, term):
+        """Best score of one query term for every item"""
+        scores = np.zeros(len(self.keys))
+        # Words starting with the term form one slice of the sorted vocabulary
+        lo = bisect_left(self.vocabulary, term)
+        hi = bisect_left(self.vocabulary, term + '\uffff', lo)
+        if hi > lo:
+            self._raise(scores, slice(self.starts[lo], self.starts[hi]), PREFIX)
+            if self.vocabulary[lo] == term:
+                self._raise(scores, slice(self.starts[lo], self.starts[lo + 1]), EXACT)
+        if len(term) >= 3:
+            found = None
+            for gram in trigrams(term):
+                postings = self.grams.get(gram)
+                if postings is None:
+                    return scores
+                found = postings if found is None else np.intersect1d(found, postings, assume_unique=True)
+            # Words starting with the term are scored already; trigrams only narrow
+            # the others down, so keep those that really contain the term
+            found = found[(found < lo) | (found >= hi)]
+            found = [v for v in found if term in self.vocabulary[v]]
+            if found:
+                entries = np.concatenate([np.arange(self.starts[v], self.starts[v + 1]) for v in found])
+                self._raise(scores, entries, SUBSTRING)
+        return scores
+
+    def _raise(self, scores, entries, factor):
+        """Lift the scores of the items of the given entries to weight * factor"""
+        items, weights = self.items[entries], self.weights[entries]
+        # Few distinct weights; within one, repeated items all get the same value
+        for weight in np.unique(weights):
+            selected = items[weights == weight]
+            scores[selected] = np.maximum(scores[selected], weight * factor)
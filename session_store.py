@@ -0,0 +1,314 @@
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import MutableMapping
+
+import pandas as pd
+
+MB = 2 ** 20
+
+# Caps on the frames kept in memory, overridable per deployment
+MEMORY_LIMIT = int(os.environ.get('INVENTORY_MEMORY_LIMIT_MB', 1024)) * MB
+SESSION_LIMIT = int(os.environ.get('INVENTORY_SESSION_LIMIT_MB', 256)) * MB
+# A session untouched this long is spilled to disk, and forgotten when untouched
+# for EXPIRE_SECONDS (its browser tab is almost certainly gone by then)
+IDLE_SECONDS = int(os.environ.get('INVENTORY_IDLE_MINUTES', 10)) * 60
+EXPIRE_SECONDS = int(os.environ.get('INVENTORY_EXPIRE_HOURS', 12)) * 3600
+# Directory of the spilled frames; a fresh temporary one when unset
+SPILL_DIR = os.environ.get('INVENTORY_SPILL_DIR')
+
+# Idle sessions are looked for at most this often
+SWEEP_SECONDS = 30
+
+# Fast compression: spilling is about freeing memory, not saving disk
+COMPRESSION = {'method': 'gzip', 'compresslevel': 1}
+
+
+def value_bytes(value):
+    """Memory held by a stored value, counting the strings of object columns"""
+    if value is None:
+        return 0
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    def __init__(self, value, version):
+        self.value = value
+        self.empty = value is None  # known without reading a spilled copy back
+        self.bytes = value_bytes(value)
+        self.version = version  # goes up with every put, so a spill can tell it was overtaken
+        self.path = None  # spilled copy, when the value is not in memory
+        self.disk_bytes = 0
+        self.last_access = time.monotonic()
+
+    @property
+    def resident(self):
+        return self.path is None
+
+
+class SessionStore:
+    """Per-session frames with a memory budget, spilled to compressed files when idle.
+
+    Each session's values (DataFrames mostly) are kept under a name, with
+    their size in bytes. A session untouched for ``idle_seconds`` has its
+    frames written to gzip pickles in ``directory`` and released; they
+    are read back on the next access. Going over ``session_limit`` spills
+    that session's least recently used frames, and going over
+    ``memory_limit`` those of the least recently used sessions, but never
+    the frame being accessed. Sessions untouched for ``expire_seconds``
+    are forgotten with their files.
+
+    Spills are written outside the lock and only take effect if the value
+    was neither replaced nor read meanwhile. A frame changed in place must
+    be put back afterwards, so the change is neither lost to a spill nor
+    missed by the byte count. The store is shared by every session of a
+    server (``st.cache_resource``) and is safe to use from their threads.
+    """
+
+    def __init__(self, directory=None, memory_limit=MEMORY_LIMIT, session_limit=SESSION_LIMIT,
+                 idle_seconds=IDLE_SECONDS, expire_seconds=EXPIRE_SECONDS):
+        directory = directory or SPILL_DIR
+        self.owns_directory = directory is None
+        self.directory = directory or tempfile.mkdtemp(prefix='inventory-sessions-')
+        os.makedirs(self.directory, exist_ok=True)
+        self.memory_limit = memory_limit
+        self.session_limit = session_limit
+        self.idle_seconds = idle_seconds
+        self.expire_seconds = expire_seconds
+        self.sessions = {}  # session id -> {name: _Entry}
+        self.spills = 0
+        self.reloads = 0
+        self._versions = 0
+        self._last_sweep = time.monotonic()
+        self._lock = threading.RLock()
+
+    def frames(self, session_id):
+        """Dict-like view of one session's values"""
+        return SessionFrames(self, session_id)
+
+    def names(self, session_id):
+        with self._lock:
+            return list(self.sessions.get(session_id, {}))
+
+    def contains(self, session_id, name):
+        with self._lock:
+            return name in self.sessions.get(session_id, {})
+
+    def present(self, session_id, name):
+        """Whether a value other than None is stored, without reading a spilled one back"""
+        with self._lock:
+            entry = self.sessions.get(session_id, {}).get(name)
+            return entry is not None and not entry.empty
+
+    def get(self, session_id, name, default=None):
+        """A stored value, read back from disk if it was spilled"""
+        while True:
+            with self._lock:
+                entry = self.sessions.get(session_id, {}).get(name)
+                if entry is None:
+                    return default
+                entry.last_access = time.monotonic()
+                if entry.resident:
+                    return entry.value
+                path, version = entry.path, entry.version
+            value = pd.read_pickle(path, compression=COMPRESSION['method'])
+            with self._lock:
+                entry = self.sessions.get(session_id, {}).get(name)
+                # Replaced or dropped while reading: look again
+                if entry is not None and entry.version == version:
+                    if not entry.resident:
+                        entry.value, entry.path, entry.disk_bytes = value, None, 0
+                        _remove(path)
+                        self.reloads += 1
+                    value = entry.value
+                    break
+        self._enforce(session_id, name)
+        return value
+
+    def put(self, session_id, name, value):
+        """Store a value, replacing any earlier one and its spilled copy"""
+        with self._lock:
+            self._versions += 1
+            entries = self.sessions.setdefault(session_id, {})
+            old = entries.get(name)
+            entries[name] = _Entry(value, self._versions)
+            if old is not None and old.path is not None:
+                _remove(old.path)
+        self._enforce(session_id, name)
+
+    def delete(self, session_id, name):
+        with self._lock:
+            entry = self.sessions.get(session_id, {}).pop(name, None)
+            if entry is not None and entry.path is not None:
+                _remove(entry.path)
+
+    def drop(self, session_id):
+        """Forget a session and delete its spilled files"""
+        with self._lock:
+            entries = self.sessions.pop(session_id, {})
+        for entry in entries.values():
+            if entry.path is not None:
+                _remove(entry.path)
+
+    def resident_bytes(self, session_id=None):
+        """Bytes in memory, of one session or of all of them"""
+        with self._lock:
+            sessions = self.sessions.values() if session_id is None else [self.sessions.get(session_id, {})]
+            return sum(entry.bytes for entries in sessions for entry in entries.values() if entry.resident)
+
+    def spill(self, session_id, names=None):
+        """Write a session's frames (or the named ones) to disk and release them; returns bytes freed"""
+        with self._lock:
+            entries = self.sessions.get(session_id, {})
+            victims = [(session_id, name) for name in (entries if names is None else names)
+                       if name in entries]
+        return self._spill(victims)
+
+    def sweep(self, now=None):
+        """Spill idle sessions and forget expired ones"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._last_sweep = now
+            idle, expired = [], []
+            for session_id, entries in self.sessions.items():
+                last_access = max((entry.last_access for entry in entries.values()), default=0)
+                if now - last_access >= self.expire_seconds:
+                    expired.append(session_id)
+                elif now - last_access >= self.idle_seconds:
+                    idle.extend((session_id, name) for name, entry in entries.items() if entry.resident)
+        for session_id in expired:
+            self.drop(session_id)
+        return self._spill(idle)
+
+    def stats(self):
+        """Frames, memory, disk and idle time per session, largest in memory first"""
+        now = time.monotonic()
+        with self._lock:
+            rows = [{
+                'Session': session_id,
+                'Frames': len(entries),
+                'Spilled': sum(not entry.resident for entry in entries.values()),
+                'Memory_MB': sum(entry.bytes for entry in entries.values() if entry.resident) / MB,
+                'Disk_MB': sum(entry.disk_bytes for entry in entries.values()) / MB,
+                'Idle_Seconds': now - max((entry.last_access for entry in entries.values()), default=now),
+            } for session_id, entries in self.sessions.items()]
+        stats = pd.DataFrame(rows, columns=['Session', 'Frames', 'Spilled', 'Memory_MB', 'Disk_MB', 'Idle_Seconds'])
+        return stats.sort_values('Memory_MB', ascending=False).reset_index(drop=True)
+
+    def close(self):
+        """Forget every session and delete the spill directory if the store made it"""
+        for session_id in list(self.sessions):
+            self.drop(session_id)
+        if self.owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _enforce(self, session_id, name):
+        """Spill until both caps hold, sparing the value just accessed"""
+        if time.monotonic() - self._last_sweep >= SWEEP_SECONDS:
+            self.sweep()
+        with self._lock:
+            candidates = []
+            for other, entries in self.sessions.items():
+                for other_name, entry in entries.items():
+                    if entry.resident and entry.bytes and (other, other_name) != (session_id, name):
+                        candidates.append((entry.last_access, other, other_name, entry.bytes))
+            candidates.sort()
+            victims = []
+            # This session's own least recently used frames first
+            excess = self.resident_bytes(session_id) - self.session_limit
+            for _, other, other_name, size in candidates:
+                if excess <= 0:
+                    break
+                if other == session_id:
+                    victims.append((other, other_name))
+                    excess -= size
+            # Then whichever frames were used longest ago, sessions idle the longest first
+            last_use = {other: max(entry.last_access for entry in entries.values()) if entries else 0
+                        for other, entries in self.sessions.items()}
+            candidates.sort(key=lambda candidate: (last_use[candidate[1]], candidate[0]))
+            excess = self.resident_bytes() - self.memory_limit - sum(
+                self.sessions[other][other_name].bytes for other, other_name in victims)
+            for _, other, other_name, size in candidates:
+                if excess <= 0:
+                    break
+                if (other, other_name) not in victims:
+                    victims.append((other, other_name))
+                    excess -= size
+        self._spill(victims)
+
+    def _spill(self, victims):
+        freed = 0
+        for session_id, name in victims:
+            with self._lock:
+                entry = self.sessions.get(session_id, {}).get(name)
+                if entry is None or not entry.resident or entry.value is None:
+                    continue
+                value, version, accessed = entry.value, entry.version, entry.last_access
+            path = os.path.join(self.directory, f"{_safe(session_id)}-{_safe(name)}-{version}.pkl.gz")
+            pd.to_pickle(value, path, compression=COMPRESSION)
+            with self._lock:
+                entry = self.sessions.get(session_id, {}).get(name)
+                # Replaced or read while writing: it is in use, so it stays in memory
+                if entry is None or entry.version != version or entry.last_access != accessed:
+                    _remove(path)
+                    continue
+                entry.value, entry.path, entry.disk_bytes = None, path, os.path.getsize(path)
+                freed += entry.bytes
+                self.spills += 1
+        return freed
+
+
+class SessionFrames(MutableMapping):
+    """One session's values in a SessionStore, used like a dict"""
+
+    def __init__(self, store, session_id):
+        self.store = store
+        self.session_id = session_id
+
+    def __getitem__(self, name):
+        if not self.store.contains(self.session_id, name):
+            raise KeyError(name)
+        return self.store.get(self.session_id, name)
+
+    def __setitem__(self, name, value):
+        self.store.put(self.session_id, name, value)
+
+    def __delitem__(self, name):
+        if not self.store.contains(self.session_id, name):
+            raise KeyError(name)
+        self.store.delete(self.session_id, name)
+
+    def __contains__(self, name):
+        return self.store.contains(self.session_id, name)
+
+    def present(self, name):
+        return self.store.present(self.session_id, name)
+
+    def __iter__(self):
+        return iter(self.store.names(self.session_id))
+
+    def __len__(self):
+        return len(self.store.names(self.session_id))
+
+    def clear(self):
+        # Without reading back spilled frames just to drop them
+        self.store.drop(self.session_id)
+
+
+def _safe(text):
+    return re.sub(r'[^0-9A-Za-z_]', '_', str(text))
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,105 @@
+"""Cold-start profile of the Streamlit apps.
+
+Runs each app script in a fresh interpreter with ``-X importtime``,
+stopping before ``main()``, and reports how long the worker takes to get
+from nothing to a first paint together with the slowest imports.
+
+Cold-start budget: every app must finish its imports and module body
+within COLD_START_BUDGET_MS, and none of the DEFERRED_MODULES may be
+loaded at startup, since only the pages that draw charts or export
+workbooks need them. Run ``python startup_profile.py`` as the benchmark;
+it exits non-zero when an app is over budget.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+APPS = {
+    'root': 'app.py',
+    'V2': os.path.join('V2', 'app.py'),
+    'V3': os.path.join('V3', 'streamlit_app.py'),
+    'gd': os.path.join('gd', 'app.py'),
+}
+
+# Streamlit and pandas alone take roughly 0.8 s to import
+COLD_START_BUDGET_MS = 1500
+
+# Loaded on demand by the pages that use them. Streamlit itself imports the
+# plotly package and plotly.graph_objects, so only plotly.express is listed.
+DEFERRED_MODULES = ['plotly.express', 'gspread', 'google.oauth2', 'openpyxl']
+
+# Executes the app's imports and definitions without running main()
+CHILD = """
+import json, runpy, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {app_dir!r})
+runpy.run_path({path!r}, run_name='__startup_profile__')
+seconds = time.perf_counter() - start
+# Lazy modules only reach sys.modules once first used
+loaded = list(sys.modules)
+print(json.dumps({{'seconds': seconds, 'modules': sorted(loaded)}}))
+"""
+
+
+def parse_importtime(stderr):
+    """Top-level imports as (module, cumulative microseconds), slowest first"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented under the module that triggered them
+        if not name.startswith('  '):
+            imports.append((name.strip(), int(cumulative)))
+    return sorted(imports, key=lambda item: item[1], reverse=True)
+
+
+def profile(app):
+    """Startup time, slowest imports and deferred modules loaded for one app"""
+    path = os.path.join(ROOT, APPS[app])
+    app_dir = os.path.dirname(path)
+    code = CHILD.format(app_dir=app_dir, path=path)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=app_dir, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{app} failed to start:\n{result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    loaded = set(report['modules'])
+    return {
+        'app': app,
+        'ms': report['seconds'] * 1000,
+        'imports': parse_importtime(result.stderr),
+        'deferred_loaded': [name for name in DEFERRED_MODULES if name in loaded],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('apps', nargs='*', help=f"apps to profile: {', '.join(APPS)} (default: all)")
+    parser.add_argument('--budget-ms', type=float, default=COLD_START_BUDGET_MS)
+    parser.add_argument('--top', type=int, default=10, help='slowest imports to list per app')
+    args = parser.parse_args()
+    unknown = [app for app in args.apps if app not in APPS]
+    if unknown:
+        parser.error(f"unknown app: {', '.join(unknown)}")
+
+    failed = False
+    for app in args.apps or list(APPS):
+        result = profile(app)
+        over = result['ms'] > args.budget_ms
+        failed = failed or over or bool(result['deferred_loaded'])
+        status = 'OVER BUDGET' if over else 'ok'
+        print(f"{app}: {result['ms']:,.0f} ms (budget {args.budget_ms:,.0f} ms) {status}")
+        for name, cumulative in result['imports'][:args.top]:
+            print(f"    {cumulative / 1000:8.1f} ms  {name}")
+        if result['deferred_loaded']:
+            print(f"    loaded at startup but should be deferred: {', '.join(result['deferred_loaded'])}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,599 @@
+import importlib.util
+import sqlite3
+import threading
+
+import pandas as pd
+
+from budget_ledger import BudgetLedger, budget_long
+
+TABLES = ('inflow', 'outflow', 'budget')
+
+# Column holding the movement date of each table
+DATE_COLUMNS = {
+    'inflow': 'Purchase_Date',
+    'outflow': 'Date_of_Distribution',
+}
+
+# Derived measures: money spent on purchases, value of distributions
+MEASURES = {
+    'Value': {
+        'inflow': '"Total_Cost"',
+        'outflow': '"Cost_per_Item" * "Quantity"',
+    },
+}
+
+# Columns the dashboards filter and group on
+INDEXED_COLUMNS = ['Item_ID', 'Item_Type', 'Item_name', 'Department', 'Event_Type',
+                   'Vendor_Name', 'Purchase_Date', 'Date_of_Distribution']
+
+PERIODS = ('day', 'month', 'year')
+
+ROW_KEY = '_row'
+
+
+def available_backends():
+    """Names of the storage backends that can be used in this environment"""
+    names = ['pandas', 'sqlite']
+    if importlib.util.find_spec('duckdb') is not None:
+        names.append('duckdb')
+    return names
+
+
+def make_backend(name, path=None, frames=None):
+    """Storage backend by name; ``path`` makes the SQL engines persist to a file.
+
+    ``frames`` is the dict-like the pandas backend keeps its tables in,
+    such as a session's SessionFrames.
+    """
+    if name == 'pandas':
+        return PandasBackend(frames)
+    if name == 'sqlite':
+        return SQLiteBackend(path or ':memory:')
+    if name == 'duckdb':
+        return DuckDBBackend(path or ':memory:')
+    raise ValueError(f"Unknown storage backend: {name}")
+
+
+class StorageBackend:
+    """Where DataManager keeps the Inflow, Outflow and Budget tables.
+
+    Rows are addressed by their index label, as in the frames ``get``
+    returns. Besides row access every backend answers the dashboard
+    aggregations (grouped sums, top-N rows and groups, budget vs actual),
+    so the SQL engines can run them where the data lives.
+    """
+
+    name = None
+
+    def load(self, tables):
+        """Replace the tables with a dict of frames keyed by table name"""
+        raise NotImplementedError
+
+    def has_data(self):
+        raise NotImplementedError
+
+    def get(self, table):
+        raise NotImplementedError
+
+    def column_names(self, table):
+        """Column names of a table, without reading its rows"""
+        raise NotImplementedError
+
+    def append(self, table, rows):
+        """Append a frame of rows, labelled after the current last row; returns the labels"""
+        raise NotImplementedError
+
+    def rows(self, table, labels):
+        """The rows with the given labels, in label order"""
+        raise NotImplementedError
+
+    def restore(self, table, rows):
+        """Put back rows under the labels they carry, e.g. rows that were deleted"""
+        raise NotImplementedError
+
+    def update(self, table, index, item_data):
+        """Set the given columns of one row"""
+        raise NotImplementedError
+
+    def delete(self, table, index):
+        """Drop one row label or a list of them"""
+        raise NotImplementedError
+
+    def group_sum(self, table, by=(), columns=(), period=None):
+        """Sums of ``columns`` and a Rows count grouped by ``by``.
+
+        ``period`` ('day', 'month' or 'year') also groups on the start of
+        the period of the table's date column, returned as Period. Columns
+        may name a derived measure such as Value.
+        """
+        raise NotImplementedError
+
+    def top_rows(self, table, n, column):
+        """``df.nlargest(n, column)``"""
+        raise NotImplementedError
+
+    def top_groups(self, table, n, by, column):
+        """``df.groupby(by)[column].sum().nlargest(n)``"""
+        raise NotImplementedError
+
+    def budget_vs_actual(self, year=None):
+        """Budget and Outflow spend per Event_Type for one year, as BudgetLedger.report"""
+        raise NotImplementedError
+
+
+class PandasBackend(StorageBackend):
+    """The tables as in-memory DataFrames, analysed with pandas.
+
+    The frames live in a dict, or in any dict-like given, e.g. one that
+    spills them to disk. Frames changed in place are stored again, so the
+    dict-like sees every change.
+    """
+
+    name = 'pandas'
+
+    def __init__(self, frames=None):
+        self.frames = frames if frames is not None else {}
+        # Frames already in the dict-like (a session's spilled tables) are kept
+        for table in TABLES:
+            if table not in self.frames:
+                self.frames[table] = None
+
+    def load(self, tables):
+        for table in TABLES:
+            self.frames[table] = tables.get(table)
+
+    def has_data(self):
+        # A session store's frames are checked without reading spilled ones back from disk
+        if hasattr(self.frames, 'present'):
+            return all(self.frames.present(table) for table in TABLES)
+        return all(self.frames.get(table) is not None for table in TABLES)
+
+    def get(self, table):
+        return self.frames[table]
+
+    def column_names(self, table):
+        frame = self.frames[table]
+        return [] if frame is None else list(frame.columns)
+
+    def append(self, table, rows):
+        frame = self.frames[table]
+        start = _next_label(frame)
+        rows = rows.set_axis(pd.RangeIndex(start, start + len(rows)))
+        self.frames[table] = rows if frame is None else pd.concat([frame, rows])
+        return list(rows.index)
+
+    def rows(self, table, labels):
+        return self.frames[table].loc[sorted(labels)].copy()
+
+    def restore(self, table, rows):
+        frame = self.frames[table]
+        if frame is None:
+            self.frames[table] = rows.copy()
+            return
+        frame = pd.concat([frame, rows])
+        # Restored rows go back to their place in label order
+        if not frame.index.is_monotonic_increasing:
+            frame = frame.sort_index(kind='stable')
+        self.frames[table] = frame
+
+    def update(self, table, index, item_data):
+        frame = self.frames[table]
+        for column, value in item_data.items():
+            frame.loc[index, column] = value
+        self.frames[table] = frame
+
+    def delete(self, table, index):
+        self.frames[table] = self.frames[table].drop(index)
+
+    def group_sum(self, table, by=(), columns=(), period=None):
+        frame = self._with_measures(table, columns)
+        keys = list(by)
+        if period is not None:
+            frame = frame.assign(Period=_period_start(frame[DATE_COLUMNS[table]], period))
+            keys = ['Period'] + keys
+        sums = frame[list(columns)].assign(Rows=1)
+        if not keys:
+            return sums.sum().to_frame().T
+        return sums.groupby([frame[key] for key in keys], dropna=False).sum().reset_index()
+
+    def top_rows(self, table, n, column):
+        return self.frames[table].nlargest(n, column)
+
+    def top_groups(self, table, n, by, column):
+        frame = self._with_measures(table, [column])
+        return frame.groupby(by)[column].sum().nlargest(n)
+
+    def budget_vs_actual(self, year=None):
+        ledger = BudgetLedger(self.frames['budget'])
+        ledger.sync(self.frames['outflow'])
+        return ledger.report(year)
+
+    def _with_measures(self, table, columns):
+        frame = self.frames[table]
+        derived = [column for column in columns if column in MEASURES and column not in frame]
+        if not derived:
+            return frame
+        frame = frame.copy()
+        for column in derived:
+            if table == 'inflow':
+                frame[column] = frame['Total_Cost']
+            else:
+                frame[column] = frame['Cost_per_Item'] * frame['Quantity']
+        return frame
+
+
+class SQLBackend(StorageBackend):
+    """The tables in an embedded SQL engine, with aggregations run as SQL.
+
+    Each table carries its row label in an indexed _row column and the
+    columns the dashboards group and filter on are indexed too. The Budget
+    sheet is also kept in long form (Year, Event_Type, Budget_Amount) so
+    budget vs actual is a single join against the Outflow sums.
+    """
+
+    # Columns indexed by this engine, besides the row key
+    index_columns = INDEXED_COLUMNS
+
+    def __init__(self):
+        self.columns = {}
+        self.datetime_columns = {}
+        self._lock = threading.Lock()
+
+    def load(self, tables):
+        with self._lock:
+            for table in TABLES:
+                frame = tables.get(table)
+                self._execute(f'DROP TABLE IF EXISTS {_quote(table)}')
+                if frame is None:
+                    self.columns.pop(table, None)
+                    continue
+                if not frame.index.is_unique:
+                    frame = frame.reset_index(drop=True)
+                self.columns[table] = list(frame.columns)
+                self.datetime_columns[table] = [column for column in frame.columns
+                                                if pd.api.types.is_datetime64_any_dtype(frame[column])]
+                self._create(table, frame.rename_axis(ROW_KEY).reset_index())
+                self._index(table)
+            self._refresh_budget()
+
+    def has_data(self):
+        return all(table in self.columns for table in TABLES)
+
+    def get(self, table):
+        if table not in self.columns:
+            return None
+        with self._lock:
+            frame = self._query(f'SELECT * FROM {_quote(table)} ORDER BY {ROW_KEY}')
+        return self._frame(table, frame)
+
+    def column_names(self, table):
+        return list(self.columns.get(table, []))
+
+    def append(self, table, rows):
+        with self._lock:
+            start = self._scalar(f'SELECT MAX({ROW_KEY}) FROM {_quote(table)}')
+            start = 0 if start is None else int(start) + 1
+            labels = list(range(start, start + len(rows)))
+            self._insert_labelled(table, rows, labels)
+        return labels
+
+    def rows(self, table, labels):
+        labels = [int(label) for label in labels]
+        if not labels:
+            return self.get(table).iloc[:0]
+        placeholders = ', '.join('?' for _ in labels)
+        with self._lock:
+            frame = self._query(f'SELECT * FROM {_quote(table)} WHERE {ROW_KEY} IN ({placeholders}) '
+                                f'ORDER BY {ROW_KEY}', labels)
+        return self._frame(table, frame)
+
+    def restore(self, table, rows):
+        with self._lock:
+            self._insert_labelled(table, rows, [int(label) for label in rows.index])
+
+    def _insert_labelled(self, table, rows, labels):
+        rows = rows.reset_index(drop=True)
+        for column in self.datetime_columns.get(table, []):
+            if column in rows:
+                rows[column] = pd.to_datetime(rows[column], errors='coerce')
+        for column in rows.columns:
+            if column not in self.columns[table]:
+                self._add_column(table, column, rows[column])
+                self.columns[table].append(column)
+        rows.insert(0, ROW_KEY, labels)
+        self._insert(table, rows)
+        if table == 'budget':
+            self._refresh_budget()
+
+    def update(self, table, index, item_data):
+        columns = [column for column in item_data if column in self.columns[table]]
+        if not columns:
+            return
+        assignments = ', '.join(f'{_quote(column)} = ?' for column in columns)
+        params = [self._param(item_data[column]) for column in columns] + [int(index)]
+        with self._lock:
+            self._execute(f'UPDATE {_quote(table)} SET {assignments} WHERE {ROW_KEY} = ?', params)
+            if table == 'budget':
+                self._refresh_budget()
+
+    def delete(self, table, index):
+        labels = [int(label) for label in (index if pd.api.types.is_list_like(index) else [index])]
+        if not labels:
+            return
+        placeholders = ', '.join('?' for _ in labels)
+        with self._lock:
+            self._execute(f'DELETE FROM {_quote(table)} WHERE {ROW_KEY} IN ({placeholders})', labels)
+            if table == 'budget':
+                self._refresh_budget()
+
+    def group_sum(self, table, by=(), columns=(), period=None):
+        keys = [_quote(column) for column in by]
+        select = list(keys)
+        if period is not None:
+            if period not in PERIODS:
+                raise ValueError(f"Unknown period: {period}")
+            expression = self._period(_quote(DATE_COLUMNS[table]), period)
+            keys.insert(0, expression)
+            select.insert(0, f'{expression} AS "Period"')
+        select += [f'SUM({self._measure(table, column)}) AS {_quote(column)}' for column in columns]
+        select.append('COUNT(*) AS "Rows"')
+        sql = f'SELECT {", ".join(select)} FROM {_quote(table)}'
+        if keys:
+            sql += f' GROUP BY {", ".join(keys)} ORDER BY {", ".join(keys)}'
+        with self._lock:
+            result = self._query(sql)
+        if period is not None:
+            result['Period'] = pd.to_datetime(result['Period'])
+        return result
+
+    def top_rows(self, table, n, column):
+        sql = (f'SELECT * FROM {_quote(table)} WHERE {_quote(column)} IS NOT NULL '
+               f'ORDER BY {_quote(column)} DESC, {ROW_KEY} LIMIT {int(n)}')
+        with self._lock:
+            frame = self._query(sql)
+        return self._frame(table, frame)
+
+    def top_groups(self, table, n, by, column):
+        sql = (f'SELECT {_quote(by)}, SUM({self._measure(table, column)}) AS total FROM {_quote(table)} '
+               f'WHERE {_quote(by)} IS NOT NULL GROUP BY {_quote(by)} '
+               f'ORDER BY total DESC, {_quote(by)} LIMIT {int(n)}')
+        with self._lock:
+            result = self._query(sql)
+        return pd.Series(result['total'].to_numpy(), index=pd.Index(result[by], name=by), name=column)
+
+    def budget_vs_actual(self, year=None):
+        with self._lock:
+            if year is None:
+                year = self._scalar('SELECT MAX("Year") FROM budget_long')
+            if year is None and 'outflow' in self.columns:
+                year = self._scalar(f'SELECT MAX({self._year(_quote(DATE_COLUMNS["outflow"]))}) FROM outflow')
+            if year is None or 'outflow' not in self.columns:
+                return pd.DataFrame(columns=['Event_Type', 'Budget_Amount', 'Actual_Amount_Spent',
+                                             'Remaining', 'Utilization %'])
+            year = int(year)
+            return self._query(f'''
+                WITH actual AS (
+                    SELECT "Event_Type", SUM({MEASURES['Value']['outflow']}) AS spent
+                    FROM outflow
+                    WHERE "Event_Type" IS NOT NULL AND {self._year(_quote(DATE_COLUMNS['outflow']))} = ?
+                    GROUP BY "Event_Type"
+                ), planned AS (
+                    SELECT "Event_Type", SUM("Budget_Amount") AS amount
+                    FROM budget_long WHERE "Year" = ?
+                    GROUP BY "Event_Type"
+                ), joined AS (
+                    -- A full outer join; FULL OUTER JOIN itself needs SQLite 3.39
+                    SELECT planned."Event_Type" AS "Event_Type", amount, spent
+                    FROM planned LEFT JOIN actual ON planned."Event_Type" = actual."Event_Type"
+                    UNION ALL
+                    SELECT actual."Event_Type", NULL, spent
+                    FROM actual LEFT JOIN planned ON planned."Event_Type" = actual."Event_Type"
+                    WHERE planned."Event_Type" IS NULL
+                )
+                SELECT "Event_Type",
+                       COALESCE(amount, 0) AS "Budget_Amount",
+                       COALESCE(spent, 0) AS "Actual_Amount_Spent",
+                       COALESCE(amount, 0) - COALESCE(spent, 0) AS "Remaining",
+                       CASE WHEN COALESCE(amount, 0) != 0
+                            THEN ROUND(COALESCE(spent, 0) * 100.0 / amount, 2) ELSE 0 END AS "Utilization %"
+                FROM joined
+                ORDER BY 1
+            ''', [year, year])
+
+    def _refresh_budget(self):
+        """Rebuild the long-form budget table after the Budget sheet changed"""
+        budget = None
+        if 'budget' in self.columns:
+            budget = self._frame('budget', self._query(f'SELECT * FROM budget ORDER BY {ROW_KEY}'))
+        long = budget_long(budget).rename('Budget_Amount').reset_index().dropna(subset=['Year'])
+        long['Year'] = long['Year'].astype('int64')
+        self._execute('DROP TABLE IF EXISTS budget_long')
+        self._create('budget_long', long)
+
+    def _index(self, table):
+        self._execute(f'CREATE UNIQUE INDEX {_quote("ix_" + table + "_row")} ON {_quote(table)} ({ROW_KEY})')
+        for column in self.index_columns:
+            if column in self.columns[table]:
+                self._execute(f'CREATE INDEX {_quote("ix_" + table + "_" + column)} '
+                              f'ON {_quote(table)} ({_quote(column)})')
+
+    def _frame(self, table, frame):
+        """Query result back in the shape of the loaded frame"""
+        frame = frame.set_index(ROW_KEY)
+        frame.index.name = None
+        for column in self.datetime_columns.get(table, []):
+            if column in frame:
+                frame[column] = pd.to_datetime(frame[column])
+        return frame
+
+    def _measure(self, table, column):
+        if column in MEASURES and column not in self.columns.get(table, []):
+            return MEASURES[column][table]
+        return _quote(column)
+
+    def _scalar(self, sql, params=()):
+        result = self._query(sql, params)
+        value = result.iloc[0, 0] if len(result) else None
+        return None if pd.isna(value) else value
+
+    # Engine specific
+    def _execute(self, sql, params=()):
+        raise NotImplementedError
+
+    def _query(self, sql, params=()):
+        raise NotImplementedError
+
+    def _create(self, table, frame):
+        raise NotImplementedError
+
+    def _insert(self, table, rows):
+        raise NotImplementedError
+
+    def _add_column(self, table, column, values):
+        raise NotImplementedError
+
+    def _period(self, column, period):
+        raise NotImplementedError
+
+    def _year(self, column):
+        raise NotImplementedError
+
+    def _param(self, value):
+        return _python_value(value)
+
+
+class SQLiteBackend(SQLBackend):
+    """SQLite from the standard library, in memory unless given a file path"""
+
+    name = 'sqlite'
+
+    def __init__(self, path=':memory:'):
+        super().__init__()
+        # Streamlit reruns can land on a different thread; access is serialised by the lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+
+    def _execute(self, sql, params=()):
+        self.conn.execute(sql, list(params))
+        self.conn.commit()
+
+    def _query(self, sql, params=()):
+        return pd.read_sql_query(sql, self.conn, params=list(params))
+
+    def _create(self, table, frame):
+        frame.to_sql(table, self.conn, index=False)
+
+    def _insert(self, table, rows):
+        rows.to_sql(table, self.conn, index=False, if_exists='append')
+
+    def _add_column(self, table, column, values):
+        self._execute(f'ALTER TABLE {_quote(table)} ADD COLUMN {_quote(column)}')
+
+    def _period(self, column, period):
+        formats = {'day': '%Y-%m-%d', 'month': '%Y-%m-01', 'year': '%Y-01-01'}
+        return f"strftime('{formats[period]}', {column})"
+
+    def _year(self, column):
+        return f"CAST(strftime('%Y', {column}) AS INTEGER)"
+
+    def _param(self, value):
+        value = _python_value(value)
+        # Stored the way to_sql writes timestamps
+        if isinstance(value, pd.Timestamp):
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        return value
+
+
+class DuckDBBackend(SQLBackend):
+    """DuckDB, an in-process columnar SQL engine; needs the optional duckdb package"""
+
+    name = 'duckdb'
+    # Columnar scans skip by min/max per row group; only the row key needs an index
+    index_columns = []
+
+    def __init__(self, path=':memory:'):
+        import duckdb
+        super().__init__()
+        self.conn = duckdb.connect(path)
+
+    def _execute(self, sql, params=()):
+        self.conn.execute(sql, list(params))
+
+    def _query(self, sql, params=()):
+        return self.conn.execute(sql, list(params)).df()
+
+    def _create(self, table, frame):
+        self.conn.register('_frame', _duckdb_frame(frame))
+        try:
+            self.conn.execute(f'CREATE TABLE {_quote(table)} AS SELECT * FROM _frame')
+        finally:
+            self.conn.unregister('_frame')
+
+    def _insert(self, table, rows):
+        self.conn.register('_rows', _duckdb_frame(rows))
+        try:
+            self.conn.execute(f'INSERT INTO {_quote(table)} BY NAME SELECT * FROM _rows')
+        finally:
+            self.conn.unregister('_rows')
+
+    def _add_column(self, table, column, values):
+        if pd.api.types.is_datetime64_any_dtype(values):
+            sql_type = 'TIMESTAMP'
+        elif pd.api.types.is_bool_dtype(values):
+            sql_type = 'BOOLEAN'
+        elif pd.api.types.is_numeric_dtype(values):
+            sql_type = 'DOUBLE'
+        else:
+            sql_type = 'VARCHAR'
+        self._execute(f'ALTER TABLE {_quote(table)} ADD COLUMN {_quote(column)} {sql_type}')
+
+    def _period(self, column, period):
+        return f"date_trunc('{period}', {column})"
+
+    def _year(self, column):
+        return f'year({column})'
+
+    def _param(self, value):
+        value = _python_value(value)
+        if isinstance(value, pd.Timestamp):
+            return value.to_pydatetime()
+        return value
+
+
+def _quote(name):
+    """SQL identifier, for column names such as 2025_Budget_Amount"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _python_value(value):
+    """Plain Python value for a query parameter"""
+    if value is None or (not pd.api.types.is_list_like(value) and pd.isna(value)):
+        return None
+    if hasattr(value, 'year') and hasattr(value, 'month'):
+        return pd.Timestamp(value)
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+def _duckdb_frame(frame):
+    """Object columns as nullable strings, so mixed sheet columns load as VARCHAR"""
+    objects = frame.select_dtypes(include='object').columns
+    if len(objects):
+        frame = frame.astype({column: 'string' for column in objects})
+    return frame
+
+
+def _next_label(frame):
+    """Row label after the last one, for appended rows"""
+    if frame is None or not len(frame):
+        return 0
+    labels = pd.to_numeric(pd.Series(frame.index), errors='coerce')
+    return int(labels.max()) + 1 if labels.notna().any() else len(frame)
+
+
+def _period_start(dates, period):
+    """Start of the day, month or year of each date"""
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period: {period}")
+    dates = pd.to_datetime(dates, errors='coerce')
+    return dates.dt.to_period({'day': 'D', 'month': 'M', 'year': 'Y'}[period]).dt.start_time
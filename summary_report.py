@@ -0,0 +1,128 @@
+from datetime import datetime
+from html import escape
+
+from aggregate_cube import AggregateCube
+from budget_ledger import BudgetLedger
+from forecasting import needs_restock, restock_forecast
+from top_n import largest_groups
+
+
+def compute_summary(cube, ledger, top_departments, top_items, restock,
+                    active_departments, as_of=None, budget_year=None):
+    """Key metrics behind the Summary Report"""
+    total_items_purchased = cube.total('Inflow', 'Quantity')
+    total_items_distributed = cube.total('Outflow', 'Quantity')
+    if budget_year is None:
+        budget_year = ledger.default_year()
+    total_budget, total_spent, budget_utilization = ledger.totals(budget_year)
+    return {
+        'as_of': as_of or datetime.now(),
+        'total_purchases': cube.total('Inflow', 'Value'),
+        # Cost_per_Item x Quantity, as the Total Distributions metric; the Outflow
+        # sheets record no Total_Cost of their own
+        'total_distributions': cube.total('Outflow', 'Value'),
+        'budget_year': budget_year,
+        'total_budget': total_budget,
+        'total_spent': total_spent,
+        'budget_utilization': budget_utilization,
+        'total_items_purchased': total_items_purchased,
+        'total_items_distributed': total_items_distributed,
+        'items_in_stock': total_items_purchased - total_items_distributed,
+        'top_departments': top_departments,
+        'top_items': top_items,
+        'restock_count': len(restock),
+        'active_departments': active_departments,
+    }
+
+
+def summary_from_frames(inflow_df, outflow_df, budget_df, cube=None, restock=None,
+                        window_days=90, lead_time_days=14):
+    """Everything the Summary Report needs, computed from the raw tables.
+
+    ``restock`` is a Needs Restock table computed elsewhere, e.g. the page's,
+    forecast from the unfiltered history; without it the given tables are
+    forecast with ``window_days`` and ``lead_time_days``.
+    """
+    if cube is None:
+        cube = AggregateCube.build(inflow_df, outflow_df)
+    ledger = BudgetLedger.from_cube(budget_df, cube)
+    if restock is None:
+        restock = needs_restock(restock_forecast(inflow_df, outflow_df, window_days=window_days,
+                                                 lead_time_days=lead_time_days))
+    summary = compute_summary(
+        cube, ledger,
+        largest_groups(None, 'departments_by_quantity', outflow_df, 3, 'Department', 'Quantity'),
+        largest_groups(None, 'item_names_by_quantity', inflow_df, 3, 'Item_name', 'Quantity'),
+        restock,
+        outflow_df['Department'].nunique(),
+    )
+    return summary, cube, ledger, restock
+
+
+def _observations(summary):
+    return [
+        'Budget utilization is within expected range' if summary['budget_utilization'] < 80
+        else 'Budget utilization is high and needs attention',
+        f"{summary['restock_count']:,} items are at or below their reorder point" if summary['restock_count']
+        else 'All items are above their reorder point',
+        f"The distribution pattern shows {summary['active_departments']} active departments",
+    ]
+
+
+def summary_markdown(summary):
+    """Summary Report as markdown"""
+    departments = ', '.join([f"{dept} ({qty:,} items)" for dept, qty in summary['top_departments'].items()])
+    items = ', '.join([f"{item} ({qty:,} units)" for item, qty in summary['top_items'].items()])
+    observations = '\n'.join(f"- {line}" for line in _observations(summary))
+    return f"""
+### Inventory Overview
+As of {summary['as_of'].strftime('%B %d, %Y')}, our inventory system shows the following key metrics:
+
+**Financial Summary:**
+- Total purchases amount to ${summary['total_purchases']:,.2f}
+- Total distributions value is ${summary['total_distributions']:,.2f}
+- Current budget utilization is {summary['budget_utilization']}% of the total ${summary['total_budget']:,.2f} {summary['budget_year']} budget
+
+**Inventory Status:**
+- Total items purchased: {summary['total_items_purchased']:,}
+- Total items distributed: {summary['total_items_distributed']:,}
+- Current items in stock: {summary['items_in_stock']:,}
+
+**Top Performing Departments:**
+{departments}
+
+**Most Active Items:**
+{items}
+
+**Key Observations:**
+{observations}
+"""
+
+
+def summary_html(summary):
+    """Summary Report as an HTML fragment"""
+    def bullets(lines):
+        return '<ul>' + ''.join(f'<li>{escape(line)}</li>' for line in lines) + '</ul>'
+
+    departments = ', '.join(f"{dept} ({qty:,} items)" for dept, qty in summary['top_departments'].items())
+    items = ', '.join(f"{item} ({qty:,} units)" for item, qty in summary['top_items'].items())
+    return ''.join([
+        '<h3>Inventory Overview</h3>',
+        f"<p>As of {summary['as_of'].strftime('%B %d, %Y')}, our inventory system shows the following key metrics:</p>",
+        '<p><strong>Financial Summary:</strong></p>',
+        bullets([
+            f"Total purchases amount to ${summary['total_purchases']:,.2f}",
+            f"Total distributions value is ${summary['total_distributions']:,.2f}",
+            f"Current budget utilization is {summary['budget_utilization']}% of the total ${summary['total_budget']:,.2f} {summary['budget_year']} budget",
+        ]),
+        '<p><strong>Inventory Status:</strong></p>',
+        bullets([
+            f"Total items purchased: {summary['total_items_purchased']:,}",
+            f"Total items distributed: {summary['total_items_distributed']:,}",
+            f"Current items in stock: {summary['items_in_stock']:,}",
+        ]),
+        f'<p><strong>Top Performing Departments:</strong><br>{escape(departments)}</p>',
+        f'<p><strong>Most Active Items:</strong><br>{escape(items)}</p>',
+        '<p><strong>Key Observations:</strong></p>',
+        bullets(_observations(summary)),
+    ])
@@ -0,0 +1,192 @@
+import heapq
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from fingerprint import extend, rows_fingerprint
+
+
+class RowTopK:
+    """The K rows with the largest value in one column.
+
+    Rows are kept in a bounded min-heap keyed on (value, -position), so the
+    weakest entry is evicted first and ties keep the earliest row, exactly
+    like ``DataFrame.nlargest(keep='first')``.
+    """
+
+    def __init__(self, column, capacity=10):
+        self.column = column
+        self.capacity = capacity
+        self.heap = []
+
+    def update(self, rows, start):
+        """Offer newly appended rows; ``start`` is the position of the first one"""
+        values = rows[self.column].reset_index(drop=True).dropna()
+        # Only the chunk's own top K can make it into the overall top K
+        for position, value in values.nlargest(self.capacity, keep='first').items():
+            entry = (value, -(start + position))
+            if len(self.heap) < self.capacity:
+                heapq.heappush(self.heap, entry)
+            elif entry > self.heap[0]:
+                heapq.heapreplace(self.heap, entry)
+
+    def top(self, n):
+        """Positions of the top n rows, best first"""
+        ranked = sorted(self.heap, key=lambda entry: (entry[0], entry[1]), reverse=True)
+        return [-entry[1] for entry in ranked[:n]]
+
+
+class GroupTopK:
+    """Running per-key sums with the K largest keys kept current.
+
+    With non-negative increments a key can only enter the top K when its
+    own total grows past the current K-th key, so each update only compares
+    the updated keys against the top list. A negative increment marks the
+    tracker dirty and the next query re-ranks all keys once. Ties rank by
+    key, matching ``groupby(...).sum().nlargest(keep='first')``.
+    """
+
+    def __init__(self, key, value, capacity=10):
+        self.key = key
+        self.value = value
+        self.capacity = capacity
+        self.totals = {}
+        self.leaders = []
+        self.dirty = False
+
+    def update(self, rows, start):
+        for key, amount in rows.groupby(self.key)[self.value].sum().items():
+            self.totals[key] = self.totals.get(key, 0) + amount
+            if amount < 0:
+                self.dirty = True
+            elif not self.dirty:
+                self._promote(key)
+
+    def top(self, n):
+        """Series of the top n keys and their totals, best first"""
+        if self.dirty:
+            self.leaders = sorted(self.totals, key=self._rank)[:self.capacity]
+            self.dirty = False
+        leaders = self.leaders[:n]
+        return pd.Series([self.totals[key] for key in leaders],
+                         index=pd.Index(leaders, name=self.key), name=self.value)
+
+    def _rank(self, key):
+        return (-self.totals[key], key)
+
+    def _promote(self, key):
+        if key not in self.leaders:
+            if len(self.leaders) >= self.capacity and self._rank(key) >= self._rank(self.leaders[-1]):
+                return
+            self.leaders.append(key)
+        self.leaders.sort(key=self._rank)
+        del self.leaders[self.capacity:]
+
+
+# name -> (table, tracker class, tracker arguments)
+TRACKERS = {
+    'items_by_quantity': ('Inflow', RowTopK, ('Quantity',)),
+    'item_names_by_quantity': ('Inflow', GroupTopK, ('Item_name', 'Quantity')),
+    'recent_distributions': ('Outflow', RowTopK, ('Date_of_Distribution',)),
+    'departments_by_quantity': ('Outflow', GroupTopK, ('Department', 'Quantity')),
+    'departments_by_unit_cost': ('Outflow', GroupTopK, ('Department', 'Cost_per_Item')),
+}
+
+
+class TopNService:
+    """Top-N trackers over Inflow and Outflow, updated per inserted row.
+
+    Initialize once and call ``sync`` with the current frames on every run:
+    rows appended since the last sync are fed to the trackers, while a
+    frame whose already tracked rows changed (a full reload that edited or
+    deleted rows) rebuilds them. Whether the tracked rows are unchanged is
+    decided from their content, so frames of the same sheet loaded in
+    different ways share the trackers. Queries then cost O(K) regardless
+    of table size.
+    """
+
+    def __init__(self, capacity=10, max_versions=8):
+        self.capacity = capacity
+        self.max_versions = max_versions
+        self.trackers = {}
+        self.rows = {'Inflow': 0, 'Outflow': 0}
+        # Order-sensitive hash of the tracked rows, extended as rows are appended; None before the first sync
+        self.fingerprints = {'Inflow': None, 'Outflow': None}
+        # Data versions already synced, with their row counts
+        self.versions = {'Inflow': OrderedDict(), 'Outflow': OrderedDict()}
+        self._lock = threading.Lock()
+
+    def sync(self, table, df, version=None):
+        """Bring a table's trackers up to ``df``.
+
+        ``version`` is any token that changes with the frame's content
+        (several kinds may be used side by side); a token already synced at
+        the current row count skips reading the frame.
+        """
+        with self._lock:
+            versions = self.versions[table]
+            if version is not None and versions.get(version) == len(df) == self.rows[table]:
+                versions.move_to_end(version)
+                return
+            if len(df) < self.rows[table] or \
+                    rows_fingerprint(df, _columns(table), 0, self.rows[table]) != self.fingerprints[table]:
+                self._reset(table, df)
+            if len(df) > self.rows[table]:
+                self._insert(table, df.iloc[self.rows[table]:])
+            if version is not None:
+                versions[version] = len(df)
+                versions.move_to_end(version)
+                while len(versions) > self.max_versions:
+                    versions.popitem(last=False)
+
+    def tracker(self, name):
+        return self.trackers.get(name)
+
+    def top(self, name, n):
+        """A tracker's top n (row positions or a Series), or None when it cannot answer"""
+        with self._lock:
+            tracker = self.trackers.get(name)
+            if tracker is None or n > tracker.capacity:
+                return None
+            return tracker.top(n)
+
+    def _reset(self, table, df):
+        self.rows[table] = 0
+        self.fingerprints[table] = 0
+        self.versions[table].clear()
+        for name, (tracker_table, tracker_class, args) in TRACKERS.items():
+            if tracker_table == table:
+                self.trackers.pop(name, None)
+                if all(column in df for column in args):
+                    self.trackers[name] = tracker_class(*args, capacity=self.capacity)
+
+    def _insert(self, table, rows):
+        start = self.rows[table]
+        for name, (tracker_table, _, _) in TRACKERS.items():
+            if tracker_table == table and name in self.trackers:
+                self.trackers[name].update(rows, start)
+        self.fingerprints[table] = extend(self.fingerprints[table], rows, _columns(table), start)
+        self.rows[table] += len(rows)
+
+
+def _columns(table):
+    """Columns the trackers of a table read, hashed into its fingerprint"""
+    return sorted({column for tracker_table, _, args in TRACKERS.values() if tracker_table == table
+                   for column in args})
+
+
+def largest_rows(service, name, df, n, column):
+    """``df.nlargest(n, column)``, answered by a tracker when one is available"""
+    positions = service.top(name, n) if service is not None else None
+    if positions is None:
+        return df.nlargest(n, column)
+    return df.iloc[positions]
+
+
+def largest_groups(service, name, df, n, key, value):
+    """``df.groupby(key)[value].sum().nlargest(n)``, answered by a tracker when one is available"""
+    top = service.top(name, n) if service is not None else None
+    if top is None:
+        return df.groupby(key)[value].sum().nlargest(n)
+    return top
@@ -0,0 +1,92 @@
+import time
+
+import pandas as pd
+
+from vendor_resolution import VendorResolution
+
+# Purchase frequency periods offered by the Vendor Analysis page
+FREQUENCIES = {'Monthly': 'M', 'Quarterly': 'Q', 'Yearly': 'Y'}
+
+
+class VendorAggregates:
+    """Per-vendor purchase aggregates, computed from Inflow in one pass.
+
+    Purchases are grouped once by canonical vendor (see VendorResolution),
+    Item_Type and month. Spend, purchase counts, average unit costs and
+    purchase frequency over any period are rolled up from those cells, so
+    the Vendor Analysis widgets never go back to the raw rows. Build it
+    once per data version.
+    """
+
+    def __init__(self, cells, vendors, build_seconds):
+        self.cells = cells
+        self.vendors = vendors
+        self.build_seconds = build_seconds
+
+    @classmethod
+    def build(cls, inflow_df, resolution=None):
+        start = time.perf_counter()
+        if resolution is None:
+            resolution = VendorResolution(inflow_df)
+        quantity = pd.to_numeric(inflow_df['Quantity'], errors='coerce') if 'Quantity' in inflow_df else 0
+        if 'Total_Cost' in inflow_df:
+            spend = pd.to_numeric(inflow_df['Total_Cost'], errors='coerce')
+        elif 'Cost_per_Item' in inflow_df:
+            spend = pd.to_numeric(inflow_df['Cost_per_Item'], errors='coerce') * quantity
+        else:
+            spend = 0
+        if 'Purchase_Date' in inflow_df:
+            month = pd.to_datetime(inflow_df['Purchase_Date'], errors='coerce').dt.to_period('M')
+        else:
+            month = pd.Series(pd.NaT, index=inflow_df.index, dtype='period[M]')
+        rows = pd.DataFrame({
+            'Vendor_ID': resolution.vendor_ids(inflow_df),
+            'Item_Type': inflow_df['Item_Type'] if 'Item_Type' in inflow_df else None,
+            'Month': month,
+            'Spend': spend,
+            'Quantity': quantity,
+            'Purchases': 1,
+        }, index=inflow_df.index)
+        cells = (rows.groupby(['Vendor_ID', 'Item_Type', 'Month'], dropna=False, sort=True)
+                 [['Spend', 'Quantity', 'Purchases']].sum().reset_index())
+        cells = cells[cells['Vendor_ID'].notna()].reset_index(drop=True)
+        vendors = resolution.vendors.set_index('Vendor_ID')[['Vendor', 'Names']]
+        return cls(cells, vendors, time.perf_counter() - start)
+
+    def summary(self):
+        """Spend, purchases, quantity, average unit cost and purchase months per vendor, by spend"""
+        totals = self.cells.groupby('Vendor_ID')[['Spend', 'Quantity', 'Purchases']].sum()
+        months = self.cells.dropna(subset=['Month']).groupby('Vendor_ID')['Month']
+        summary = self.vendors.join(totals, how='inner')
+        summary['Avg_Unit_Cost'] = _unit_cost(summary)
+        summary['First_Purchase'] = months.min().dt.start_time
+        summary['Last_Purchase'] = months.max().dt.end_time.dt.normalize()
+        summary['Spellings'] = summary.pop('Names').str.len()
+        return summary.sort_values('Spend', ascending=False).reset_index()
+
+    def unit_costs(self, vendor_ids=None):
+        """Average unit cost (spend / quantity) per vendor and Item_Type"""
+        cells = self._select(vendor_ids)
+        by_type = cells.groupby(['Vendor_ID', 'Item_Type'])[['Spend', 'Quantity', 'Purchases']].sum()
+        by_type['Avg_Unit_Cost'] = _unit_cost(by_type)
+        by_type = by_type.reset_index()
+        by_type.insert(1, 'Vendor', by_type['Vendor_ID'].map(self.vendors['Vendor']))
+        return by_type
+
+    def frequency(self, vendor_ids=None, period='Monthly'):
+        """Purchases and spend per vendor and period, with the period start as a timestamp"""
+        cells = self._select(vendor_ids).dropna(subset=['Month'])
+        periods = cells['Month'].dt.asfreq(FREQUENCIES[period]).dt.start_time.rename('Period')
+        frequency = cells.groupby(['Vendor_ID', periods])[['Purchases', 'Spend']].sum().reset_index()
+        frequency.insert(1, 'Vendor', frequency['Vendor_ID'].map(self.vendors['Vendor']))
+        return frequency
+
+    def _select(self, vendor_ids):
+        if vendor_ids is None:
+            return self.cells
+        return self.cells[self.cells['Vendor_ID'].isin(vendor_ids)]
+
+
+def _unit_cost(totals):
+    """Quantity-weighted average unit cost, NaN where nothing was bought"""
+    return totals['Spend'] / totals['Quantity'].where(totals['Quantity'] != 0)
@@ -0,0 +1,237 @@
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+VENDOR_COLUMNS = ['Vendor_Name', 'Vendor_Email', 'Vendor_Phone']
+
+# Company forms dropped from the end of a name: "ACME, Inc." -> "acme"
+LEGAL_SUFFIXES = {'inc', 'incorporated', 'llc', 'llp', 'lp', 'ltd', 'limited', 'corp',
+                  'corporation', 'co', 'company', 'plc', 'gmbh', 'pty'}
+
+# An email or phone shared by more distinct names than this is a placeholder
+# (a buyer's own address, 555-0000) rather than evidence of one vendor
+MAX_NAMES_PER_KEY = 3
+
+# Names in one block are compared with the next WINDOW names in sorted
+# order and merged at NAME_SIMILARITY or above
+WINDOW = 10
+NAME_SIMILARITY = 0.9
+
+
+def normalize_name(name):
+    """Lower-case words of a vendor name without punctuation or company form"""
+    if name is None or name != name:
+        return ''
+    text = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode().lower()
+    words = re.findall(r'[0-9a-z]+', text.replace('&', ' and '))
+    while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+        words.pop()
+    return ' '.join(words)
+
+
+def normalize_email(email):
+    if email is None or email != email:
+        return ''
+    email = str(email).strip().lower()
+    return email if '@' in email else ''
+
+
+def normalize_phone(phone):
+    """Digits of a phone number, without a leading 1 country code"""
+    if phone is None or phone != phone:
+        return ''
+    # Sheets read phone numbers as floats: 5551234567.0
+    if isinstance(phone, float) and phone.is_integer():
+        phone = int(phone)
+    digits = re.sub(r'\D', '', str(phone))
+    if len(digits) == 11 and digits.startswith('1'):
+        digits = digits[1:]
+    return digits if len(digits) >= 7 else ''
+
+
+class UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Path compression
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            # The earlier record stays the root
+            if b < a:
+                a, b = b, a
+            self.parent[b] = a
+
+
+class VendorResolution:
+    """Canonical vendors of a purchases table.
+
+    Rows are reduced to their distinct (name, email, phone) records first,
+    so the work depends on the number of vendor spellings rather than on
+    the number of purchases. Records are merged when their normalized names
+    are equal, when they share an email address or phone number (unless it
+    is shared by many different names), or when their names are nearly
+    identical. Near-identical names are only compared within a blocking key
+    (the first four letters of the name) and only with their WINDOW nearest
+    neighbours in sorted order, so there is no all-pairs comparison.
+
+    ``vendors`` lists one row per canonical vendor: its Vendor_ID, the
+    spelling used most often as its name, all spellings, emails and phones
+    seen, and the number of purchases. ``vendor_ids`` and ``names`` map the
+    rows of this table, or any subset of it, to their canonical vendor.
+    """
+
+    def __init__(self, df):
+        self.columns = [column for column in VENDOR_COLUMNS if column in df]
+        records = self._records(df)
+        # Distinct records in order of first appearance, and the record of each row
+        codes = records.groupby(list(records.columns), sort=False).ngroup().to_numpy()
+        raw = records.drop_duplicates().reset_index(drop=True)
+        self.records = pd.MultiIndex.from_frame(raw)
+        purchases = np.bincount(codes, minlength=len(raw))
+        names = _normalized(raw, 'Vendor_Name', normalize_name)
+        emails = _normalized(raw, 'Vendor_Email', normalize_email)
+        phones = _normalized(raw, 'Vendor_Phone', normalize_phone)
+
+        groups = UnionFind(len(raw))
+        _merge_equal(groups, names, names)
+        _merge_equal(groups, emails, names, max_names=MAX_NAMES_PER_KEY)
+        _merge_equal(groups, phones, names, max_names=MAX_NAMES_PER_KEY)
+        self.comparisons = _merge_similar(groups, names)
+
+        # Vendors numbered in order of first appearance; records without any
+        # name, email or phone belong to no vendor
+        blank = [not (name or email or phone) for name, email, phone in zip(names, emails, phones)]
+        vendor_of_root = {}
+        record_vendor = []
+        for record in range(len(raw)):
+            if blank[record]:
+                record_vendor.append(-1)
+            else:
+                record_vendor.append(vendor_of_root.setdefault(groups.find(record), len(vendor_of_root)))
+        self.record_vendor = np.array(record_vendor, dtype=np.intp)
+        self.name_vendor = {name: vendor for name, vendor in zip(names, self.record_vendor) if name}
+
+        raw_names = raw['Vendor_Name'].tolist() if 'Vendor_Name' in raw else [''] * len(raw)
+        rows = []
+        members = defaultdict(list)
+        for record, vendor in enumerate(self.record_vendor):
+            if vendor >= 0:
+                members[vendor].append(record)
+        for vendor in range(len(vendor_of_root)):
+            spellings = Counter()
+            for record in members[vendor]:
+                if raw_names[record] != '':
+                    spellings[raw_names[record]] += purchases[record]
+            rows.append({
+                'Vendor_ID': f"V{vendor + 1:04d}",
+                # Most purchased spelling; Counter keeps first-seen order on ties
+                'Vendor': spellings.most_common(1)[0][0] if spellings else '',
+                'Names': sorted(spellings, key=str),
+                'Emails': sorted({emails[record] for record in members[vendor]} - {''}),
+                'Phones': sorted({phones[record] for record in members[vendor]} - {''}),
+                'Purchases': int(purchases[members[vendor]].sum()),
+            })
+        self.vendors = pd.DataFrame(rows, columns=['Vendor_ID', 'Vendor', 'Names', 'Emails', 'Phones', 'Purchases'])
+
+    def __len__(self):
+        return len(self.vendors)
+
+    def vendor_positions(self, df):
+        """Position in ``vendors`` of each row's vendor, -1 when it has none"""
+        if not self.columns or not len(df):
+            return np.full(len(df), -1, dtype=np.intp)
+        records = self._records(df)
+        found = self.records.get_indexer(pd.MultiIndex.from_frame(records))
+        positions = np.full(len(df), -1, dtype=np.intp)
+        positions[found >= 0] = self.record_vendor[found[found >= 0]]
+        # Rows added since the resolution was built fall back to their name
+        for row in np.flatnonzero(found < 0):
+            name = normalize_name(records.iat[row, 0]) if 'Vendor_Name' in records else ''
+            positions[row] = self.name_vendor.get(name, -1)
+        return positions
+
+    def vendor_ids(self, df):
+        """Vendor_ID of each row of ``df``, aligned with its index"""
+        return self._lookup(df, 'Vendor_ID')
+
+    def names(self, df):
+        """Canonical vendor name of each row of ``df``, aligned with its index"""
+        return self._lookup(df, 'Vendor')
+
+    def _lookup(self, df, column):
+        positions = self.vendor_positions(df)
+        looked_up = np.full(len(df), None, dtype=object)
+        looked_up[positions >= 0] = self.vendors[column].to_numpy(dtype=object)[positions[positions >= 0]]
+        return pd.Series(looked_up, index=df.index, name=column)
+
+    def _records(self, df):
+        """Vendor columns with missing values as empty strings, so they factorize"""
+        if not self.columns:
+            return pd.DataFrame({'Vendor_Name': [''] * len(df)})
+        return df[self.columns].astype(object).where(df[self.columns].notna(), '')
+
+
+def _normalized(raw, column, normalize):
+    """Normalized values of one column of the distinct records, as a list"""
+    if column not in raw:
+        return [''] * len(raw)
+    return [normalize(value) for value in raw[column].tolist()]
+
+
+def _merge_equal(groups, keys, names, max_names=None):
+    """Merge records sharing a non-empty key, skipping keys shared by more than max_names names"""
+    by_key = defaultdict(list)
+    for record, key in enumerate(keys):
+        if key:
+            by_key[key].append(record)
+    for records in by_key.values():
+        if len(records) < 2:
+            continue
+        if max_names is not None and len({names[record] for record in records} - {''}) > max_names:
+            continue
+        for record in records[1:]:
+            groups.union(records[0], record)
+
+
+def _merge_similar(groups, names):
+    """Merge records with nearly identical names, comparing within blocks; returns the comparison count"""
+    first = {}
+    for record, name in enumerate(names):
+        if name and name not in first:
+            first[name] = record
+    blocks = defaultdict(list)
+    for name in first:
+        blocks[name.replace(' ', '')[:4]].append(name)
+    # Names with different numbers are different vendors: "Store 12" is not "Store 13"
+    numbers = {name: re.findall(r'\d+', name) for name in first}
+    comparisons = 0
+    for block in blocks.values():
+        block.sort()
+        for i, name in enumerate(block):
+            for other in block[i + 1:i + 1 + WINDOW]:
+                comparisons += 1
+                if numbers[name] == numbers[other] and _similar(name, other):
+                    groups.union(first[name], first[other])
+    return comparisons
+
+
+def _similar(name, other):
+    """Nearly identical names"""
+    matcher = SequenceMatcher(None, name, other)
+    # Cheap upper bounds first
+    return (matcher.real_quick_ratio() >= NAME_SIMILARITY
+            and matcher.quick_ratio() >= NAME_SIMILARITY
+            and matcher.ratio() >= NAME_SIMILARITY)